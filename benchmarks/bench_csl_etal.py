@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+# measures icarus and soph latex export of 2000 multi-author records, where the
+# et al. of each record is rewritten with the number of authors of the record
+#    python benchmarks/bench_csl_etal.py
+
+import copy
+import time
+
+import exportsrv.app as app
+from exportsrv.tests.unittests.stubdata import solrdata
+from exportsrv.formatter.ads import adsFormatter
+from exportsrv.formatter.cslJson import CSLJson
+from exportsrv.formatter.csl import CSL
+
+NUM_DOCS = 2000
+ROUNDS = 3
+
+
+def get_solr_data(num_docs):
+    """
+
+    :param num_docs:
+    :return: stub solr data records with more than two authors, repeated with distinct bibcodes
+    """
+    multi_author = [doc for doc in solrdata.data['response']['docs'] if len(doc.get('author', [])) > 2]
+    docs = []
+    for i in range(num_docs):
+        doc = copy.deepcopy(multi_author[i % len(multi_author)])
+        doc['bibcode'] = '{}{:05d}'.format(doc['bibcode'][:14], i)
+        docs.append(doc)
+    return {'responseHeader': {'status': 0, 'QTime': 1}, 'response': {'start': 0, 'numFound': num_docs, 'docs': docs}}
+
+
+def run(csl_style, solr_data):
+    """
+
+    :param csl_style:
+    :param solr_data:
+    :return: best time of ROUNDS exports, in seconds
+    """
+    best = None
+    for _ in range(ROUNDS):
+        for_cls = CSLJson(copy.deepcopy(solr_data)).get()
+        start = time.time()
+        CSL(for_cls, csl_style, adsFormatter.latex).get()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    current_app = app.create_app()
+    with current_app.app_context():
+        solr_data = get_solr_data(NUM_DOCS)
+        for csl_style in ['icarus', 'soph']:
+            print('{} records {:<7} {:8.1f} ms'.format(NUM_DOCS, csl_style, run(csl_style, solr_data) * 1000))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+# measures the per-request time of the csl formats, rendered by citeproc vs the
+# compiled native renderer, for the stub data and a generated corpus
+#    python benchmarks/bench_csl_native.py
+
+import copy
+import time
+
+import exportsrv.app as app
+from exportsrv.tests.unittests.stubdata import solrdata
+from exportsrv.tests.unittests.test_csl_native import get_corpus
+from exportsrv.formatter.ads import adsCSLStyle, adsFormatter
+from exportsrv.formatter.cslJson import CSLJson
+from exportsrv.formatter.csl import CSL
+
+ROUNDS = 20
+
+
+def run(current_app, csl_style, solr_data, native):
+    """
+
+    :param current_app:
+    :param csl_style:
+    :param solr_data:
+    :param native: if False, everything is rendered by citeproc
+    :return: best time per request of three, in seconds
+    """
+    current_app.config['EXPORT_SERVICE_CSL_NATIVE'] = native
+    CSL(CSLJson(copy.deepcopy(solr_data)).get(), csl_style, adsFormatter.latex).get()
+    best = None
+    for _ in range(3):
+        requests = [CSLJson(copy.deepcopy(solr_data)).get() for _ in range(ROUNDS)]
+        start = time.time()
+        for for_cls in requests:
+            CSL(for_cls, csl_style, adsFormatter.latex).get()
+        elapsed = (time.time() - start) / ROUNDS
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    current_app = app.create_app()
+    with current_app.app_context():
+        corpus = get_corpus(300, seed=3)
+        corpus['response']['docs'] = [doc for doc in corpus['response']['docs']
+                                      if doc.get('author') and not doc['author'][0].startswith(u',') and doc['year'] >= u'1000']
+        corpus['response']['numFound'] = len(corpus['response']['docs'])
+        for name, solr_data in [('stub', solrdata.data), ('generated', corpus)]:
+            num_docs = len(solr_data['response']['docs'])
+            for csl_style in adsCSLStyle.ads_CLS:
+                before = run(current_app, csl_style, solr_data, native=False)
+                after = run(current_app, csl_style, solr_data, native=True)
+                print('{:<9} {:>3} records {:<7} citeproc: {:8.2f} ms   native: {:8.2f} ms   ({:.2f}x)'.format(
+                    name, num_docs, csl_style, before * 1000, after * 1000, before / after))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+# measures csl latex export of 2000 records rendered in the request process
+# vs split across 2, 4, and 8 worker processes, with the native renderer and with citeproc
+#    python benchmarks/bench_csl_parallel.py
+
+import copy
+import multiprocessing
+import time
+
+import exportsrv.app as app
+from exportsrv.formatter.ads import adsFormatter
+from exportsrv.formatter.cslJson import CSLJson
+from exportsrv.formatter.csl import CSL
+from bench_csl_etal import get_solr_data
+
+NUM_DOCS = 2000
+ROUNDS = 3
+
+
+def run(current_app, csl_style, solr_data, processes, native):
+    """
+
+    :param current_app:
+    :param csl_style:
+    :param solr_data:
+    :param processes:
+    :param native:
+    :return: best time of ROUNDS exports, in seconds
+    """
+    current_app.config['EXPORT_SERVICE_CSL_PROCESSES'] = processes
+    current_app.config['EXPORT_SERVICE_CSL_NATIVE'] = native
+    best = None
+    for _ in range(ROUNDS):
+        for_cls = CSLJson(copy.deepcopy(solr_data)).get()
+        start = time.time()
+        CSL(for_cls, csl_style, adsFormatter.latex).get()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    current_app = app.create_app()
+    print('{} cpus'.format(multiprocessing.cpu_count()))
+    with current_app.app_context():
+        solr_data = get_solr_data(NUM_DOCS)
+        for native in [False, True]:
+            for csl_style in ['aastex', 'ieee']:
+                single = run(current_app, csl_style, solr_data, 1, native)
+                line = '{:<8} {:<7} 1 process: {:7.1f} ms'.format('native' if native else 'citeproc', csl_style, single * 1000)
+                for processes in [2, 4, 8]:
+                    elapsed = run(current_app, csl_style, solr_data, processes, native)
+                    line += '   {}: {:7.1f} ms ({:.2f}x)'.format(processes, elapsed * 1000, single / elapsed)
+                print(line)
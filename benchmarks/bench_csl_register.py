@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+# measures registering the records with citeproc's bibliography, with citeproc's list of keys
+# and with the indexed keys of fast registration, at 100, 2000 and 10000 records
+#    python benchmarks/bench_csl_register.py
+
+import copy
+import time
+
+import exportsrv.app as app
+from exportsrv.tests.unittests.stubdata import solrdata
+from exportsrv.formatter.cslJson import CSLJson
+from exportsrv.formatter.csl import csl_styles, get_bibliography
+
+NUM_DOCS = [100, 2000, 10000]
+ROUNDS = 3
+
+
+def get_solr_data(num_docs):
+    """
+
+    :param num_docs:
+    :return: stub solr data records repeated with distinct bibcodes
+    """
+    docs = []
+    for i in range(num_docs):
+        doc = copy.deepcopy(solrdata.data['response']['docs'][i % len(solrdata.data['response']['docs'])])
+        doc['bibcode'] = '{}{:05d}'.format(doc['bibcode'][:14], i)
+        docs.append(doc)
+    return {'responseHeader': {'status': 0, 'QTime': 1}, 'response': {'start': 0, 'numFound': num_docs, 'docs': docs}}
+
+
+def run(for_cls, fast_registration):
+    """
+
+    :param for_cls:
+    :param fast_registration:
+    :return: best time of ROUNDS registrations, in seconds
+    """
+    best = None
+    bib_style = csl_styles.load('aastex')
+    for _ in range(ROUNDS):
+        start = time.time()
+        get_bibliography(bib_style, for_cls, fast_registration=fast_registration)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    current_app = app.create_app()
+    with current_app.app_context():
+        for num_docs in NUM_DOCS:
+            for_cls = CSLJson(get_solr_data(num_docs)).get()
+            print('{:>5} records  citeproc {:9.1f} ms  fast {:7.1f} ms'.format(
+                num_docs, run(for_cls, False) * 1000, run(for_cls, True) * 1000))
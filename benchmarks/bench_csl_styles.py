@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+# measures the per-request time of csl formats and custom format with author
+# specifiers, parsing the csl styles on every request vs reusing the parsed styles
+#    python benchmarks/bench_csl_styles.py
+
+import copy
+import time
+
+import exportsrv.app as app
+from exportsrv.tests.unittests.stubdata import solrdata
+from exportsrv.formatter.ads import adsFormatter
+from exportsrv.formatter.cslJson import CSLJson
+from exportsrv.formatter.csl import CSL, csl_styles
+from exportsrv.formatter.customFormat import CustomFormat
+
+ROUNDS = 50
+
+
+def get_solr_data(num_docs):
+    """
+
+    :param num_docs:
+    :return: stub solr data with the first num_docs records
+    """
+    solr_data = copy.deepcopy(solrdata.data)
+    solr_data['response']['docs'] = solr_data['response']['docs'][:num_docs]
+    solr_data['response']['numFound'] = num_docs
+    return solr_data
+
+
+def request(csl_style, solr_data):
+    """
+    one request worth of formatting
+
+    :param csl_style:
+    :param solr_data:
+    :return:
+    """
+    if csl_style == 'custom':
+        custom_format = CustomFormat(custom_format=r'%ZEncoding:latex %A %G %l %M %N\n')
+        custom_format.set_json_from_solr(solr_data)
+        return custom_format.get()
+    return CSL(CSLJson(solr_data).get(), csl_style, adsFormatter.latex).get()
+
+
+def run(csl_style, solr_data, cached):
+    """
+
+    :param csl_style:
+    :param solr_data:
+    :param cached: if False, the parsed styles are dropped before every request
+    :return: average time per request, in seconds
+    """
+    request(csl_style, solr_data)
+    start = time.time()
+    for _ in range(ROUNDS):
+        if not cached:
+            csl_styles.styles.clear()
+        request(csl_style, solr_data)
+    return (time.time() - start) / ROUNDS
+
+
+if __name__ == '__main__':
+    current_app = app.create_app()
+    with current_app.app_context():
+        for num_docs in [1, len(solrdata.data['response']['docs'])]:
+            solr_data = get_solr_data(num_docs)
+            for csl_style in ['aastex', 'mnras', 'icarus', 'custom']:
+                before = run(csl_style, solr_data, cached=False)
+                after = run(csl_style, solr_data, cached=True)
+                print('{:>3} records {:<8} parsed per request: {:7.2f} ms   cached: {:7.2f} ms   ({:.2f}x)'.format(
+                    num_docs, csl_style, before * 1000, after * 1000, before / after))
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# measures the time to format one record in custom formats that differ in one option,
+# that the weights of custom format in admission cost estimate are based on,
+# records are made distinct so that values and names are not cached across records
+#    python benchmarks/bench_custom_cost.py
+
+import copy
+import time
+
+import exportsrv.app as app
+from exportsrv.tests.unittests.stubdata import solrdata
+from exportsrv.formatter.customFormat import CustomFormat
+
+REPEAT = 100
+ROUNDS = 5
+
+CUSTOM_FORMATS = [
+    ('base', r'%R %T %Y'),
+    ('one author specifier', r'%R %T %Y %A'),
+    ('two author specifiers', r'%R %T %Y %A %5.3l'),
+    ('three author specifiers', r'%R %T %Y %A %5.3l %^G'),
+    ('latex', r'%ZEncoding:latex %R %T %Y'),
+    ('line wrap', r'%ZLinelength:80 %R %T %Y'),
+    ('abstract', r'%R %T %Y %B'),
+    ('abstract wrapped', r'%ZLinelength:80 %R %T %Y %B'),
+    ('punctuation elided', r'%R, %T, (%Y) [%V]'),
+]
+
+
+def get_solr_data(repeat):
+    """
+
+    :param repeat:
+    :return: stub solr data records repeated, with distinct titles, authors, and abstracts
+    """
+    docs = []
+    for i in range(repeat):
+        for doc in solrdata.data['response']['docs']:
+            doc = copy.deepcopy(doc)
+            doc['title'] = [u'{} {}'.format(title, i) for title in doc.get('title', [])]
+            doc['author'] = [u'X{}{}'.format(i, author) for author in doc.get('author', [])]
+            if 'abstract' in doc:
+                doc['abstract'] = u'{} {}'.format(doc['abstract'], i)
+            docs.append(doc)
+    return {'responseHeader': {'status': 0, 'QTime': 1}, 'response': {'start': 0, 'numFound': len(docs), 'docs': docs}}
+
+
+def run(custom_format_str, solr_data):
+    """
+
+    :param custom_format_str:
+    :param solr_data:
+    :return: best time of ROUNDS exports per record, in seconds
+    """
+    best = None
+    for _ in range(ROUNDS):
+        start = time.time()
+        custom_format = CustomFormat(custom_format=custom_format_str)
+        custom_format.set_json_from_solr(copy.copy(solr_data))
+        custom_format.get()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / solr_data['response']['numFound']
+
+
+if __name__ == '__main__':
+    current_app = app.create_app()
+    with current_app.app_context():
+        solr_data = get_solr_data(REPEAT)
+        base = None
+        for name, custom_format_str in CUSTOM_FORMATS:
+            per_record = run(custom_format_str, solr_data)
+            base = base or per_record
+            print('{:<24} {:8.1f} us per record {:6.2f} x base'.format(name, per_record * 1e6, per_record / base))
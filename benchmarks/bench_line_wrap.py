@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+# measures wrapping the abstracts of the stub records, the way the fielded and custom
+# formats do, with textwrap.fill and with the shared fill of lineWrap
+#    python benchmarks/bench_line_wrap.py
+
+import textwrap
+import time
+
+from exportsrv.tests.unittests.stubdata import solrdata
+from exportsrv.formatter import lineWrap
+
+REPEAT = 100
+ROUNDS = 3
+
+
+def get_texts(repeat):
+    """
+
+    :param repeat:
+    :return: abstracts and titles of the stub solr data records, repeated
+    """
+    texts = []
+    for doc in solrdata.data['response']['docs']:
+        texts.append(doc.get('abstract', u''))
+        texts.extend(doc.get('title', []))
+    return texts * repeat
+
+
+def run(fill, texts):
+    """
+
+    :param fill:
+    :param texts:
+    :return: best time of ROUNDS wraps of all the texts in seconds, and the wrapped texts
+    """
+    best = None
+    for _ in range(ROUNDS):
+        start = time.time()
+        wrapped = [fill(text, width=72, subsequent_indent=' ' * 8) for text in texts]
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, wrapped
+
+
+if __name__ == '__main__':
+    texts = get_texts(REPEAT)
+    textwrap_time, textwrap_wrapped = run(textwrap.fill, texts)
+    linewrap_time, linewrap_wrapped = run(lineWrap.fill, texts)
+    print('{} texts textwrap {:8.1f} ms'.format(len(texts), textwrap_time * 1000))
+    print('{} texts lineWrap {:8.1f} ms'.format(len(texts), linewrap_time * 1000))
+    print('identical: {}'.format(textwrap_wrapped == linewrap_wrapped))
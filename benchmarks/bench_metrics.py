@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+# measures the overhead of collecting metrics per export request,
+# by sending the same requests with metrics turned on and off
+#    python benchmarks/bench_metrics.py
+
+import json
+import time
+
+import exportsrv.app as app
+from exportsrv import metrics
+
+FORMATS = ['ris', 'bibtex', 'aastex', 'votable']
+ROUNDS = 200
+
+
+def run(metrics_on):
+    """
+
+    :param metrics_on:
+    :return: average time per request, in seconds
+    """
+    current_app = app.create_app(**{'EXPORT_SERVICE_METRICS': metrics_on, 'EXPORT_SERVICE_SERVER_TIMING': metrics_on})
+    client = current_app.test_client()
+    payload = json.dumps({'bibcode': current_app.config['EXPORT_SERVICE_TEST_BIBCODE_GET']})
+    # warm up
+    for export_format in FORMATS:
+        client.post('/' + export_format, data=payload)
+    start = time.time()
+    for _ in range(ROUNDS):
+        for export_format in FORMATS:
+            client.post('/' + export_format, data=payload)
+    return (time.time() - start) / (ROUNDS * len(FORMATS))
+
+
+def run_recording():
+    """
+    time of the metrics calls made for one request, without the request itself
+
+    :return: in seconds
+    """
+    start = time.time()
+    for _ in range(ROUNDS * 100):
+        metrics.requests_in_flight.inc()
+        metrics.requests_total.inc(format='ris', method='POST', status=200)
+        metrics.request_duration.observe(0.02, format='ris', method='POST')
+        metrics.response_size.observe(2048, format='ris')
+        metrics.solr_duration.observe(0.01, method='bigquery')
+        metrics.records.observe(20)
+        metrics.requests_in_flight.dec()
+    return (time.time() - start) / (ROUNDS * 100)
+
+
+if __name__ == '__main__':
+    # alternate and keep the best of several runs, to take out the noise
+    off, on = float('inf'), float('inf')
+    for _ in range(3):
+        off = min(off, run(False))
+        on = min(on, run(True))
+    print('metrics off: {:.3f} ms/request'.format(off * 1000))
+    print('metrics on:  {:.3f} ms/request'.format(on * 1000))
+    print('overhead:    {:.3f} ms/request ({:.1f}%)'.format((on - off) * 1000, (on - off) / off * 100))
+    print('recording metrics of one request: {:.1f} us'.format(run_recording() * 1000000))
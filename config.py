@@ -102,5 +102,72 @@ EXPORT_SERVICE_SOPH_JOURNAL_ABBREVIATION = {
 }
 
 
+# compress the response if client sends Accept-Encoding with gzip or deflate
+# responses smaller than min size (in bytes) are sent as is, set level to 0 to turn off compression
+EXPORT_SERVICE_COMPRESS_MIN_SIZE = 1024
+EXPORT_SERVICE_COMPRESS_LEVEL = 6
+
+# export jobs, for bibcode lists too large for a synchronous request
+# results are kept on local disk in jobs dir (defaults to a directory in system temp) for ttl seconds
+# number of worker threads per process, if 0 the job runs within the submit request
+# expired jobs are removed on submit, and at most once per cleanup interval (seconds) by idle workers and downloads
+EXPORT_SERVICE_JOBS_DIR = None
+EXPORT_SERVICE_JOBS_TTL = 3600 * 24
+EXPORT_SERVICE_JOBS_CLEANUP_INTERVAL = 3600
+EXPORT_SERVICE_JOBS_WORKERS = 2
+EXPORT_SERVICE_JOBS_MAX_RECORDS = 50000
+
+# admission control, cost of a request is estimated from number of records, format, and options
+# (ie, one record in fielded format costs 1, in csl costs 10, plus 5 for the request itself)
+# requests costing no more than interactive max cost go to interactive lane, the rest to bulk lane
+# if in-flight cost of a lane is over its budget, request waits up to queue timeout seconds
+# and then is rejected with 503, if there are already max queued requests waiting, it is rejected with 429
+EXPORT_SERVICE_ADMISSION_INTERACTIVE_MAX_COST = 1000
+EXPORT_SERVICE_ADMISSION_INTERACTIVE_BUDGET = 5000
+EXPORT_SERVICE_ADMISSION_BULK_BUDGET = 60000
+EXPORT_SERVICE_ADMISSION_QUEUE_TIMEOUT = 10
+EXPORT_SERVICE_ADMISSION_MAX_QUEUED = 20
+EXPORT_SERVICE_ADMISSION_RETRY_AFTER = 30
+
+# authors from solr are parsed and encoded once per process, and shared by all formats and requests
+# cache keeps up to twice the size names, 0 turns off caching
+EXPORT_SERVICE_AUTHOR_NAME_CACHE_SIZE = 50000
+
+# pubdates are rendered in each date format once per process, and shared by all formats and requests
+# up to this many rendered dates are kept, 0 turns off caching
+EXPORT_SERVICE_PUB_DATE_CACHE_SIZE = 10000
+
+# custom format strings are compiled once per process, and shared by the requests that use them
+# up to this many compiled formats are kept, least recently used are dropped, 0 turns off caching
+EXPORT_SERVICE_CUSTOM_FORMAT_CACHE_SIZE = 500
+
+# custom formats saved by users are kept in this directory, shared by the processes of the service,
+# requests can then refer to the format by its id, saving formats is turned off if no directory is set
+# formats not used within ttl seconds are removed, and no more than max formats are kept
+EXPORT_SERVICE_CUSTOM_FORMATS_DIR = None
+EXPORT_SERVICE_CUSTOM_FORMATS_TTL = 3600 * 24 * 365
+EXPORT_SERVICE_CUSTOM_FORMATS_MAX = 100000
+
+# send time spent in each phase of the request (ie, solr, citeproc, latex) in Server-Timing header
+EXPORT_SERVICE_SERVER_TIMING = True
+
+# keep request counts, latencies, and sizes in metrics, exposed at /metrics
+EXPORT_SERVICE_METRICS = True
+
+# render the built-in csl styles (aastex, icarus, ...) with the compiled native renderer,
+# citeproc is used for the records the native renderer does not support
+EXPORT_SERVICE_CSL_NATIVE = True
+
+# register the records rendered with citeproc in linear time, for styles where a record does not
+# depend on the others (ie, year suffix), the output is the same, since citeproc does not disambiguate
+EXPORT_SERVICE_CSL_FAST_REGISTRATION = True
+
+# render csl exports of at least min records in this many worker processes, 1 renders in the request process
+# styles that need all the records at once (ie, year suffix) are always rendered in the request process
+EXPORT_SERVICE_CSL_PROCESSES = 1
+EXPORT_SERVICE_CSL_PARALLEL_MIN_RECORDS = 500
+# seconds to wait for the worker processes, then the export is rendered in the request process
+EXPORT_SERVICE_CSL_PARALLEL_TIMEOUT = 60
+
 # Testing Bibcode for GET
 EXPORT_SERVICE_TEST_BIBCODE_GET = 'TEST..BIBCODE..GET.'
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+
+from flask import current_app, request, Response
+from functools import wraps
+from threading import Condition
+import json
+import time
+
+from exportsrv.formatter.ads import adsFormatter
+from exportsrv.formatter.customFormat import CustomFormat, CustomFormatPlan, custom_format_plans
+from exportsrv.formatter.customFormatRegistry import custom_format_registry
+
+# This module estimates the cost of an export request and admits it only if
+# there is room in the budget of in-flight cost, otherwise the request waits in
+# a queue for a bit, and if still no room, is rejected with Retry-After header.
+# Requests are divided into two lanes, cheap interactive and expensive bulk, each
+# with its own budget, so that bulk exports never block the interactive ones.
+#    @admit('fielded')
+#    def route():
+#        ...
+
+class adsAdmissionLane:
+    interactive, bulk = 'interactive', 'bulk'
+
+
+class adsFormatFamily:
+    """
+    relative cost of formatting one record in each family of formats
+    """
+    cost = {'fielded': 1, 'xml': 2, 'votable': 1, 'rss': 1, 'bibtex': 2, 'csl': 10, 'custom': 2}
+
+    # overhead of a request regardless of number of records, ie solr round trip
+    overhead = 5
+
+    # custom format authors are formatted by the name format of the specifier, no citeproc run,
+    # about half a custom record per author specifier, see benchmarks/bench_custom_cost.py
+    author_specifier = 1
+
+    # abstracts are encoded and wrapped
+    abstract = 1
+
+    # custom format values are encoded in latex, about a custom record
+    latex = 2
+
+    # custom format records are wrapped to the line length, short records cost next to nothing
+    line_wrap = 1
+
+    # custom format abstracts wrapped to the line length, about eight custom records
+    wrapped_abstract = 16
+
+
+def estimate_record_cost(family, options=None):
+    """
+
+    :param family: format family, one of adsFormatFamily.cost keys
+    :param options: dict of request options that effect the cost
+    :return: estimated cost of formatting one record
+    """
+    options = options or {}
+    per_record = adsFormatFamily.cost.get(family, 1)
+    if options.get('include_abs', False):
+        per_record += adsFormatFamily.abstract
+    per_record += adsFormatFamily.author_specifier * options.get('author_specifiers', 0)
+    if options.get('latex', False):
+        per_record += adsFormatFamily.latex
+    if options.get('line_wrap', False):
+        per_record += adsFormatFamily.line_wrap
+    if options.get('wrapped_abstract', False):
+        per_record += adsFormatFamily.wrapped_abstract
+    return per_record
+
+
+def estimate_cost(num_records, family, options=None):
+    """
+
+    :param num_records: number of records to be exported
+    :param family: format family, one of adsFormatFamily.cost keys
+    :param options: dict of request options that effect the cost
+    :return: estimated cost of the request
+    """
+    return adsFormatFamily.overhead + num_records * estimate_record_cost(family, options)
+
+
+def get_custom_format_options(plan):
+    """
+
+    :param plan: compiled custom format
+    :return: dict of the options of the custom format that effect the cost
+    """
+    return {
+        # authors are formatted once per author specifier
+        'author_specifiers': len(plan.authors),
+        'latex': plan.export_format == adsFormatter.latex,
+        'line_wrap': plan.line_length > 0,
+        'wrapped_abstract': (plan.line_length > 0) and any(field[2] == 'abstract' for field in plan.fields),
+    }
+
+
+def get_custom_format_cost(plan):
+    """
+    what formatting records in the compiled custom format involves, and its estimated cost per record,
+    found without going to solr
+
+    :param plan: compiled custom format
+    :return: dict of solr fields, options that effect the cost, size of the compiled format, and cost per record
+             removing empty fields with their punctuation costs next to nothing, so it is only counted in the size
+    """
+    encodings = {adsFormatter.unicode: 'unicode', adsFormatter.html: 'html', adsFormatter.latex: 'latex',
+                 adsFormatter.csv: 'csv', adsFormatter.tsv: 'tsv'}
+    options = get_custom_format_options(plan)
+    return {
+        'fields': CustomFormat(custom_format=None, plan=plan).get_solr_fields().split(','),
+        'encoding': encodings.get(plan.export_format, 'unicode'),
+        'tabular': plan.delimiter is not None,
+        'options': options,
+        'plan_size': {'literals': len(plan.literals), 'fields': len(plan.fields), 'elided_fields': plan.elided_fields},
+        'cost_per_record': estimate_record_cost('custom', options),
+    }
+
+
+class AdmissionControl:
+
+    def __init__(self):
+        """
+
+        """
+        self.condition = Condition()
+        self.in_flight = {adsAdmissionLane.interactive: 0, adsAdmissionLane.bulk: 0}
+        self.queued = {adsAdmissionLane.interactive: 0, adsAdmissionLane.bulk: 0}
+
+    def get_lane(self, cost):
+        """
+
+        :param cost:
+        :return: lane the request with this cost goes to
+        """
+        if cost <= current_app.config['EXPORT_SERVICE_ADMISSION_INTERACTIVE_MAX_COST']:
+            return adsAdmissionLane.interactive
+        return adsAdmissionLane.bulk
+
+    def __get_budget(self, lane):
+        """
+
+        :param lane:
+        :return:
+        """
+        if lane == adsAdmissionLane.interactive:
+            return current_app.config['EXPORT_SERVICE_ADMISSION_INTERACTIVE_BUDGET']
+        return current_app.config['EXPORT_SERVICE_ADMISSION_BULK_BUDGET']
+
+    def __fits(self, lane, cost):
+        """
+        request fits if there is room in the budget, a request larger than the budget
+        is admitted only when the lane is idle, so that it is not starved forever
+
+        :param lane:
+        :param cost:
+        :return:
+        """
+        return self.in_flight[lane] == 0 or self.in_flight[lane] + cost <= self.__get_budget(lane)
+
+    def acquire(self, cost):
+        """
+
+        :param cost:
+        :return: status code, 200 if admitted, 429 if queue is full, 503 if timed out in the queue
+        """
+        lane = self.get_lane(cost)
+        with self.condition:
+            if not self.__fits(lane, cost):
+                if self.queued[lane] >= current_app.config['EXPORT_SERVICE_ADMISSION_MAX_QUEUED']:
+                    return 429
+                self.queued[lane] += 1
+                try:
+                    deadline = time.time() + current_app.config['EXPORT_SERVICE_ADMISSION_QUEUE_TIMEOUT']
+                    while not self.__fits(lane, cost):
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            return 503
+                        self.condition.wait(remaining)
+                finally:
+                    self.queued[lane] -= 1
+            self.in_flight[lane] += cost
+        return 200
+
+    def release(self, cost):
+        """
+
+        :param cost:
+        :return:
+        """
+        lane = self.get_lane(cost)
+        with self.condition:
+            self.in_flight[lane] -= cost
+            self.condition.notify_all()
+
+
+def get_request_cost(family):
+    """
+    estimate the cost of the current request from its payload
+
+    :param family:
+    :return:
+    """
+    if request.method != 'POST':
+        return estimate_cost(1, family)
+
+    payload = request.get_json(force=True, silent=True) or dict(request.form)
+    if not isinstance(payload, dict):
+        # not a valid payload, the route rejects it
+        return estimate_cost(0, family)
+    bibcodes = payload.get('bibcode', [])
+    if not isinstance(bibcodes, list):
+        bibcodes = [bibcodes]
+    num_records = min(len(bibcodes), current_app.config['EXPORT_SERVICE_MAX_RECORDS_SOLR_BIGQUERY'])
+
+    options = {'include_abs': request.path.rstrip('/').endswith(('bibtexabs', 'refabsxml'))}
+    if family == 'custom':
+        custom_format_str = payload.get('format', '')
+        if isinstance(custom_format_str, list):
+            custom_format_str = custom_format_str[0] if len(custom_format_str) > 0 else ''
+        try:
+            if 'format' in payload:
+                # the request has not been validated yet, so its format is not kept with the compiled
+                # ones, the route compiles and keeps it when accepted
+                plan = custom_format_plans.find(custom_format_str) or CustomFormatPlan(custom_format_str)
+            else:
+                format_id = payload.get('format_id', '')
+                if isinstance(format_id, list):
+                    format_id = format_id[0] if len(format_id) > 0 else ''
+                plan = custom_format_registry.get(format_id)
+            options.update(get_custom_format_options(plan))
+        except Exception:
+            pass
+    return estimate_cost(num_records, family, options)
+
+
+def admit(family):
+    """
+    decorator for the routes, to go through admission control before processing the request
+
+    :param family: format family of the route
+    :return:
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            admission = getattr(current_app, 'admission', None)
+            if admission is None:
+                return f(*args, **kwargs)
+            cost = get_request_cost(family)
+            status = admission.acquire(cost)
+            if status != 200:
+                current_app.logger.error('request with cost {cost} not admitted, sending response status={status}'.format(cost=cost, status=status))
+                if status == 429:
+                    error = 'too many requests queued, try again later'
+                else:
+                    error = 'service is busy, try again later'
+                r = Response(response=json.dumps({'error': error}), status=status)
+                r.headers['content-type'] = 'application/json'
+                r.headers['Retry-After'] = str(current_app.config['EXPORT_SERVICE_ADMISSION_RETRY_AFTER'])
+                return r
+            try:
+                return f(*args, **kwargs)
+            finally:
+                admission.release(cost)
+        return wrapper
+    return decorator
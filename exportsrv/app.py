@@ -6,6 +6,14 @@ from flask_discoverer import Discoverer
 from adsmutils import ADSFlask
 
 from exportsrv.views import bp
+from exportsrv.jobs import ExportJobs
+from exportsrv.admission import AdmissionControl
+from exportsrv.formatter.csl import csl_styles
+from exportsrv.formatter.authorName import author_names
+from exportsrv.formatter.journalIndex import journal_index
+from exportsrv.formatter.pubDate import pub_dates
+from exportsrv.formatter.customFormat import custom_format_plans
+from exportsrv.formatter.customFormatRegistry import custom_format_registry
 
 def create_app(**config):
     """
@@ -23,6 +31,14 @@ def create_app(**config):
     Discoverer(app)
 
     app.register_blueprint(bp)
+    app.jobs = ExportJobs(app)
+    app.admission = AdmissionControl()
+    csl_styles.preload()
+    author_names.max_size = app.config.get('EXPORT_SERVICE_AUTHOR_NAME_CACHE_SIZE', 50000)
+    journal_index.build(app.config)
+    pub_dates.max_size = app.config.get('EXPORT_SERVICE_PUB_DATE_CACHE_SIZE', 10000)
+    custom_format_plans.max_size = app.config.get('EXPORT_SERVICE_CUSTOM_FORMAT_CACHE_SIZE', 500)
+    custom_format_registry.build(app.config)
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+from flask import current_app, request
+import zlib
+
+# this module contains methods to compress the export response
+# based on the Accept-Encoding header sent by the client
+# gzip and deflate are supported, gzip is preferred if client accepts both
+
+supported_encoding = ['gzip', 'deflate']
+
+
+def get_accepted_encoding(accept_encoding):
+    """
+    parse the Accept-Encoding header and return the supported encoding the client prefers
+
+    :param accept_encoding: value of Accept-Encoding header
+    :return: gzip, deflate, or None if neither is acceptable
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for token in accept_encoding.split(','):
+        parts = token.strip().split(';')
+        coding = parts[0].strip().lower()
+        quality = 1.0
+        for param in parts[1:]:
+            param = param.strip()
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    best, best_quality = None, 0.0
+    for coding in supported_encoding:
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def get_compressor(encoding, level):
+    """
+
+    :param encoding: gzip or deflate
+    :param level: compression level 1-9
+    :return: zlib compress object
+    """
+    # wbits offset of 16 tells zlib to write gzip header and trailer
+    if encoding == 'gzip':
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS)
+
+
+def compress(data, encoding, level):
+    """
+
+    :param data: bytes to compress
+    :param encoding: gzip or deflate
+    :param level: compression level
+    :return: compressed bytes
+    """
+    compressor = get_compressor(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding, level):
+    """
+    compress an iterable of chunks lazily, so that streamed responses stay streamed
+
+    :param chunks: iterable of bytes/unicode
+    :param encoding: gzip or deflate
+    :param level: compression level
+    :return: generator of compressed bytes
+    """
+    compressor = get_compressor(encoding, level)
+    for chunk in chunks:
+        if isinstance(chunk, unicode):
+            chunk = chunk.encode('utf-8')
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def compress_response(response):
+    """
+    compress the response if client accepts it and it is worth it
+
+    :param response: flask response object
+    :return: the response, compressed in place if applicable
+    """
+    level = current_app.config.get('EXPORT_SERVICE_COMPRESS_LEVEL', 6)
+    min_size = current_app.config.get('EXPORT_SERVICE_COMPRESS_MIN_SIZE', 1024)
+    if level <= 0 or response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+
+    response.headers.add('Vary', 'Accept-Encoding')
+    encoding = get_accepted_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        response.set_data(compress(data, encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -4,14 +4,14 @@
 
 class adsFormatter:
     """
-    We are supporting four formats (unicode, html, latex, and csv) for custom format,
+    We are supporting five formats (unicode, html, latex, csv, and tsv) for custom format,
     for most of csl formats, we are supporting the first three only (unicode, html, and latex).
     There are formats that are inherently xml, or latex.
     The csl formats, listed below in ads_CLS, are the ones that can encoded as per user
     specification, and we assume that they are inherently unicode.
 
     """
-    default, unicode, html, latex, csv, xml = range(6)
+    default, unicode, html, latex, csv, xml, tsv = range(7)
 
     native_latex = ['BibTex', 'BibTex Abs', '3']
     native_xml = ['DublinCore', 'Reference', 'ReferenceAbs']
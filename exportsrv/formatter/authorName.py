@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+from unidecode import unidecode
+
+from exportsrv import metrics
+from exportsrv.formatter.toLaTex import encode_laTex_author
+
+# This module keeps the authors from solr, ie 'Zhang, M.', parsed and encoded once per process,
+# shared by all the formats and requests, since prolific authors appear in thousands of records
+#    for name in author_names.get(a_doc.get('author', [])):
+#        name.family, name.given, name.get_bibtex(), name.get_key()
+# The cache is bounded, names not looked up since the last two generations are dropped.
+# Hit ratio is in metrics, cache name author_name.
+
+
+class AuthorName:
+    """
+    one author string from solr, the encoded forms are computed the first time they are needed
+    """
+    def __init__(self, author):
+        """
+
+        :param author: as it comes from solr, last name, first name
+        """
+        self.author = author
+        parts = author.split(', ')
+        self.family = parts[0]
+        self.given = parts[1] if len(parts) >= 2 else None
+        self.bibtex = None
+        self.key = None
+
+    def get_csl(self):
+        """
+
+        :return: CSLJson name, a new dict each time, since CSL is free to update it
+        """
+        if self.given is None:
+            return {'family': self.family}
+        return {'family': self.family, 'given': self.given}
+
+    def get_bibtex(self):
+        """
+
+        :return: latex encoded name for BibTex, last name in braces
+        """
+        if self.bibtex is None:
+            parts = encode_laTex_author(self.author).split(',', 1)
+            bibtex = '{' + parts[0] + '}'
+            if (len(parts) == 2):
+                bibtex += ',' + parts[1]
+            self.bibtex = bibtex
+        return self.bibtex
+
+    def get_key(self):
+        """
+
+        :return: last name in ascii, for BibTex key
+        """
+        if self.key is None:
+            last_name = self.author.split(',', 1)[0]
+            if type(last_name) != unicode:
+                last_name = last_name.decode('utf-8', 'ignore')
+            self.key = unidecode(last_name)
+        return self.key
+
+
+class AuthorNameCache:
+    """
+    two generations of parsed names, once the current generation is full it becomes the previous one,
+    names found in the previous generation are moved to the current one, so at most twice max size
+    names are kept, and the ones in use stay
+    dict operations are atomic, the worst a race can do is to parse a name twice, so there is no lock
+    """
+    def __init__(self, max_size=50000):
+        """
+
+        :param max_size: number of names in a generation, 0 turns off caching
+        """
+        self.max_size = max_size
+        self.current = {}
+        self.previous = {}
+
+    def get(self, authors):
+        """
+
+        :param authors: list of authors from solr
+        :return: list of AuthorName
+        """
+        names = []
+        hits = 0
+        for author in authors:
+            name = self.current.get(author)
+            if name is None:
+                name = self.previous.get(author)
+                if name is None:
+                    name = AuthorName(author)
+                else:
+                    hits += 1
+                if self.max_size > 0:
+                    if len(self.current) >= self.max_size:
+                        self.previous = self.current
+                        self.current = {}
+                    self.current[author] = name
+            else:
+                hits += 1
+            names.append(name)
+        if hits > 0:
+            metrics.cache_requests.inc(hits, cache='author_name', result='hit')
+        if len(names) > hits:
+            metrics.cache_requests.inc(len(names) - hits, cache='author_name', result='miss')
+        return names
+
+
+author_names = AuthorNameCache()
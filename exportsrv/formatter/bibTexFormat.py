@@ -1,18 +1,19 @@
 # -*- coding: utf-8 -*-
 
 from collections import OrderedDict
-from datetime import datetime
 from flask import current_app
-from textwrap import fill
 import re
 import json
-from unidecode import unidecode
 
 from exportsrv.formatter.ads import adsJournalFormat
-from exportsrv.formatter.toLaTex import encode_laTex, encode_laTex_author
+from exportsrv.formatter.authorName import author_names
+from exportsrv.formatter.toLaTex import encode_laTex
 from exportsrv.formatter.format import Format
+from exportsrv.formatter.lineWrap import fill
+from exportsrv.formatter.journalIndex import journal_index
 from exportsrv.utils import get_eprint
-from exportsrv.formatter.strftime import strftime
+from exportsrv.formatter.pubDate import pub_dates
+from exportsrv.timing import timed
 
 # This class accepts JSON object created by Solr and reformats it
 # for the BibTex Export formats we are supporting
@@ -103,10 +104,8 @@ class BibTexFormat(Format):
         :param solr_date:
         :return:
         """
-        # solr_date has the format 2017-12-01
-        date_time = datetime.strptime(solr_date.replace('-00', '-01'), '%Y-%m-%d')
         # 2/7/2020 as per Alberto, month should be lower case
-        return strftime(date_time, '%b').lower()
+        return pub_dates.get(solr_date, '%b').lower()
 
 
     def __format_line_wrapped(self, left, right, format_style):
@@ -203,11 +202,8 @@ class BibTexFormat(Format):
         # if number of authors exceed the maximum that we display, cut to shorter list
         # only if maxauthor is none zero, zero is indication of return all available authors
         cut_authors = (len(a_doc[field]) > authorcutoff) and not maxauthor == 0
-        for author, i in zip(a_doc[field], range(len(a_doc[field]))):
-            author_parts = encode_laTex_author(author).split(',', 1)
-            author_list += '{' + author_parts[0] + '}'
-            if (len(author_parts) == 2):
-                author_list += ',' +  author_parts[1]
+        for name, i in zip(author_names.get(a_doc[field]), range(len(a_doc[field]))):
+            author_list += name.get_bibtex()
             if cut_authors and i + 1 == maxauthor:
                 # if reached number of required authors return
                 return author_list + " and et al."
@@ -223,19 +219,14 @@ class BibTexFormat(Format):
         :param a_doc:
         :param field:
         :param maxauthor:
-        :return:
+        :return: last names in ascii
         """
         if 'author' not in a_doc:
             return ''
-        author_list = ''
-        author_count = 0
-        for author in a_doc['author']:
-            author_parts = author.split(',', 1)
-            author_list += author_parts[0]
-            author_count += 1
-            if author_count == maxauthor:
-                return author_list
-        return author_list
+        authors = a_doc['author']
+        if maxauthor > 0:
+            authors = authors[:maxauthor]
+        return ''.join([name.get_key() for name in author_names.get(authors)])
 
 
     def __get_affiliation_list(self, a_doc, maxauthor, authorcutoff):
@@ -304,10 +295,12 @@ class BibTexFormat(Format):
 
         # use macro (default)
         if journalformat == adsJournalFormat.macro or journalformat == adsJournalFormat.default:
-            journal_macros = dict([(k, v) for k, v in current_app.config['EXPORT_SERVICE_AASTEX_JOURNAL_MACRO']])
-            return journal_macros.get(self.get_bibstem(a_doc.get('bibstem', '')), encode_laTex(''.join(a_doc.get('pub', ''))))
+            journal_macro = journal_index.get_macro(a_doc.get('bibstem', ''))
+            if journal_macro is not None:
+                return journal_macro
+            return encode_laTex(''.join(a_doc.get('pub', '')))
         elif journalformat == adsJournalFormat.abbreviated:
-            return Format(None).get_pub_abbrev(a_doc.get('bibstem', ''))
+            return journal_index.get_abbreviation(a_doc.get('bibstem', ''))
         elif journalformat == adsJournalFormat.full:
             return encode_laTex(''.join(a_doc.get('pub', '')))
 
@@ -425,10 +418,7 @@ class BibTexFormat(Format):
                 else:
                     maxauthor = 1
                 # need to make sure the key is returned in ascii format
-                authors = self.__get_author_lastname_list(a_doc, maxauthor)
-                if type(authors) != unicode:
-                    authors = authors.decode('utf-8', 'ignore')
-                key = key.replace(field[1], unidecode(authors))
+                key = key.replace(field[1], self.__get_author_lastname_list(a_doc, maxauthor))
             elif (field[2] == 'year'):
                 key = key.replace(field[1], a_doc.get('year', ''))
             elif (field[2] == 'bibcode'):
@@ -541,6 +531,7 @@ class BibTexFormat(Format):
         return self.enumerated_keys
 
 
+    @timed('render')
     def get(self, include_abs, maxauthor, authorcutoff, journalformat=adsJournalFormat.macro):
         """
         
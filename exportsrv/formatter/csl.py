@@ -6,18 +6,355 @@ from citeproc import CitationStylesStyle, CitationStylesBibliography
 from citeproc import formatter
 from citeproc.py2compat import *
 from citeproc.source.json import CiteProcJSON
+from multiprocessing import Pool, TimeoutError
+from threading import Lock
+import importlib
+import math
 import re
 import os
 
-from exportsrv.formatter.ads import adsFormatter, adsOrganizer, adsJournalFormat
-from exportsrv.formatter.format import Format
+from exportsrv import metrics
+from exportsrv.formatter import cslLaTex
+from exportsrv.formatter.ads import adsFormatter, adsOrganizer, adsJournalFormat, adsCSLStyle
+from exportsrv.formatter.cslName import NameFormat
+from exportsrv.formatter.cslNative import CSLNative, NativeUnsupported
+from exportsrv.formatter.journalIndex import journal_index
 from exportsrv.formatter.toLaTex import encode_laTex, encode_laTex_author, html_to_laTex
+from exportsrv.timing import timed, phase
 
 # This class accepts JSON and sends it to citeproc library to get reformated
 # We are supporting 7 complete cls (formatting all the fields) and 13 syles that
 # only format authors, used for custom format
 # citeproc provides the plain and html export format, and for export we also need
-# latex that is implemented.
+# latex that is implemented as a citeproc formatter in cslLaTex.
+# Large exports can be rendered in parallel by a pool of worker processes, see CSLRenderPool.
+
+class adsCSLDependency:
+    # how rendering of a record depends on the other records of the export
+    # citeproc-py does not implement disambiguation nor bibliography sort, so the only dependencies are
+    # the citation number, the position of the record, and year suffix and subsequent author substitute,
+    # which need all the records
+    none, position, all = 'none', 'position', 'all'
+
+
+class CSLStyleCache:
+    """
+    parsed csl styles shared by all the requests in the process
+    citeproc keeps rendering state in the style, so a parsed style is used by one
+    rendering at a time, if all parsed copies of a style are in use another one is parsed
+    """
+    def __init__(self, path):
+        """
+
+        :param path: directory of the csl files
+        """
+        self.path = path
+        self.lock = Lock()
+        self.styles = {}
+        self.natives = {}
+        self.dependencies = {}
+        self.name_formats = {}
+
+    def load(self, csl_style):
+        """
+
+        :param csl_style: style name, ie aastex
+        :return: parsed style
+        """
+        return CitationStylesStyle(os.path.join(self.path, csl_style + '.csl'), validate=False)
+
+    def preload(self):
+        """
+        parse all the styles, called at app startup so that forked workers share them
+
+        :return:
+        """
+        for file_name in sorted(os.listdir(self.path)):
+            csl_style, extension = os.path.splitext(file_name)
+            if extension == '.csl' and csl_style not in self.styles:
+                self.release(csl_style, self.load(csl_style))
+        for csl_style in adsCSLStyle.ads_CLS:
+            for output in [formatter.html, cslLaTex]:
+                self.get_native(csl_style, output)
+
+    def acquire(self, csl_style):
+        """
+
+        :param csl_style:
+        :return: parsed style for exclusive use until released
+        """
+        with self.lock:
+            parsed = self.styles.get(csl_style)
+            if parsed:
+                metrics.cache_requests.inc(cache='csl_style', result='hit')
+                return parsed.pop()
+        metrics.cache_requests.inc(cache='csl_style', result='miss')
+        return self.load(csl_style)
+
+    def release(self, csl_style, bib_style):
+        """
+
+        :param csl_style:
+        :param bib_style: parsed style to go back to the cache
+        :return:
+        """
+        with self.lock:
+            self.styles.setdefault(csl_style, []).append(bib_style)
+
+    def get_native(self, csl_style, output=formatter.html):
+        """
+        compiled native renderer, available for the built-in full styles only
+
+        :param csl_style:
+        :param output: citeproc output formatter, html or cslLaTex
+        :return: CSLNative, or None if the style is rendered by citeproc only
+        """
+        if csl_style not in adsCSLStyle.ads_CLS:
+            return None
+        native = self.natives.get((csl_style, output))
+        if native is None:
+            # compiled from its own parsed copy, the compiled functions do not use the style afterward
+            native = CSLNative(self.load(csl_style), output)
+            with self.lock:
+                native = self.natives.setdefault((csl_style, output), native)
+        return native
+
+    def get_name_format(self, csl_style):
+        """
+        name format of the author styles of custom format, from the name element of the bibliography layout
+
+        :param csl_style: ie, ads-author-A
+        :return: NameFormat, that formats the names as plain text
+        """
+        name_format = self.name_formats.get(csl_style)
+        if name_format is None:
+            bib_style = self.load(csl_style)
+            # the terms (ie, and) are preformatted by the formatter of the style
+            bib_style.root.formatter = formatter.plain
+            layout = bib_style.root.bibliography.layout
+            name_format = NameFormat(layout.find('cs:names', layout.nsmap).name)
+            with self.lock:
+                name_format = self.name_formats.setdefault(csl_style, name_format)
+        return name_format
+
+    def get_dependency(self, csl_style):
+        """
+
+        :param csl_style:
+        :return: adsCSLDependency of the style
+        """
+        dependency = self.dependencies.get(csl_style)
+        if dependency is None:
+            dependency = adsCSLDependency.none
+            bib_style = self.acquire(csl_style)
+            try:
+                # sort keys are not looked at, since sort is not applied
+                for element in bib_style.root.iter():
+                    if not isinstance(element.tag, basestring) or element.tag.endswith('}key'):
+                        continue
+                    if ('year-suffix' in element.get('variable', '').split()) or (element.get('subsequent-author-substitute') is not None):
+                        dependency = adsCSLDependency.all
+                        break
+                    if 'citation-number' in element.get('variable', '').split():
+                        dependency = adsCSLDependency.position
+            finally:
+                self.release(csl_style, bib_style)
+            self.dependencies[csl_style] = dependency
+        return dependency
+
+
+csl_styles = CSLStyleCache(os.path.realpath(__file__ + "/../../cslstyles"))
+
+
+class CSLKeys(list):
+    """
+    keys registered with citeproc's bibliography, with the position of each key indexed
+    citeproc looks for the key in the list to register a record, and to render its citation
+    (and citation number), which makes registering and citing all the records quadratic
+    """
+    def __init__(self):
+        list.__init__(self)
+        self.positions = {}
+
+    def append(self, key):
+        self.positions.setdefault(key, len(self))
+        list.append(self, key)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def index(self, key, *args):
+        if args:
+            return list.index(self, key, *args)
+        if key not in self.positions:
+            raise ValueError('{} is not in list'.format(key))
+        return self.positions[key]
+
+
+def get_bibliography(bib_style, for_cls, output=formatter.html, fast_registration=False):
+    """
+
+    :param bib_style: parsed csl style
+    :param for_cls: CSLJson records
+    :param output: citeproc output formatter
+    :param fast_registration: if True the keys are indexed, see CSLKeys
+    :return: citeproc bibliography, and the citations registered with it
+    """
+    # Process the JSON data to generate a citaproc-py BibliographySource.
+    bib_source = CiteProcJSON(for_cls)
+
+    # Create the citaproc-py bibliography, passing it the:
+    # * CitationStylesStyle,
+    # * BibliographySource (CiteProcJSON in this case), and
+    # * a formatter (plain, html, or you can write a custom formatter)
+    # we are going to have CSL format everything using html, or latex for latex export,
+    # and then format it as we need to match the classic output
+    bibliography = CitationStylesBibliography(bib_style, bib_source, output)
+    if fast_registration:
+        bibliography.keys = CSLKeys()
+
+    # Processing citations in a document needs to be done in two passes as for some
+    # CSL styles, a citation can depend on the order of citations in the
+    # bibliography and thus on citations following the current one.
+    # For this reason, we first need to register all citations with the
+    # CitationStylesBibliography.
+    citation_item = []
+    for item in for_cls:
+        citation = Citation([CitationItem(item['id'])])
+        citation_item.append(citation)
+        bibliography.register(citation)
+    return bibliography, citation_item
+
+
+def render_records(csl_style, for_cls, with_citation=True, output=formatter.html, use_native=True, start=1, fast_registration=True):
+    """
+    render the records with the compiled native renderer if the style has one,
+    otherwise, or if any of the records is not supported natively, with citeproc
+
+    :param csl_style:
+    :param for_cls: CSLJson records
+    :param with_citation: if False only the bibliography is rendered
+    :param output: citeproc output formatter, html or cslLaTex
+    :param use_native: if False, render with citeproc
+    :param start: position of the first record in the export
+    :param fast_registration: if True, and the style does not depend on all the records, register the records with citeproc in linear time
+    :return: list of citations, list of bibliography entries, formatted by output, and True if rendered natively
+    """
+    # citeproc numbers the records from one, so records that are not at the start of the export have
+    # to be rendered natively if the style displays the number
+    native_only = (start > 1) and (csl_styles.get_dependency(csl_style) == adsCSLDependency.position)
+    native = csl_styles.get_native(csl_style, output) if use_native else None
+    if native is not None:
+        try:
+            citations, bibliography = native.render(for_cls, with_citation, start)
+            return citations, bibliography, True
+        except NativeUnsupported:
+            if native_only:
+                raise
+    elif native_only:
+        raise NativeUnsupported
+
+    # the parsed style is used exclusively while rendering, then goes back to the cache
+    bib_style = csl_styles.acquire(csl_style)
+    try:
+        fast_registration = fast_registration and (csl_styles.get_dependency(csl_style) != adsCSLDependency.all)
+        bibliography, citation_item = get_bibliography(bib_style, for_cls, output, fast_registration)
+        items = [str(item) for item in bibliography.bibliography()]
+        citations = [str(bibliography.cite(cita, '')) for cita in citation_item] if with_citation else []
+        return citations, items, False
+    finally:
+        csl_styles.release(csl_style, bib_style)
+
+
+def render_shard(task):
+    """
+    render one shard of the records in a worker process
+
+    :param task: csl style, records, with citation, module name of output formatter, use native, start, fast registration
+    :return: same as render_records
+    """
+    csl_style, for_cls, with_citation, output, use_native, start, fast_registration = task
+    return render_records(csl_style, for_cls, with_citation, importlib.import_module(output), use_native, start, fast_registration)
+
+
+class CSLRenderPool:
+    """
+    worker processes to render large exports in parallel, records are split into contiguous shards,
+    each shard is rendered by a worker with the styles preloaded, and the results are merged in order
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.pool = None
+        self.processes = 0
+        self.pid = None
+
+    def get_pool(self, processes):
+        """
+        the pool is created on first use in each process of the service, so it is not shared by forked workers
+
+        :param processes: number of worker processes
+        :return:
+        """
+        with self.lock:
+            if (self.pool is None) or (self.pid != os.getpid()) or (self.processes != processes):
+                if (self.pool is not None) and (self.pid == os.getpid()):
+                    self.pool.terminate()
+                self.pool = Pool(processes, initializer=csl_styles.preload)
+                self.processes = processes
+                self.pid = os.getpid()
+            return self.pool
+
+    def reset(self):
+        """
+        terminate the worker processes
+
+        :return:
+        """
+        with self.lock:
+            if (self.pool is not None) and (self.pid == os.getpid()):
+                self.pool.terminate()
+            self.pool = None
+
+    def render(self, csl_style, for_cls, with_citation, output, use_native, processes, timeout, fast_registration=True):
+        """
+
+        :param csl_style:
+        :param for_cls: CSLJson records
+        :param with_citation:
+        :param output: citeproc output formatter
+        :param use_native:
+        :param processes: number of worker processes
+        :param timeout: in seconds
+        :param fast_registration: see render_records
+        :return: same as render_records, or None if the records need to be rendered in one process
+        """
+        dependency = csl_styles.get_dependency(csl_style)
+        if dependency == adsCSLDependency.all:
+            return None
+        # only the native renderer can number the records of a shard from its position in the export
+        if (dependency == adsCSLDependency.position) and (not use_native or csl_styles.get_native(csl_style, output) is None):
+            return None
+        shard_size = int(math.ceil(len(for_cls) / float(processes)))
+        tasks = [(csl_style, for_cls[i:i + shard_size], with_citation, output.__name__, use_native, i + 1, fast_registration)
+                 for i in range(0, len(for_cls), shard_size)]
+        try:
+            shards = self.get_pool(processes).map_async(render_shard, tasks).get(timeout)
+        except NativeUnsupported:
+            return None
+        except TimeoutError:
+            # the workers are still busy with the shards, so they are stopped and a new pool is created on next use
+            self.reset()
+            return None
+        citations, bibliography, natively = [], [], True
+        for shard_citations, shard_bibliography, shard_natively in shards:
+            citations.extend(shard_citations)
+            bibliography.extend(shard_bibliography)
+            natively = natively and shard_natively
+        return citations, bibliography, natively
+
+
+csl_pool = CSLRenderPool()
+
 
 class CSL:
 
@@ -36,40 +373,44 @@ class CSL:
         self.csl_style = csl_style
         self.export_format = export_format
         self.journal_format = journal_format
-        self.citation_item = []
         self.bibcode_list = []
+        # number of authors of the records keyed by bibcode, for et al. rewriting
+        self.author_count = {}
 
         self.__update_data()
 
-        # Process the JSON data to generate a citaproc-py BibliographySource.
-        bib_source = CiteProcJSON(self.for_cls)
-
-        csl_style_fullpath = os.path.realpath(__file__ + "/../../cslstyles")
-
-        # load a CSL style (from the current directory)
-        bib_style = CitationStylesStyle(os.path.join(csl_style_fullpath + '/' + csl_style), validate=False)
-
-        # Create the citaproc-py bibliography, passing it the:
-        # * CitationStylesStyle,
-        # * BibliographySource (CiteProcJSON in this case), and
-        # * a formatter (plain, html, or you can write a custom formatter)
-        # we are going to have CSL format everything using html and then format it as we need to match the
-        # classic output
-        self.bibliography = CitationStylesBibliography(bib_style, bib_source, formatter.html)
-
-        # Processing citations in a document needs to be done in two passes as for some
-        # CSL styles, a citation can depend on the order of citations in the
-        # bibliography and thus on citations following the current one.
-        # For this reason, we first need to register all citations with the
-        # CitationStylesBibliography.
-
         for item in self.for_cls:
-            citation = Citation([CitationItem(item['id'])])
-            self.citation_item.append(citation)
-            self.bibliography.register(citation)
             # this is actually a bibcode that was passed in, but we have to use
             # one of CSLs predefined ids
-            self.bibcode_list.append(''.join(item.get('locator', '')))
+            bibcode = ''.join(item.get('locator', ''))
+            self.bibcode_list.append(bibcode)
+            self.author_count[bibcode] = len(item.get('author', []))
+
+
+    @timed('citeproc')
+    def __get_rendered(self, with_citation=True, output=formatter.html):
+        """
+        render the records, across the worker processes if configured and the export is large enough
+
+        :param with_citation: if False only the bibliography is rendered
+        :param output: citeproc output formatter, html or cslLaTex
+        :return: list of citations, and list of bibliography entries, formatted by output
+        """
+        use_native = current_app.config.get('EXPORT_SERVICE_CSL_NATIVE', True)
+        fast_registration = current_app.config.get('EXPORT_SERVICE_CSL_FAST_REGISTRATION', True)
+        processes = current_app.config.get('EXPORT_SERVICE_CSL_PROCESSES', 1)
+        rendered = None
+        if (processes > 1) and (len(self.for_cls) >= current_app.config.get('EXPORT_SERVICE_CSL_PARALLEL_MIN_RECORDS', 500)):
+            rendered = csl_pool.render(self.csl_style, self.for_cls, with_citation, output, use_native, processes,
+                                       current_app.config.get('EXPORT_SERVICE_CSL_PARALLEL_TIMEOUT', 60), fast_registration)
+            if rendered is None:
+                current_app.logger.info('{style} records not rendered in parallel, rendering in process'.format(style=self.csl_style))
+        if rendered is None:
+            rendered = render_records(self.csl_style, self.for_cls, with_citation, output, use_native, fast_registration=fast_registration)
+        citations, bibliography, natively = rendered
+        if use_native and not natively and (csl_styles.get_native(self.csl_style, output) is not None):
+            current_app.logger.info('records not supported by native renderer of {style}, rendered with citeproc'.format(style=self.csl_style))
+        return citations, bibliography
 
 
     def __update_data(self):
@@ -77,43 +418,64 @@ class CSL:
         Update the container-title if needed for the specific style
         also apply latex encoding if needed for both title and container-title
         also for icarus if there is page range, assign it to PMCID
+        records are shared by the styles rendering them, so the style renders a view
+        of each record with its own fields, and the record is not updated
 
         :return:
         """
+        for_cls = []
+        # titles are latex encoded for all the records at once
+        with phase('latex'):
+            for data in self.for_cls:
+                view = dict(data)
+                view.update(self.__get_style_fields(data))
+                for_cls.append(view)
+        self.for_cls = for_cls
+
+
+    def __get_style_fields(self, data):
+        """
+
+        :param data: CSLRecord
+        :return: dict of the fields of the record that are different for the style
+        """
+        fields = {}
         # for mnras we need abbreviation of the journal names
         # available from adsutils
         if (self.csl_style == 'mnras'):
-            for data in self.for_cls:
-                data['container-title-short'] = Format(None).get_pub_abbrev(data['bibstem'])
+            fields['container-title-short'] = journal_index.get_abbreviation(data['bibstem'])
         elif (self.csl_style == 'aastex') or (self.csl_style == 'aasj') or (self.csl_style == 'aspc'):
             # use macro (default)
             if self.journal_format == adsJournalFormat.macro or self.journal_format == adsJournalFormat.default:
-                journal_macros = dict([(k, v) for k, v in current_app.config['EXPORT_SERVICE_AASTEX_JOURNAL_MACRO']])
-                for data in self.for_cls:
-                    data['container-title'] = journal_macros.get(Format(None).get_bibstem(data['bibstem']), encode_laTex(data['container-title']))
-                    data['title'] = encode_laTex(data['title'])
+                fields['container-title'] = journal_index.get_macro(data['bibstem'])
+                if fields['container-title'] is None:
+                    fields['container-title'] = data.derive('latex', 'container-title', encode_laTex)
+                fields['title'] = data.derive('latex', 'title', encode_laTex)
             elif self.journal_format == adsJournalFormat.abbreviated:
-                for data in self.for_cls:
-                    data['container-title'] = Format(None).get_pub_abbrev(data['bibstem'])
-                    data['title'] = encode_laTex(data['title'])
+                fields['container-title'] = journal_index.get_abbreviation(data['bibstem'])
+                fields['title'] = data.derive('latex', 'title', encode_laTex)
             elif self.journal_format == adsJournalFormat.full:
-                for data in self.for_cls:
-                    data['container-title'] = encode_laTex(data['container-title'])
-                    data['title'] = encode_laTex(data['title'])
+                fields['container-title'] = data.derive('latex', 'container-title', encode_laTex)
+                fields['title'] = data.derive('latex', 'title', encode_laTex)
         # for SoPh we use journal abbreviation for some special journals only
         elif (self.csl_style == 'soph'):
-            journal_abbrevation = current_app.config['EXPORT_SERVICE_SOPH_JOURNAL_ABBREVIATION']
-            for data in self.for_cls:
-                data['container-title'] = journal_abbrevation.get(Format(None).get_bibstem(data['bibstem']), encode_laTex(data['container-title']))
+            fields['container-title'] = journal_index.get_soph_abbreviation(data['bibstem'])
+            if fields['container-title'] is None:
+                fields['container-title'] = data.derive('latex', 'container-title', encode_laTex)
         # for the rest just run title and container-title through latex encoding
         elif (self.csl_style == 'icarus') or (self.csl_style == 'apsj'):
-            for data in self.for_cls:
-                data['container-title'] = encode_laTex(data['container-title'])
-                data['title'] = encode_laTex(data['title'])
+            fields['container-title'] = data.derive('latex', 'container-title', encode_laTex)
+            fields['title'] = data.derive('latex', 'title', encode_laTex)
         if (self.csl_style == 'icarus'):
-            for data in self.for_cls:
-                if len(data['page']) > 0:
-                    data['PMCID'] = data['page']
+            if len(data['page']) > 0:
+                fields['PMCID'] = data['page']
+        # the latex formatter only escapes what citeproc generates, so convert html in the fields here
+        if (self.export_format == adsFormatter.latex):
+            for key, value in data.items():
+                value = fields.get(key, value)
+                if isinstance(value, basestring) and (('<' in value) or ('&' in value)):
+                    fields[key] = html_to_laTex(value)
+        return fields
 
 
     def __update_author_etal(self, author, the_rest, bibcode):
@@ -128,11 +490,9 @@ class CSL:
         # hence, from CSL we get something like Siltala, J. et al.\
         # but we need to turn it to Siltala, J., and 12 colleagues
         if (self.csl_style == 'icarus'):
-            if (' et al.' in author):
-                for data in self.for_cls:
-                    if (data['locator'] == bibcode):
-                        author = author.replace('et al.', 'and {} colleagues'.format(len(data['author']) - 1))
-                        the_rest = the_rest.lstrip('\\')
+            if (' et al.' in author) and (bibcode in self.author_count):
+                author = author.replace('et al.', 'and {} colleagues'.format(self.author_count[bibcode] - 1))
+                the_rest = the_rest.lstrip('\\')
         elif (self.csl_style == 'soph'):
             if ('et al.' in author):
                 author = author.replace('et al.', 'and, ...')
@@ -179,6 +539,17 @@ class CSL:
         return biblio_author, biblio_rest
 
 
+    def __encode_author(self, author):
+        """
+
+        :param author: author(s) rendered by cslLaTex
+        :return:
+        """
+        # names are passed through by the formatter, since they need to be initialized first,
+        # so encode them here, but leave the and symbol that the formatter has already escaped
+        return '\\&'.join(encode_laTex_author(part) for part in author.split('\\&'))
+
+
     def __format_output(self, cita, biblio, bibcode, index):
         """
 
@@ -199,16 +570,14 @@ class CSL:
             cita_author, cita_year = self.__tokenize_cita(cita)
             biblio_author, biblio_rest = self.__tokenize_biblio(biblio)
 
-        # encode author if latex format
+        # encode author if latex format, the rest is already latex from the formatter
         if (self.export_format == adsFormatter.latex):
-            cita_author = encode_laTex_author(cita_author)
-            biblio_author = encode_laTex_author(biblio_author)
+            cita_author = self.__encode_author(cita_author)
+            biblio_author = self.__encode_author(biblio_author)
 
             # some adjustments to the what is returned from CSL that we can not do with CSL
-            cita_author = html_to_laTex(self.__update_author_etal_add_emph(cita_author))
+            cita_author = self.__update_author_etal_add_emph(cita_author)
             biblio_author, biblio_rest = self.__update_author_etal(biblio_author, biblio_rest, bibcode)
-            biblio_author = html_to_laTex(biblio_author)
-            biblio_rest = html_to_laTex(biblio_rest)
         else:
             biblio_author, biblio_rest = self.__update_author_etal(biblio_author, biblio_rest, bibcode)
 
@@ -225,6 +594,7 @@ class CSL:
         return format_style[self.csl_style].format(cita_author, cita_year, bibcode, biblio_author, biblio_rest)
 
 
+    @timed('render')
     def get(self, export_organizer=adsOrganizer.plain):
         """
 
@@ -236,18 +606,22 @@ class CSL:
             num_docs = 0
             if (self.export_format == adsFormatter.unicode) or (self.export_format == adsFormatter.latex):
                 num_docs = len(self.bibcode_list)
-                for cita, item, bibcode, i in zip(self.citation_item, self.bibliography.bibliography(), self.bibcode_list, range(len(self.bibcode_list))):
-                    results.append(self.__format_output(str(self.bibliography.cite(cita, '')), str(item), bibcode, i+1) + '\n')
+                output = cslLaTex if (self.export_format == adsFormatter.latex) else formatter.html
+                citations, bibliography = self.__get_rendered(output=output)
+                for cita, item, bibcode, i in zip(citations, bibliography, self.bibcode_list, range(len(self.bibcode_list))):
+                    results.append(self.__format_output(cita, item, bibcode, i+1) + '\n')
             result_dict = {}
             result_dict['msg'] = 'Retrieved {} abstracts, starting with number 1.'.format(num_docs)
             result_dict['export'] = ''.join(result for result in results)
             return result_dict
         if (export_organizer == adsOrganizer.citation_bibliography):
-            for cita, item, bibcode in zip(self.citation_item, self.bibliography.bibliography(), self.bibcode_list):
-                results.append(bibcode + '\n' + str(self.bibliography.cite(cita, '')) + '\n' + str(item) + '\n')
+            citations, bibliography = self.__get_rendered()
+            for cita, item, bibcode in zip(citations, bibliography, self.bibcode_list):
+                results.append(bibcode + '\n' + cita + '\n' + item + '\n')
             return ''.join(result for result in results)
         if (export_organizer == adsOrganizer.bibliography):
-            for item in self.bibliography.bibliography():
-                results.append(str(item).replace('&amp;', '&'))
+            _, bibliography = self.__get_rendered(with_citation=False)
+            for item in bibliography:
+                results.append(item.replace('&amp;', '&'))
             return results
         return None
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
 from exportsrv.formatter.format import Format
+from exportsrv.formatter.authorName import author_names
+from exportsrv.timing import timed
 
 # This class accepts JSON object created by Solr and reformats it
 # for the CSL processor. To use
@@ -8,9 +10,43 @@ from exportsrv.formatter.format import Format
 # For custom formatting we only need the Author section filled, hence
 # use
 #    jsonForCSL = CSLJson(jsonFromSolr).get_author()
+# Records are built once, and are not updated by CSL, so the same records
+# can be rendered with several styles
+#    CSL(jsonForCSL, 'aastex').get(), CSL(jsonForCSL, 'mnras').get()
+
+class CSLRecord(dict):
+    """
+    CSLJson record of one document, shared by the styles rendering it
+    values the styles derive from its fields (ie, latex encoded title) are kept with the record
+    """
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.derived = {}
+
+    def derive(self, name, field, function):
+        """
+
+        :param name: name of the derivation, ie latex
+        :param field:
+        :param function: of the value of the field
+        :return: function of the value of the field, computed the first time it is asked for
+        """
+        key = (name, field)
+        if key not in self.derived:
+            self.derived[key] = function(self[field])
+        return self.derived[key]
+
 
 class CSLJson(Format):
 
+    def __init__(self, from_solr):
+        """
+
+        :param from_solr:
+        """
+        Format.__init__(self, from_solr)
+        self.csl_list = None
+
     def __get_cls_author_list(self, a_doc):
         """
         format authors
@@ -20,13 +56,7 @@ class CSLJson(Format):
         """
         author_list = []
         if 'author' in a_doc:
-            for author in a_doc['author']:
-                author_parts = author.split(', ')
-                oneAuthor = {}
-                oneAuthor['family'] = author_parts[0]
-                if (len(author_parts) >= 2):
-                    oneAuthor['given'] = author_parts[1]
-                author_list.append(oneAuthor)
+            author_list = [name.get_csl() for name in author_names.get(a_doc['author'])]
         if len(author_list) == 0:
             author_list.append({'family':'No author'})
         return author_list
@@ -88,11 +118,9 @@ class CSLJson(Format):
         :return: 
         """
         a_doc = self.from_solr['response'].get('docs')[index]
-        data = {}
-        data['id'] = 'ITEM-{0}'.format(index + 1)
+        data = CSLRecord(self.__get_doc_json_author(index))
         data['issued'] = ({'date-parts': [[int(a_doc['year'])]]})
         data['title'] = ''.join(a_doc.get('title', ''))
-        data['author'] = self.__get_cls_author_list(a_doc)
         data['container-title'] = self.__get_doc_pub(a_doc)
         data['container-title-short'] = ''
         data['volume'] = a_doc.get('volume', '')
@@ -111,7 +139,6 @@ class CSLJson(Format):
             data['page-first'] = data['PMCID']
         # if there is a page_range, assign it to page, only needed for icarus
         data['page'] = a_doc.get('page_range', '')
-        data['type'] = self.__get_doc_type(a_doc.get('doctype', ''))
         data['locator'] = a_doc.get('bibcode')
         data['genre'] = str(a_doc.get('bibcode')[4:13]).strip('.')
         data['publisher'] = a_doc.get('publisher', '')
@@ -141,12 +168,16 @@ class CSLJson(Format):
         return data
 
 
+    @timed('normalize')
     def get_author(self):
         """
         returns JSON code that has authors only
 
         :return:
         """
+        # if the full records are already built, the authors are taken from them
+        if self.csl_list is not None:
+            return [dict((key, data[key]) for key in ('id', 'author', 'type')) for data in self.csl_list]
         csl_list = []
         if (self.status == 0):
             for index in range(self.get_num_docs()):
@@ -154,14 +185,17 @@ class CSLJson(Format):
         return csl_list
 
 
+    @timed('normalize')
     def get(self):
         """
         returns JSON code that includes all the fields to build full citation and bibliography
 
-        :return:
+        :return: list of CSLRecord, built once
         """
-        csl_list = []
-        if (self.status == 0):
-            for index in range(self.get_num_docs()):
-                csl_list.append(self.__get_doc_json(index))
-        return csl_list
+        if self.csl_list is None:
+            csl_list = []
+            if (self.status == 0):
+                for index in range(self.get_num_docs()):
+                    csl_list.append(self.__get_doc_json(index))
+            self.csl_list = csl_list
+        return self.csl_list
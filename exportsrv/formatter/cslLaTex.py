@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+from citeproc.py2compat import *
+
+# This module is a citeproc output formatter that emits latex markup, the same interface
+# as citeproc.formatter.html, so that latex export does not need to go through html and
+# convert the tags back to latex afterward
+#    CitationStylesBibliography(bib_style, bib_source, cslLaTex)
+# Only the text citeproc preformats (terms, values, and symbol) is escaped here, the
+# variables are passed through as is, titles and journals are already latex encoded,
+# and authors are encoded after rendering, once the names are initialized.
+
+
+def preformat(text):
+    """
+
+    :param text:
+    :return: text with latex special characters of the terms escaped
+    """
+    return str(text).replace('&', '\\&').replace('<', '$<$').replace('>', '$>$')
+
+
+class LaTexWrapper(str):
+    template = '{text}'
+
+    @classmethod
+    def _wrap(cls, text):
+        # text can be citeproc's String or MixedString
+        return cls.template.format(text=str(text))
+
+    def __new__(cls, text):
+        return super(LaTexWrapper, cls).__new__(cls, cls._wrap(text))
+
+
+class Italic(LaTexWrapper):
+    template = '{{\\it {text}}}'
+
+
+class Oblique(Italic):
+    pass
+
+
+class Bold(LaTexWrapper):
+    template = '{{\\bf {text}}}'
+
+
+class Light(LaTexWrapper):
+    pass
+
+
+class Underline(LaTexWrapper):
+    template = '\\underline{{{text}}}'
+
+
+class Superscript(LaTexWrapper):
+    template = '$^{{{text}}}$'
+
+
+class Subscript(LaTexWrapper):
+    template = '$_{{{text}}}$'
+
+
+class SmallCaps(LaTexWrapper):
+    template = '{{\\sc {text}}}'
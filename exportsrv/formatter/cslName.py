@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+from citeproc.py2compat import *
+
+# This module formats a list of names the way citeproc's Name element does, with the options of
+# the element resolved once, and each name formatted from its parts in one pass over the list.
+# It is used by the native renderer, and for the author specifiers of custom format, which only
+# need the authors formatted, not a whole citeproc bibliography
+#    name_format = NameFormat(names_element.name)
+#    name_format.format([get_name_parts(name) for name in for_cls[0]['author']])
+
+
+def get_name_parts(name):
+    """
+
+    :param name: CSLJson name
+    :return: (given, family, dropping particle, non-dropping particle, suffix)
+    """
+    return (name.get('given'), name.get('family'), name.get('dropping-particle'),
+            name.get('non-dropping-particle'), name.get('suffix'))
+
+
+class NameFormat:
+
+    def __init__(self, element, context=None):
+        """
+        the options are resolved by citeproc, inherited from the citation or bibliography and the style,
+        terms are preformatted with the formatter of the style
+
+        :param element: citeproc's Name element
+        :param context: element citeproc passes down as context
+        """
+        get_option = lambda name: element.get_option(name, context)
+
+        self.and_ = get_option('and')
+        self.delimiter = get_option('delimiter')
+        self.delimiter_precedes_et_al = get_option('delimiter-precedes-et-al')
+        self.delimiter_precedes_last = get_option('delimiter-precedes-last')
+        self.et_al_min = get_option('et-al-min')
+        self.et_al_use_first = get_option('et-al-use-first')
+        self.et_al_last = get_option('et-al-use-last') and self.et_al_use_first <= self.et_al_min - 2
+        self.initialize_with = get_option('initialize-with')
+        self.initialize_with_hyphen = get_option('initialize-with-hyphen')
+        self.name_as_sort_order = get_option('name-as-sort-order')
+        self.sort_separator = get_option('sort-separator')
+        self.form = get_option('form')
+        self.demote_ndp = get_option('demote-non-dropping-particle')
+
+        self.and_term = None
+        if self.and_ == 'text':
+            term = element.get_term('and')
+            if term is not None:
+                self.and_term = str(term.single)
+        elif self.and_ == 'symbol':
+            self.and_term = element.preformat('&')
+        et_al = element.et_al()
+        self.et_al = str(et_al) if et_al is not None else None
+        self.ellipsis = element.unicode_character('horizontal ellipsis')
+        # joining the names uses the delimiter of the element, if any, instead of the default
+        self.own_delimiter = element.get('delimiter')
+
+    def __join(self, strings, default_delimiter):
+        """
+        citeproc's Delimited.join
+
+        :param strings:
+        :param default_delimiter:
+        :return:
+        """
+        if self.own_delimiter is not None:
+            return self.own_delimiter.join(strings)
+        return default_delimiter.join(strings)
+
+    def initialize(self, given):
+        """
+        citeproc's Name.initialize
+
+        :param given: given name
+        :return: initials
+        """
+        if self.initialize_with_hyphen:
+            hyphen_parts = given.split('-')
+        else:
+            hyphen_parts = [given.replace('-', ' ')]
+        result_parts = []
+        for hyphen_part in hyphen_parts:
+            parts = hyphen_part.replace('.', ' ').split()
+            hyphen_result = ''
+            group = []
+            for part in parts:
+                if part[0].isupper():
+                    group.append(part[0])
+                else:
+                    # don't initialize particles (which aren't capitalized)
+                    hyphen_result += self.initialize_with.join(group) + self.initialize_with + ' ' + part + ' '
+                    group = []
+            hyphen_result += self.initialize_with.join(group) + self.initialize_with
+            # remove double spaces
+            hyphen_result = ' '.join(hyphen_result.split())
+            result_parts.append(hyphen_result)
+        return '-'.join(result_parts)
+
+    def format(self, names):
+        """
+
+        :param names: list of name parts, see get_name_parts
+        :return: formatted list of names
+        """
+        output = []
+        et_al_truncate = (len(names) > 1 and self.et_al_min and len(names) >= self.et_al_min)
+        if et_al_truncate:
+            if self.et_al_last:
+                names = names[:self.et_al_use_first] + [names[-1]]
+            else:
+                names = names[:self.et_al_use_first]
+        for i, (given, family, dp, ndp, suffix) in enumerate(names):
+            if given is not None and self.initialize_with is not None:
+                given = self.initialize(given)
+            if self.form == 'long':
+                if (self.name_as_sort_order == 'all' or (self.name_as_sort_order == 'first' and i == 0)):
+                    if self.demote_ndp in ('never', 'sort-only'):
+                        family = ' '.join([n for n in (ndp, family) if n])
+                        given = ' '.join([n for n in (given, dp) if n])
+                    else:
+                        given = ' '.join([n for n in (given, dp, ndp) if n])
+                    text = self.sort_separator.join([n for n in (family, given, suffix) if n])
+                else:
+                    family = ' '.join([n for n in (dp, ndp, family) if n])
+                    text = ' '.join([n for n in (given, family, suffix) if n])
+            else:
+                text = ' '.join([n for n in (ndp, family) if n])
+            output.append(text)
+
+        if et_al_truncate and self.et_al:
+            if self.et_al_last:
+                output[-1] = self.ellipsis + ' ' + output[-1]
+                return self.__join(output, self.delimiter)
+            if (self.delimiter_precedes_et_al == 'always' or
+                    (self.delimiter_precedes_et_al == 'contextual' and len(output) >= 2)):
+                output.append(self.et_al)
+                return self.__join(output, self.delimiter)
+            return self.__join(output, self.delimiter) + ' ' + self.et_al
+        if self.and_ is not None and len(output) > 1:
+            text = self.__join(output[:-1], ', ')
+            if (self.delimiter_precedes_last == 'always' or
+                    (self.delimiter_precedes_last == 'contextual' and len(output) > 2)):
+                text = self.__join([text, ''], '')
+            else:
+                text += ' '
+            return text + '{} '.format(self.and_term) + output[-1]
+        return self.__join(output, self.delimiter)
@@ -0,0 +1,807 @@
+# -*- coding: utf-8 -*-
+
+from citeproc import NAMES, DATES
+from citeproc import formatter
+from citeproc.py2compat import *
+from citeproc.source import Pages
+import re
+import unicodedata
+
+from exportsrv.formatter.cslName import NameFormat, get_name_parts
+
+# This module compiles a parsed csl style into python functions that render a record
+# exactly as citeproc-py does, without walking the style xml and running xpath for every record.
+# Options and terms are resolved once, at compile time, through citeproc itself.
+# Compiling covers the constructs our built-in styles use, anything else raises
+# NativeUnsupported when it is reached, and the caller falls back to citeproc.
+#    native = CSLNative(CitationStylesStyle(...))
+#    citations, bibliography = native.render(for_cls)
+# Output is the same that citeproc returns with the same output formatter (html, or cslLaTex),
+# so it goes through the same post processing.
+
+
+class NativeUnsupported(Exception):
+    """
+    the record (or style) needs something that is not compiled, use citeproc instead
+    """
+    pass
+
+
+class NativeSkip(Exception):
+    """
+    same as citeproc's VariableError, the element does not render for this record
+    """
+    pass
+
+
+RE_NUMERIC = re.compile(r'^(\d+).*')
+RE_RANGE = re.compile(r'^(\d+)\s*-\s*(\d+)$')
+RE_MULTIPLE_NUMBERS = re.compile(r'\d+[^\d]+\d+')
+
+STOP_WORDS = ['a', 'an', 'and', 'as', 'at', 'but', 'by', 'down', 'for', 'from', 'in', 'into', 'nor', 'of', 'on', 'onto',
+              'or', 'over', 'so', 'the', 'till', 'to', 'up', 'via', 'with', 'yet']
+
+
+class NativeRecord:
+    """
+    one CSLJson record, with the accessors of citeproc's Reference
+    """
+    def __init__(self, data, number):
+        """
+
+        :param data: CSLJson record
+        :param number: citation number, position of the record plus one
+        """
+        self.data = data
+        self.number = number
+        self.type = data.get('type')
+        self.pages = None
+
+    def has(self, variable):
+        """
+
+        :param variable:
+        :return: True if the variable is in the reference, even if empty
+        """
+        if variable in ('type', 'key'):
+            return True
+        if variable == 'id':
+            return False
+        return variable in self.data
+
+    def get_string(self, variable):
+        """
+
+        :param variable:
+        :return:
+        """
+        if not self.has(variable):
+            raise NativeSkip
+        if variable == 'page':
+            return str(self.get_pages())
+        if variable.replace('-', '_') in NAMES or variable.replace('-', '_') in DATES or variable in ('type', 'key'):
+            raise NativeUnsupported
+        text = str(self.data[variable])
+        if '<span class="nocase">' in text.lower():
+            raise NativeUnsupported
+        return text
+
+    def get_pages(self):
+        """
+        page is parsed the same way CiteProcJSON.parse_page does
+
+        :return:
+        """
+        if self.pages is None:
+            if not self.has('page'):
+                raise NativeSkip
+            page = str(self.data['page']).replace(unicodedata.lookup('EN DASH'), '-')
+            if '-' in page:
+                parts = [number.strip() for number in page.split('-')]
+                if len(parts) != 2:
+                    raise NativeUnsupported
+                first, last = parts
+                if len(last) < len(first):
+                    last = first[:- len(last)] + last
+                self.pages = Pages(first=first, last=last)
+            else:
+                self.pages = Pages(first=page)
+        return self.pages
+
+    def get_names(self, variable):
+        """
+
+        :param variable:
+        :return: list of (given, family, dropping particle, non-dropping particle, suffix)
+        """
+        names = []
+        for name in self.data[variable]:
+            if 'family' not in name:
+                raise NativeUnsupported
+            names.append(get_name_parts(name))
+        return names
+
+    def get_year(self, variable):
+        """
+
+        :param variable:
+        :return: year, or None if there is no date
+        """
+        if not self.has(variable):
+            raise NativeSkip
+        date = self.data[variable]
+        date_parts = date.get('date-parts', [])
+        if len(date_parts) == 0:
+            if 'literal' in date:
+                raise NativeUnsupported
+            return None
+        if len(date_parts) != 1 or len(date_parts[0]) != 1:
+            raise NativeUnsupported
+        return int(date_parts[0][0])
+
+
+def get_localname(element):
+    """
+
+    :param element:
+    :return: tag without the namespace
+    """
+    return element.tag.split('}')[-1]
+
+
+def unsupported(*args, **kwargs):
+    raise NativeUnsupported
+
+
+def get_term(element, name, form=None, plural=False):
+    """
+    terms are looked up once, and kept as plain strings, since concatenating citeproc's String makes a list
+
+    :param element:
+    :param name:
+    :param form:
+    :param plural:
+    :return: preformatted term, or None if there is no such term
+    """
+    term = element.get_term(name, form)
+    if term is None:
+        return None
+    return str(term.multiple if plural else term.single)
+
+
+def compile_format(element):
+    """
+    font style, variant, weight, decoration, and vertical alignment, in the order citeproc applies them
+
+    :param element:
+    :return: function that formats text
+    """
+    output = element.get_formatter()
+    wrappers = []
+    for attribute, default, values in [('font-style', 'normal', {'italic': output.Italic, 'oblique': output.Oblique}),
+                                       ('font-variant', 'normal', {'small-caps': output.SmallCaps}),
+                                       ('font-weight', 'normal', {'bold': output.Bold, 'light': output.Light}),
+                                       ('text-decoration', 'none', {'underline': output.Underline}),
+                                       ('vertical-align', 'baseline', {'sup': output.Superscript, 'sub': output.Subscript})]:
+        value = element.get(attribute, default)
+        if value == default:
+            continue
+        if value not in values:
+            return unsupported
+        wrappers.append(values[value])
+    if len(wrappers) == 0:
+        return None
+    def format(text):
+        for wrapper in wrappers:
+            text = wrapper._wrap(text)
+        return text
+    return format
+
+
+def compile_case(element, language):
+    """
+
+    :param element:
+    :param language:
+    :return: function that applies text-case, or None
+    """
+    text_case = element.get('text-case')
+    if text_case is None:
+        return None
+    if language != 'en' and text_case == 'title':
+        text_case = 'sentence'
+    if text_case == 'lowercase':
+        return lambda text: text.lower()
+    if text_case == 'uppercase':
+        return lambda text: text.upper()
+    if text_case == 'capitalize-first':
+        return lambda text: text[0].upper() + text[1:]
+    if text_case == 'capitalize-all':
+        return lambda text: ' '.join(word[0].upper() + word[1:] for word in text.split())
+    if text_case == 'title':
+        def title(text):
+            output = []
+            prev = ':'
+            is_upper = text.isupper()
+            for word in text.split():
+                if not is_upper and not word.isupper():
+                    word = word.lower()
+                    if (word not in STOP_WORDS or prev in (':', '.')):
+                        word = word[0].upper() + word[1:]
+                prev = word[-1]
+                output.append(word)
+            return ' '.join(output)
+        return title
+    if text_case == 'sentence':
+        def sentence(text):
+            output = []
+            is_upper = text.isupper()
+            for i, word in enumerate(text.split()):
+                if not is_upper and not word.isupper():
+                    word = word.lower()
+                if i == 0:
+                    word = word[0].upper() + word[1:]
+                output.append(word)
+            return ' '.join(output)
+        return sentence
+    return None
+
+
+def compile_markup(element, language=None, case=False, strip_periods=False, quote=False):
+    """
+    markup applied to the rendered text of an element, if the text is not empty
+
+    :param element:
+    :param language:
+    :param case: apply text-case
+    :param strip_periods: apply strip-periods
+    :param quote: apply quotes
+    :return: function that marks up the text
+    """
+    prefix = element.get('prefix', '')
+    suffix = element.get('suffix', '')
+    format = compile_format(element)
+    text_case = compile_case(element, language) if case else None
+    strip = strip_periods and element.get('strip-periods', 'false').lower() == 'true'
+    if quote and element.get('quotes', 'false').lower() == 'true':
+        quotes = (get_term(element, 'open-quote'), get_term(element, 'close-quote'))
+    else:
+        quotes = None
+    def markup(text):
+        if not text:
+            return None
+        if isinstance(text, int):
+            if strip or text_case is not None or quotes is not None:
+                raise NativeUnsupported
+            text = str(text)
+        if strip:
+            text = text.replace('.', '')
+        if text_case is not None:
+            text = text_case(text)
+        if format is not None:
+            text = format(text)
+        if quotes is not None:
+            text = quotes[0] + text + quotes[1]
+        return prefix + text + suffix
+    return markup
+
+
+def join(strings, delimiter):
+    """
+    citeproc's Delimited.join
+
+    :param strings:
+    :param delimiter:
+    :return:
+    """
+    strings = [string for string in strings if string is not None]
+    if len(strings) == 0:
+        return ''
+    return delimiter.join(strings)
+
+
+class CSLNative:
+
+    def __init__(self, bib_style, output=formatter.html):
+        """
+        compile the parsed style, the compiled functions do not keep any reference to the style,
+        so they can be used by multiple threads at the same time
+
+        :param bib_style: CitationStylesStyle
+        :param output: citeproc output formatter, html or cslLaTex
+        """
+        root = bib_style.root
+        # terms are preformatted with the formatter of the style, as citeproc does it
+        root.formatter = output
+        self.en_dash = root.unicode_character('EN DASH')
+        self.language = root.get('default-locale', 'en')[:2]
+        self.citation = self.__compile_layout(root.citation.layout, citation=True)
+        self.bibliography = self.__compile_layout(root.bibliography.layout, citation=False)
+
+    def __compile_children(self, element, context, **kwargs):
+        """
+
+        :param element:
+        :param context:
+        :return: list of compiled children
+        """
+        return [self.__compile(child, context, **kwargs) for child in element.iterchildren()
+                if isinstance(child.tag, basestring if PY2 else str)]
+
+    def __compile_render_children(self, element, context, **kwargs):
+        """
+        citeproc's Parent.render_children, children outputs are concatenated
+
+        :param element:
+        :param context:
+        :return:
+        """
+        children = self.__compile_children(element, context, **kwargs)
+        def render_children(record):
+            output = []
+            for child in children:
+                try:
+                    text = child(record)
+                except NativeSkip:
+                    continue
+                if text is not None:
+                    output.append(text)
+            if output:
+                return ''.join(output)
+            return None
+        return render_children
+
+    def __compile(self, element, context, **kwargs):
+        """
+
+        :param element:
+        :param context: element that citeproc passes down as context
+        :return: function that renders the record, returns None if nothing to render,
+                 raises NativeSkip where citeproc raises VariableError
+        """
+        compile = {'text': self.__compile_text,
+                   'group': self.__compile_group,
+                   'choose': self.__compile_choose,
+                   'names': self.__compile_names,
+                   'date': self.__compile_date,
+                   'number': self.__compile_number,
+                   'label': self.__compile_label}.get(get_localname(element))
+        if compile is None:
+            return unsupported
+        return compile(element, context, **kwargs)
+
+    def __compile_layout(self, layout, citation):
+        """
+
+        :param layout:
+        :param citation: True for citation layout, False for bibliography layout
+        :return:
+        """
+        render_children = self.__compile_render_children(layout, None)
+        prefix = layout.get('prefix', '')
+        suffix = layout.get('suffix', '')
+        format = compile_format(layout) or (lambda text: text)
+        if citation:
+            def render_citation(record):
+                output = render_children(record)
+                return format(prefix + (output if output is not None else '') + suffix)
+            return render_citation
+        def render_bibliography(record):
+            output = render_children(record)
+            if output is None:
+                raise NativeUnsupported
+            return format(prefix + output + suffix)
+        return render_bibliography
+
+    def __compile_text(self, element, context, **kwargs):
+        """
+
+        :param element:
+        :param context:
+        :return:
+        """
+        if context is None:
+            context = element
+        markup = compile_markup(element, self.language, case=True, strip_periods=True, quote=True)
+        if 'variable' in element.attrib:
+            process = self.__compile_variable(element)
+        elif 'macro' in element.attrib:
+            process = self.__compile_render_children(element.get_macro(element.get('macro')), context, **kwargs)
+        elif 'term' in element.attrib:
+            form = element.get('form', 'long')
+            text = get_term(element, element.get('term'), None if form == 'long' else form,
+                            element.get('plural', 'false').lower() == 'true')
+            if text is None:
+                return unsupported
+            process = lambda record: text
+        elif 'value' in element.attrib:
+            text = element.preformat(element.get('value'))
+            process = lambda record: text
+        else:
+            return unsupported
+        return lambda record: markup(process(record))
+
+    def __compile_variable(self, element):
+        """
+        citeproc's Text._variable
+
+        :param element:
+        :return:
+        """
+        variable = element.get('variable')
+        short = element.get('form') == 'short'
+        if variable == 'locator':
+            # citations never have locator
+            def process(record):
+                raise NativeSkip
+        elif variable == 'citation-number':
+            process = lambda record: record.number
+        elif variable == 'page':
+            range_format = element.get_root().get_option('page-range-format')
+            def process(record):
+                if short and record.has('page-short'):
+                    return record.get_string('page-short')
+                return self.__format_page(record.get_pages(), range_format)
+        elif variable == 'page-first':
+            def process(record):
+                if short and record.has('page-first-short'):
+                    return record.get_string('page-first-short')
+                return str(record.get_pages().first)
+        else:
+            def process(record):
+                if short and record.has(variable + '-short'):
+                    return record.get_string(variable + '-short')
+                return record.get_string(variable)
+        return process
+
+    def __format_page(self, pages, range_format):
+        """
+        citeproc's Text._page
+
+        :param pages:
+        :param range_format: page-range-format option of the style
+        :return:
+        """
+        first = str(pages.first)
+        text = first
+        if 'last' in pages:
+            last = str(pages.last)
+            text += self.en_dash
+            if len(first) != len(last):
+                text += last
+            else:
+                if range_format not in ('expanded', None):
+                    raise NativeUnsupported
+                text += last
+        return text
+
+    def __compile_group(self, element, context, **kwargs):
+        """
+        citeproc's Group, group is not rendered if it calls variables but none of them were rendered
+
+        :param element:
+        :param context:
+        :return:
+        """
+        children = [(self.__compile(child, context, **kwargs), child.calls_variable())
+                    for child in element.iterchildren() if isinstance(child.tag, basestring if PY2 else str)]
+        variable_called = any(calls_variable for _, calls_variable in children)
+        delimiter = element.get('delimiter', '')
+        markup = compile_markup(element)
+        def render(record):
+            output = []
+            variable_rendered = False
+            for child, calls_variable in children:
+                try:
+                    text = child(record)
+                except NativeSkip:
+                    continue
+                if text is not None:
+                    output.append(text)
+                    variable_rendered = variable_rendered or calls_variable
+            if output and (not variable_called or variable_rendered):
+                return markup(delimiter.join(output))
+            raise NativeSkip
+        return render
+
+    def __compile_choose(self, element, context, **kwargs):
+        """
+
+        :param element:
+        :param context:
+        :return:
+        """
+        branches = []
+        for child in element.iterchildren():
+            if not isinstance(child.tag, basestring if PY2 else str):
+                continue
+            if get_localname(child) == 'else':
+                branches.append((None, self.__compile_render_children(child, context, **kwargs)))
+            else:
+                branches.append((self.__compile_condition(child, context), self.__compile_render_children(child, context, **kwargs)))
+        def render(record):
+            for condition, render_children in branches:
+                if condition is None or condition(record):
+                    return render_children(record)
+            return None
+        return render
+
+    def __compile_condition(self, element, context):
+        """
+        citeproc's If, tests are evaluated in the same order, since locator test raises
+
+        :param element:
+        :param context:
+        :return:
+        """
+        tests = []
+        if 'type' in element.attrib:
+            types = [type.lower() for type in element.get('type').split()]
+            tests.append(lambda record: [type == record.type for type in types])
+        if 'variable' in element.attrib:
+            variables = element.get('variable').split()
+            tests.append(lambda record: [False if variable == 'locator' else record.has(variable) for variable in variables])
+        if 'is-numeric' in element.attrib:
+            variables = element.get('is-numeric').split()
+            tests.append(lambda record: [record.has(variable) and RE_NUMERIC.match(record.get_string(variable)) is not None
+                                         for variable in variables])
+        if 'is-uncertain-date' in element.attrib:
+            variables = element.get('is-uncertain-date').split()
+            tests.append(lambda record: [False for variable in variables])
+        if 'locator' in element.attrib:
+            def locator(record):
+                raise NativeSkip
+            tests.append(locator)
+        if 'position' in element.attrib:
+            if element.xpath_search('./ancestor::*[self::cs:bibliography]'):
+                tests.append(lambda record: [False])
+            else:
+                tests.append(unsupported)
+        match = element.get('match')
+        def condition(record):
+            results = []
+            for test in tests:
+                results += test(record)
+            if match == 'any':
+                return any(results)
+            if match == 'none':
+                return not any(results)
+            return all(results)
+        return condition
+
+    def __compile_names(self, element, context, names_context=None, **kwargs):
+        """
+        citeproc's Names
+
+        :param element:
+        :param context:
+        :param names_context:
+        :return:
+        """
+        if context is None:
+            context = element
+        if names_context is None:
+            names_context = element
+        roles = element.get('variable').split()
+        ed_trans = set(roles) == set(['editor', 'translator'])
+        name_element = names_context.name
+        if name_element is None:
+            return unsupported
+        render_name = self.__compile_name(name_element, context)
+        label_element = names_context.label
+        labels = {}
+        if label_element is not None:
+            for role in roles:
+                labels[role] = self.__compile_names_label(label_element, role)
+            label_first = label_element is names_context.getchildren()[0]
+        has_substitute = element.substitute() is not None
+        delimiter = element.get('delimiter', element.get_parent_delimiter(context))
+        markup = compile_markup(element)
+        def render(record):
+            if ed_trans and record.has('editor') and record.has('translator'):
+                raise NativeUnsupported
+            output = []
+            for role in roles:
+                if not record.has(role):
+                    continue
+                names = record.get_names(role)
+                text = render_name(names)
+                label = labels.get(role)
+                if label is not None:
+                    label = label(len(names) > 1)
+                    if label is not None:
+                        text = label + text if label_first else text + label
+                output.append(text)
+            if not output:
+                if has_substitute:
+                    raise NativeUnsupported
+                raise NativeSkip
+            return markup(join(output, delimiter))
+        return render
+
+    def __compile_names_label(self, element, role):
+        """
+        label of names, it is not rendered if there is no term for the role
+
+        :param element:
+        :param role:
+        :return: function of plural
+        """
+        form = element.get('form', 'long')
+        single = get_term(element, role, None if form == 'long' else form)
+        if single is None:
+            return None
+        multiple = get_term(element, role, None if form == 'long' else form, plural=True)
+        plural_option = element.get('plural', 'contextual')
+        markup = compile_markup(element, self.language, case=True, strip_periods=True)
+        def render(plural):
+            if plural_option == 'contextual' and plural or plural_option == 'always':
+                return markup(multiple)
+            return markup(single)
+        return render
+
+    def __compile_name(self, element, context):
+        """
+        citeproc's Name
+
+        :param element:
+        :param context:
+        :return: function of list of names
+        """
+        name_format = NameFormat(element, context)
+        if name_format.form not in ('long', 'short'):
+            return unsupported
+        if len(element.findall('cs:name-part', element.nsmap)) > 0:
+            return unsupported
+
+        markup = compile_markup(element)
+
+        def render(names):
+            return markup(name_format.format(names))
+        return render
+
+    def __compile_label(self, element, context, **kwargs):
+        """
+        citeproc's Label outside of names
+
+        :param element:
+        :param context:
+        :return:
+        """
+        variable = element.get('variable')
+        form = element.get('form', 'long')
+        plural_option = element.get('plural', 'contextual')
+        single = get_term(element, variable, None if form == 'long' else form)
+        multiple = get_term(element, variable, None if form == 'long' else form, plural=True)
+        markup = compile_markup(element, self.language, case=True, strip_periods=True)
+        def render(record):
+            if variable == 'locator' or variable.startswith('number-of'):
+                raise NativeSkip
+            if not record.has(variable):
+                raise NativeSkip
+            plural = RE_MULTIPLE_NUMBERS.search(record.get_string(variable)) is not None
+            if single is None:
+                raise NativeUnsupported
+            if plural_option == 'contextual' and plural or plural_option == 'always':
+                return markup(multiple)
+            return markup(single)
+        return render
+
+    def __compile_date(self, element, context, **kwargs):
+        """
+        citeproc's Date, only the year is in our records
+
+        :param element:
+        :param context:
+        :return:
+        """
+        if element.get('form') is not None:
+            return unsupported
+        variable = element.get('variable')
+        delimiter = element.get('delimiter', '')
+        prefix = element.get('prefix', '')
+        suffix = element.get('suffix', '')
+        parts = []
+        for part in element.iterchildren():
+            if not isinstance(part.tag, basestring if PY2 else str):
+                continue
+            name = part.get('name')
+            if name == 'year':
+                parts.append(self.__compile_year(part))
+            elif name in ('month', 'day'):
+                parts.append(None)
+            else:
+                return unsupported
+        def render(record):
+            year = record.get_year(variable)
+            if year is None:
+                return None
+            output = []
+            for part in parts:
+                if part is not None:
+                    text = part(year)
+                    if text is not None:
+                        output.append(text)
+            if len(output) == 0:
+                return None
+            return prefix + delimiter.join(output) + suffix
+        return render
+
+    def __compile_year(self, element):
+        """
+
+        :param element:
+        :return:
+        """
+        form = element.get('form', 'long')
+        if form not in ('long', 'short'):
+            return unsupported
+        bc = get_term(element, 'bc')
+        ad = get_term(element, 'ad')
+        markup = compile_markup(element, self.language, case=True, strip_periods=True)
+        def render(year):
+            if form == 'long':
+                text = str(abs(year))
+                if year < 0:
+                    text += bc
+                elif year < 1000:
+                    text += ad
+            else:
+                text = str(year)[-2:]
+            return markup(text)
+        return render
+
+    def __compile_number(self, element, context, **kwargs):
+        """
+        citeproc's Number, only numeric form
+
+        :param element:
+        :param context:
+        :return:
+        """
+        variable = element.get('variable')
+        if variable == 'page':
+            return unsupported
+        form = element.get('form', 'numeric')
+        markup = compile_markup(element, self.language, case=True, strip_periods=True)
+        en_dash = self.en_dash
+        def format_number(number):
+            if form != 'numeric':
+                raise NativeUnsupported
+            return str(number)
+        def render(record):
+            if variable == 'locator':
+                raise NativeSkip
+            if variable == 'page-first':
+                value = str(record.get_pages().first)
+            else:
+                value = record.get_string(variable)
+            match = RE_RANGE.match(value)
+            if match is not None:
+                first, last = map(int, match.groups())
+                text = format_number(first) + en_dash + format_number(last)
+            else:
+                match = RE_NUMERIC.match(value)
+                if match is not None:
+                    text = format_number(int(match.group(1)))
+                else:
+                    text = value
+            return markup(text)
+        return render
+
+    def render(self, for_cls, citation=True, start=1):
+        """
+
+        :param for_cls: CSLJson records
+        :param citation: if False, only the bibliography is rendered
+        :param start: citation number of the first record, when records are rendered in parts
+        :return: list of citations, and list of bibliography entries, in the order of the records
+        """
+        citations = []
+        bibliography = []
+        for number, data in enumerate(for_cls, start):
+            record = NativeRecord(data, number)
+            if citation:
+                citations.append(self.citation(record))
+            bibliography.append(self.bibliography(record))
+        return citations, bibliography
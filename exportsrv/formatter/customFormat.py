@@ -1,18 +1,23 @@
 # -*- coding: utf-8 -*-
 
-from datetime import datetime
+from collections import OrderedDict
 from flask import current_app
-from textwrap import fill
+from threading import Lock
 import re
 import cgi
 
+from exportsrv import metrics
 from exportsrv.formatter.format import Format
-from exportsrv.formatter.ads import adsFormatter, adsOrganizer
+from exportsrv.formatter.lineWrap import fill
+from exportsrv.formatter.journalIndex import journal_index
+from exportsrv.formatter.ads import adsFormatter
 from exportsrv.formatter.cslJson import CSLJson
-from exportsrv.formatter.csl import CSL
+from exportsrv.formatter.csl import csl_styles
+from exportsrv.formatter.cslName import get_name_parts
 from exportsrv.formatter.toLaTex import encode_laTex, encode_laTex_author
-from exportsrv.formatter.strftime import strftime
+from exportsrv.formatter.pubDate import pub_dates
 from exportsrv.utils import get_eprint, replace_html_entity
+from exportsrv.timing import timed, phase
 
 # This class accepts JSON object created by Solr and can reformats it
 # for the user define Custom Format Export.
@@ -23,52 +28,62 @@ from exportsrv.utils import get_eprint, replace_html_entity
 # Next pass the fields to Solr and get the JSON code back and finaly use
 #    custom_format.set_json_from_solr(jsonFromSolr)
 #    custom_format.getCustomFormat()
+# The custom format string is compiled once into literals and fields (CustomFormatPlan),
+# compiled formats are kept in custom_format_plans, keyed by the format string,
+# and each record is rendered by filling the fields in between the literals.
+
+
+def get_export_format(format):
+    """
+    format can be one of the followings: unicode, html, latex, csv, tsv
+
+    :param format:
+    :return: adsFormatter value, unicode if format is not recognized
+    """
+    # support all the forms Unicode, unicode, utf-8, UTF-8
+    if (format.lower() == 'unicode') or (format.lower() == 'utf-8'):
+        return adsFormatter.unicode
+    elif (format == 'html'):
+        return adsFormatter.html
+    elif (format == 'latex'):
+        return adsFormatter.latex
+    elif (format == 'csv'):
+        return adsFormatter.csv
+    elif (format == 'tsv'):
+        return adsFormatter.tsv
+    return adsFormatter.unicode
+
 
 class CustomFormat(Format):
 
-    REGEX_AUTHOR = re.compile(r'%[\\>/=]?(\d*\.?\d*)(\w)')
     REGEX_PUB_MACRO = re.compile(r'(^\\[a-z]*$)')
-    REGEX_FIRST_AUTHOR = re.compile(r'%(\^)(\w)')
-    REGEX_AFF = re.compile(r'%(\d*)F')
-    REGEX_ENUMERATION = re.compile(r'(%zn)')
-    REGEX_COMMAND = [
-        re.compile(r'(%Z(?:Encoding|Linelength):[\w\-]+\s?)'),
-        re.compile(r'(%Z(?:Header|Footer|AuthorSep):\".+?\"\s?)'),
-        re.compile(r'(%Z(?:Markup):\w+)'),
-        re.compile(r'(%Z(?:EOL):\".*\"\s?)'),
-    ]
-    REGEX_CUSTOME_FORMAT = re.compile(
-        r'''(                                                   # start of capture group 1
-            %                                                   # literal "%"
-            (?:[\\>/=])?                                        # field encoding
-            (?:                                                 # first option
-            (?:\d+|\*)?                                         # width
-            (?:\.(?:\d+|\*))?                                   # precision
-            (?:\^)?
-            p{0,2}[AaBcCdDeEfFGgHhiIJjKLlMmNnOpPQqRSTUuVWXxY]   # type
-            )
-        )''', flags=re.X
-    )
+    REGEX_TSV_SEPARATOR = re.compile(r'[\t\r\n]')
 
-    def __init__(self, custom_format):
+    def __init__(self, custom_format, plan=None):
         """
 
         :param custom_format:
+        :param plan: compiled custom format, if given custom_format is not used
         """
         Format.__init__(self, None)
-        self.parsed_spec = []
         self.from_cls = {}
         self.author_count = {}
-        self.custom_format = custom_format
-        self.export_format = adsFormatter.unicode
-        self.line_length = 0
-        self.header = ''
-        self.footer = ''
-        self.author_sep = ''
-        self.markup_strip = False
-        self.enumeration = False
-        self.line_feed = self.__get_linefeed()
-        self.__parse()
+        # the custom format string is compiled once, and shared by all the requests that use it
+        self.plan = plan if plan is not None else custom_format_plans.get(custom_format)
+        self.parsed_spec = self.plan.parsed_spec
+        self.custom_format = self.plan.custom_format
+        self.enumeration = self.plan.enumeration
+        # commands are parsed when the custom format is compiled
+        self.export_format = self.plan.export_format
+        self.line_length = self.plan.line_length
+        self.header = self.plan.header
+        self.footer = self.plan.footer
+        self.author_sep = self.plan.author_sep
+        self.markup_strip = self.plan.markup_strip
+        self.line_feed = self.plan.line_feed
+        # each specifier is resolved once to the function that gets its value and the one that encodes it
+        self.extractors = dict([(field[1], self.__get_extractor(field)) for field in self.parsed_spec])
+        self.encoders = dict([(field[1], self.__get_encoder(field[2], field[1])) for field in self.parsed_spec])
 
 
     def get_solr_fields(self):
@@ -117,10 +132,11 @@ class CustomFormat(Format):
         return num_authors
 
     
+    @timed('normalize')
     def set_json_from_solr(self, from_solr):
         """
         save the data from Solr, and go through it
-        for every author format call CSL to style the authors
+        for every author format style the authors with the name format of its csl style
         
         :param from_solr: 
         :return: 
@@ -129,6 +145,8 @@ class CustomFormat(Format):
         if (self.from_solr.get('responseHeader')):
             self.status = self.from_solr['responseHeader'].get('status', self.status)
         json_for_csl = CSLJson(self.from_solr).get_author()
+        # name parts of each record, shared by all the author formats
+        names = [[get_name_parts(author) for author in item['author']] for item in json_for_csl]
         for element in self.parsed_spec:
             if (element[2] == 'author'):
                 # my mac has been formatted for case-insensitive
@@ -139,173 +157,11 @@ class CustomFormat(Format):
                 else:
                     csl_file_name = 'ads-author-' + element[1][-1] + element[1][-1]
                 key = element[1]
-                self.from_cls[key] = CSL(json_for_csl, csl_file_name).get(adsOrganizer.bibliography)
+                name_format = csl_styles.get_name_format(csl_file_name)
+                self.from_cls[key] = [name_format.format(record_names) for record_names in names]
                 self.author_count[key] = self.__get_num_authors()
 
 
-    def __get_solr_field(self, specifier):
-        """
-        from specifier to Solr fields
-        
-        :param specifier: 
-        :return: 
-        """
-        fieldDict = {
-            'A': 'author',
-            'a': 'author',
-            'B': 'abstract',
-            'c': 'citation_count',
-            'C': 'copyright',
-            'd': 'doi',
-            'D': 'pubdate',
-            'e': 'author',
-            'F': 'aff',
-            'f': 'author',
-            'G': 'author',
-            'g': 'author',
-            'H': 'author',
-            'h': 'author',
-            'I': 'author',
-            'i': 'author',
-            'J': 'pub',
-            'j': 'pub',
-            'K': 'keyword',
-            'L': 'author',
-            'l': 'author',
-            'M': 'author',
-            'm': 'author',
-            'N': 'author',
-            'n': 'author',
-            'O': '',  # Object Names
-            'p': 'page,page_range',
-            'P': 'lastpage,page_range',  # Last Page
-            'pp':'page_range,page',      # page_range is specified in the custom format, but if not available and page is then return that
-            'pc':'page_count',
-            'Q': 'pub_raw',
-            'q': 'pub',
-            'R': 'bibcode',
-            'S': 'issue',
-            'T': 'title',
-            'U': 'url',
-            'u': 'url',
-            'V': 'volume',
-            'W': 'doctype',
-            'X': 'eid,identifier',
-            'x': 'comment',
-            'Y': 'year'
-        }
-        specifier = ''.join(re.findall(r'([AaBcCdDeEfFGgHhiIJjKLlMmNnOpPQqRSTUuVWXxY]{1,2})', specifier))
-        return fieldDict.get(specifier, '')
-
-
-    def __set_export_format(self, format):
-        """
-        format can be one of the followings: unicode, html, latex
-        
-        :param format: 
-        :return: 
-        """
-        # support all the forms Unicode, unicode, utf-8, UTF-8
-        if (format.lower() == 'unicode') or (format.lower() == 'utf-8'):
-            self.export_format = adsFormatter.unicode
-        elif (format == 'html'):
-            self.export_format = adsFormatter.html
-        elif (format == 'latex'):
-            self.export_format = adsFormatter.latex
-        elif (format == 'csv'):
-            self.export_format = adsFormatter.csv
-        else:
-            self.export_format = adsFormatter.unicode
-
-
-    def __parse_enumeration(self):
-        """
-        see if enumeration specifier has been defined in the custom format string
-
-        :return:
-        """
-        matches = self.REGEX_ENUMERATION.findall(self.custom_format)
-        if (len(matches) >= 1):
-            for match in matches:
-                self.enumeration = True
-
-
-    def __parse_command(self):
-        """
-        see if command specifier has been defined in the custom format string
-
-        :return:
-        """
-        for token in self.REGEX_COMMAND:
-            matches = token.findall(self.custom_format)
-            if (len(matches) >= 1):
-                for match in matches:
-                    self.custom_format = self.custom_format.replace(match, '', len(match))
-                    # remove %Z and split on :
-                    parts = match[2:].strip().split(':')
-                    if (len(parts) == 2):
-                        if (parts[0] == 'Encoding'):
-                            self.__set_export_format(parts[1])
-                        elif (parts[0] == 'Linelength'):
-                            self.line_length = int(parts[1])
-                        elif (parts[0] == 'Header'):
-                            self.header = parts[1].replace('"', '').decode('string_escape')
-                        elif (parts[0] == 'Footer'):
-                            self.footer = parts[1].replace('"', '').decode('string_escape')
-                        elif (parts[0] == 'AuthorSep'):
-                            self.author_sep = parts[1].replace('"', '').decode('string_escape')
-                        elif (parts[0] == 'Markup'):
-                            self.markup_strip = (parts[1].lower() == 'strip')
-                        elif (parts[0] == 'EOL'):
-                            self.line_feed = parts[1].replace('"', '').decode('string_escape')
-
-
-    def __escape(self):
-        """
-        tabs are not rendered in the UI so replace them with four spaces
-        linefeeds, tabs, and backslash are escaped, so remove the escape
-        :return:
-        """
-        self.custom_format = re.sub(r'(\\n\b)', '\n', re.sub(r'(\\t\b)', "    ", self.custom_format).replace('\\\\', '\\'))
-
-
-    def __for_csv(self):
-        """
-        see if the encoding is csv, then there would be no line wrapping
-        and if the header line is not defined by user, create the header
-        :return:
-        """
-        if (self.export_format == adsFormatter.csv):
-            # no line wrapping in csv format
-            self.line_length = 0
-            if len(self.header) == 0:
-                header = ''
-                for field in self.parsed_spec:
-                    header += '"' + field[2] + '",'
-                # eliminate the last comma
-                header = header[:-1]
-                self.header = header
-            self.custom_format = self.custom_format + ','
-
-
-    def __parse(self):
-        """
-        parse the custom format string to identify the requested fields
-
-        :return:
-        """
-        self.parsed_spec = []
-        self.__parse_command()
-        self.__parse_enumeration()
-        for m in self.REGEX_CUSTOME_FORMAT.finditer(self.custom_format):
-            self.parsed_spec.append(tuple((m.start(1), m.group(1), self.__get_solr_field(m.group(1)))))
-        # we have %p, %pp, and %pc, when doing replace, %p causes other two to be replaced
-        # re did not work, so pushing %p to the end to be the last item to get replaced
-        self.parsed_spec = sorted(self.parsed_spec, key=lambda tup: tup[1] == '%p')
-        self.__escape()
-        self.__for_csv()
-
-
     def __format_date(self, solr_date, date_format):
         """
 
@@ -313,10 +169,8 @@ class CustomFormat(Format):
         :param date_format:
         :return:
         """
-        # solr_date has the format 2017-12-01
-        date_time = datetime.strptime(solr_date.replace('-00', '-01'), '%Y-%m-%d')
         formats = {'D': '%m/%Y', 'Y': '%Y'}
-        return strftime(date_time, formats[date_format])
+        return pub_dates.get(solr_date, formats[date_format])
 
 
     def __format_url(self, bibcode, url_format):
@@ -335,16 +189,12 @@ class CustomFormat(Format):
         return ''
 
 
-    def __format_line_wrapped(self, text, index):
+    def __format_line_wrapped(self, text):
         """
 
         :param text:
-        :param index:
         :return:
         """
-        if (self.enumeration):
-            text = self.REGEX_ENUMERATION.sub(str(index+1), text)
-
         if (self.line_length == 0):
             # no linewrap here
             result = text
@@ -357,9 +207,6 @@ class CustomFormat(Format):
             # \n not at the end of string, if there were any
             result = fill(text+'<END>', width=self.line_length, replace_whitespace=False, subsequent_indent=' ' * 12)
             result = result[:-len('<END>')]
-        # in csv format there is a comma at the very end, remove that before adding the linefeed
-        if (self.export_format == adsFormatter.csv):
-            result = result[:-1]
 
         return result
 
@@ -372,10 +219,8 @@ class CustomFormat(Format):
         """
         if ('aff') in a_doc:
             # if a limit of number of affiliation to display is set
-            match = self.REGEX_AFF.findall(self.custom_format)
-            if (len(''.join(match)) >= 1):
-                count = int(''.join(match))
-            else:
+            count = self.plan.aff_count
+            if count is None:
                 count = len(a_doc['aff'])
 
             counter = self.generate_counter_id(count)
@@ -557,32 +402,15 @@ class CustomFormat(Format):
         """
         authors = self.from_cls.get(format)[index]
         count = self.author_count.get(format)[index]
-        # see if author list needs to get abbreviated
-        # n.m: Maximum number of entries in author field (optional).
-        # If the number of authors in the list is larger than n, the list will be truncated to m entries.
-        # If.m is not specified, n.1 is assumed.
-        matches = self.REGEX_AUTHOR.findall(format)
-        if (len(matches) >= 1):
-            # format n is a special case
-            if (matches[0][1] == 'n'):
-                return self.__get_author_list_abbreviated(authors, count, matches[0][1], 0)
-            # so is the format for H and h if not abbreviated
-            elif ((matches[0][1] == 'H') or (matches[0][1] == 'h')) and len(matches[0][0]) == 0:
-                return self.__get_author_list_abbreviated(authors, count, matches[0][1], 1)
-            elif (len(matches[0][0]) > 0):
-                abbreviated = matches[0][0].split('.')
-                n = int(str(abbreviated[0]))
-                if (len(abbreviated) > 1):
-                    m = int(str(abbreviated[1]))
-                else:
-                    m = 1
-                if (count <= n) or (count <= m):
-                    return self.__replace_author_separator(authors, format[-1])
-                else:
-                    return self.__get_author_list_abbreviated(authors, count, matches[0][1], m)
-        # see if it is a first author format
-        matches = self.REGEX_FIRST_AUTHOR.findall(format)
-        if len(matches) >= 1:
+        # see if author list needs to get abbreviated, n.m is parsed when the custom format is compiled
+        kind, n, m = self.plan.authors[format]
+        if (kind == 'abbreviated'):
+            return self.__get_author_list_abbreviated(authors, count, format[-1], m)
+        if (kind == 'truncated'):
+            if (count <= n) or (count <= m):
+                return self.__replace_author_separator(authors, format[-1])
+            return self.__get_author_list_abbreviated(authors, count, format[-1], m)
+        if (kind == 'first'):
             return self.__get_first_author(authors, format[-1])
         return self.__replace_author_separator(authors, format[-1])
 
@@ -634,14 +462,13 @@ class CustomFormat(Format):
         if (format == 'j'):
             # returns an AASTeX macro for the journal if available, otherwise
             # returns the journal name
-            journal_macros = dict([(k, v) for k, v in current_app.config['EXPORT_SERVICE_AASTEX_JOURNAL_MACRO']])
-            return journal_macros.get(self.get_bibstem(a_doc.get('bibstem', '')), a_doc.get('pub', ''))
+            return journal_index.get_macro(a_doc.get('bibstem', ''), a_doc.get('pub', ''))
         if (format == 'Q'):
             # returns the full journal information
             return self.__add_clean_pub_raw(a_doc)
         if (format == 'q'):
             # returns the journal abbreviation
-            return self.get_pub_abbrev(a_doc.get('bibstem', ''))
+            return journal_index.get_abbreviation(a_doc.get('bibstem', ''))
         return ''
 
 
@@ -672,19 +499,20 @@ class CustomFormat(Format):
         return ''
 
 
-    def __encode_latex(self, value, field):
+    def __get_latex_encoder(self, field):
         """
 
-        :param value:
         :param field:
-        :return:
+        :return: function that encodes a value of the field in latex
         """
         if (field == 'author'):
-            return encode_laTex_author(value)
+            return encode_laTex_author
         # do not encode publication when the format is a macro or if it is bibcode
-        if ((field == 'pub') and (self.REGEX_PUB_MACRO.match(value))) or (field == 'bibcode'):
-            return value
-        return encode_laTex(value)
+        if (field == 'pub'):
+            return lambda value: value if self.REGEX_PUB_MACRO.match(value) else encode_laTex(value)
+        if (field == 'bibcode'):
+            return lambda value: value
+        return encode_laTex
 
 
     def __markup_strip(self, value):
@@ -696,48 +524,654 @@ class CustomFormat(Format):
         return re.sub(r'<.*?>', '', value)
 
 
-    def __encode(self, value, field, field_format=None):
+    def __get_encoder(self, field, field_format=None):
         """
+        resolve the encoding of the field once, so that records are encoded without going through the options
 
-        :param value:
         :param field:
-        :param format:
-        :return:
+        :param field_format:
+        :return: function that encodes a value of the field
         """
-        if self.markup_strip:
-            value = self.__markup_strip(value)
-
+        encoder = lambda value: value
         # first check for field encoding
-        if field_format is not None:
-            if '\\' in field_format:
-                return self.__encode_latex(value, field)
-            if '>' in field_format:
-                return cgi.escape(value)
-            if '=' in field_format:
-                return value.encode('hex')
-            if '/' in field_format:
-                # This encoding converts the characters &, ?, and + to the hex encoded values.
-                # get more information about this from Alberto later
-                value = value.replace(' ', '+').replace('"', '%22')
-                return value
-
+        if (field_format is not None) and ('\\' in field_format):
+            encoder = self.__get_latex_encoder(field)
+        elif (field_format is not None) and ('>' in field_format):
+            encoder = cgi.escape
+        elif (field_format is not None) and ('=' in field_format):
+            encoder = lambda value: value.encode('hex')
+        elif (field_format is not None) and ('/' in field_format):
+            # This encoding converts the characters &, ?, and + to the hex encoded values.
+            # get more information about this from Alberto later
+            encoder = lambda value: value.replace(' ', '+').replace('"', '%22')
         # if no field encoding defined, check for global encoding
-        if (self.export_format == adsFormatter.unicode):
+        elif (self.export_format == adsFormatter.unicode):
             if field == 'abstract':
                 # per alberto translate <P /> to blank lines, and <BR /> to a newline
-                value = value.replace('<P />', '\n\n').replace('<BR />', '\n')
-            if field in ['abstract', 'title']:
-                value = replace_html_entity(value, adsFormatter.unicode)
-            return value
-        if (self.export_format == adsFormatter.html):
-            return cgi.escape(value)
-        if (self.export_format == adsFormatter.latex):
-            # per alberto for bibtex translate <P /> to \\
+                encoder = lambda value: replace_html_entity(value.replace('<P />', '\n\n').replace('<BR />', '\n'), adsFormatter.unicode)
+            elif field == 'title':
+                encoder = lambda value: replace_html_entity(value, adsFormatter.unicode)
+        elif (self.export_format == adsFormatter.html):
+            encoder = cgi.escape
+        elif (self.export_format == adsFormatter.latex):
+            encoder = self.__get_latex_encoder(field)
             if field == 'abstract':
-                value = value.replace('<P />', '\\\\').replace('<BR />', '\\')
-            return self.__encode_latex(value, field)
+                # per alberto for bibtex translate <P /> to \\
+                encode_latex = encoder
+                encoder = lambda value: encode_latex(value.replace('<P />', '\\\\').replace('<BR />', '\\'))
+
+        if self.markup_strip:
+            encode = encoder
+            encoder = lambda value: encode(self.__markup_strip(value))
+        return encoder
+
+
+    def __get_extractor(self, field):
+        """
+        resolve the field of the specifier once, so that records are not dispatched on the field name
+
+        :param field: specifier, from parsed_spec
+        :return: function of the record and its index to the docs structure returned from solr,
+                 that returns the value of the field not encoded, None if the field is not supported
+        """
+        solr_field = field[2]
+        specifier = field[1]
+        if (solr_field == 'title') or (solr_field == 'doi') or (solr_field == 'comment'):
+            return lambda a_doc, index: ''.join(a_doc.get(solr_field, ''))
+        elif (solr_field == 'author'):
+            return lambda a_doc, index: self.__get_author_list(specifier, index)
+        elif (solr_field == 'doctype'):
+            return lambda a_doc, index: a_doc.get(solr_field, '')
+        elif (solr_field == 'pubdate'):
+            return lambda a_doc, index: self.__format_date(a_doc.get(solr_field, ''), specifier[-1])
+        elif (solr_field == 'aff'):
+            return lambda a_doc, index: self.__get_affiliation_list(a_doc)
+        elif (solr_field == 'keyword'):
+            return lambda a_doc, index: self.__get_keywords(a_doc)
+        elif (solr_field == 'url'):
+            return lambda a_doc, index: self.__format_url(a_doc.get('bibcode', ''), specifier[-1])
+        elif (solr_field == 'abstract') or (solr_field == 'copyright') or (solr_field == 'bibcode') or \
+             (solr_field == 'volume') or (solr_field == 'year') or (solr_field == 'issue'):
+            return lambda a_doc, index: a_doc.get(solr_field, '')
+        elif (solr_field == 'pub') or (solr_field == 'pub_raw'):
+            return lambda a_doc, index: self.__get_publication(specifier, a_doc)
+        elif (solr_field == 'citation_count') or (solr_field == 'page_count'):
+            return lambda a_doc, index: str(a_doc.get(solr_field, ''))
+        elif (solr_field == 'eid,identifier'):
+            return lambda a_doc, index: get_eprint(a_doc)
+        elif (solr_field == 'page,page_range') or (solr_field == 'lastpage,page_range') or (solr_field == 'page_range,page'):
+            return lambda a_doc, index: self.__get_page(solr_field, a_doc)
+        return lambda a_doc, index: None
+
+
+    def __get_rendered(self, pieces, piece, length, backward):
+        """
+
+        :param pieces: literals and fields of the record
+        :param piece: index of the field in pieces
+        :param length: number of characters
+        :param backward: True for the text before the field, False for the text after it
+        :return: up to length characters rendered right before or after the field
+        """
+        text = ''
+        step = -1 if backward else 1
+        i = piece + step
+        while (0 <= i < len(pieces)) and (len(text) < length):
+            text = pieces[i] + text if backward else text + pieces[i]
+            i += step
+        return text[-length:] if backward else text[:length]
+
+
+    def __elide(self, pieces, piece, length, backward):
+        """
+        remove the punctuation of the field from the pieces around it
+
+        :param pieces: literals and fields of the record
+        :param piece: index of the field in pieces
+        :param length: number of characters to remove
+        :param backward: True to remove before the field, False after it
+        :return:
+        """
+        step = -1 if backward else 1
+        i = piece + step
+        while (0 <= i < len(pieces)) and (length > 0):
+            remove = min(length, len(pieces[i]))
+            if backward:
+                pieces[i] = pieces[i][:len(pieces[i]) - remove]
+            else:
+                pieces[i] = pieces[i][remove:]
+            length -= remove
+            i += step
+
+
+    def __get_values(self, num_docs):
+        """
+        values of all the fields for all the records, computed a field at a time and encoded, so that records
+        are rendered from the encoded values, a field with more than one encoding is taken from solr once,
+        and a value that repeats in the records, ie, journal name, is encoded once
+
+        :param num_docs:
+        :return: dict of specifier to the list of encoded values, None for the records of a field that is not supported
+        """
+        docs = self.from_solr['response'].get('docs')
+        extracted = {}
+        values = {}
+        for field in self.parsed_spec:
+            if field[1] in values:
+                continue
+            source = self.plan.sources[field[1]]
+            if source not in extracted:
+                extract = self.extractors[field[1]]
+                extracted[source] = [extract(docs[index], index) for index in range(num_docs)]
+            # latex encoding is timed for the column, not for each value
+            if self.__is_latex_encoded(field[1]):
+                with phase('latex'):
+                    values[field[1]] = self.__encode_column(self.encoders[field[1]], extracted[source])
+            else:
+                values[field[1]] = self.__encode_column(self.encoders[field[1]], extracted[source])
+        return values
+
+
+    def __encode_column(self, encode, column):
+        """
+
+        :param encode: encoder of the field
+        :param column: values of the field for all the records
+        :return: encoded values, a value that repeats is encoded once
+        """
+        encoded = {}
+        values = []
+        for value in column:
+            if value:
+                if value not in encoded:
+                    encoded[value] = encode(value)
+                value = encoded[value]
+            values.append(value)
+        return values
+
+
+    def __is_latex_encoded(self, field_format):
+        """
+
+        :param field_format: specifier
+        :return: True if the values of the specifier are latex encoded, see __get_encoder
+        """
+        if '\\' in field_format:
+            return True
+        if ('>' in field_format) or ('=' in field_format) or ('/' in field_format):
+            return False
+        return self.export_format == adsFormatter.latex
+
+
+    def __get_doc(self, index, values):
+        """
+        render the record from the literals and fields of the compiled custom format, fields are filled
+        in the order of the specifiers, an empty field is elided with the punctuation around it
+
+        :param index: index to the docs structure returned from solr
+        :param values: encoded values of the fields, see __get_values
+        :return:
+        """
+        # literals[k] is at 2k, and fields[k] at 2k+1, a field not filled in yet shows the specifier
+        pieces = []
+        for literal, field in zip(self.plan.literals, self.plan.fields):
+            pieces.append(literal)
+            pieces.append(field[1])
+        pieces.append(self.plan.literals[-1])
+        for k in self.plan.order:
+            value = values[self.plan.fields[k][1]][index]
+            if value is None:
+                # not a supported field, leave the specifier as is
+                continue
+            piece = 2 * k + 1
+            if len(value) > 0:
+                pieces[piece] = value
+                continue
+            elision = self.plan.get_elision(k, self.__get_rendered(pieces, piece, self.plan.ELISION_BEFORE, True),
+                                               self.__get_rendered(pieces, piece, self.plan.ELISION_AFTER, False))
+            if elision is None:
+                # specifier and its punctuation did not match, it stays in the output
+                continue
+            self.__elide(pieces, piece, elision[0], True)
+            self.__elide(pieces, piece, elision[1], False)
+            pieces[piece] = ''
+        # enumeration is filled in the literals that have it, elision never removes it
+        for k in self.plan.enumerations:
+            pieces[2 * k] = pieces[2 * k].replace('%zn', str(index + 1))
+        pieces.append(self.line_feed)
+
+        return self.__format_line_wrapped(''.join(pieces))
+
+
+    def __get_column(self, field, values):
+        """
+        values of one field for all the records, quoted for csv, tabs and linefeeds replaced for tsv
+
+        :param field: specifier, from parsed_spec
+        :param values: encoded values of the fields, see __get_values
+        :return: list of cells
+        """
+        column = [value if value else '' for value in values[field[1]]]
+        if self.export_format == adsFormatter.tsv:
+            return [self.REGEX_TSV_SEPARATOR.sub(' ', cell) for cell in column]
+        return ['"' + cell.replace('"', '""') + '"' for cell in column]
+
+
+    def __get_rows(self, num_docs):
+        """
+        tabular export, one column per field of the custom format, computed a column at a time,
+        literals of the custom format are not part of the output
+
+        :param num_docs:
+        :return: generator of rows, each ending with the linefeed
+        """
+        values = self.__get_values(num_docs)
+        columns = {}
+        for field in self.plan.fields:
+            if field[1] not in columns:
+                columns[field[1]] = self.__get_column(field, values)
+        columns = [columns[field[1]] for field in self.plan.fields]
+        for index in range(num_docs):
+            yield self.plan.delimiter.join([column[index] for column in columns]) + self.line_feed
+
+
+    @timed('render')
+    def get(self):
+        """
+        
+        :return: result of formatted records in a dict
+        """
+        num_docs = 0
+        results = []
+        if (self.status == 0):
+            if len(self.header) > 0:
+                results.append(self.header + self.__get_linefeed())
+            num_docs = self.get_num_docs()
+            if self.plan.delimiter is not None:
+                results.extend(self.__get_rows(num_docs))
+            else:
+                values = self.__get_values(num_docs)
+                for index in range(num_docs):
+                    results.append(self.__get_doc(index, values))
+            if len(self.footer) > 0:
+                results.append(self.__get_linefeed() + self.footer)
+        result_dict = {}
+        result_dict['msg'] = 'Retrieved {} abstracts, starting with number 1.'.format(num_docs)
+        result_dict['export'] = ''.join(result for result in results)
+        return result_dict
+
+
+class CustomFormatPlan:
+    """
+    custom format string compiled once: the commands, the specifiers, and the template split
+    into literals and fields, literals[k] is before fields[k] and literals[k+1] after it
+    """
+
+    # empty field is removed with the punctuation around it, ie, (%V),
+    # but not with a backslash that starts a command after it, ie, %T,\i0
+    ELISION_PRECEDE = r'([\\]?[\(|\{|\[|\"]?(\\(it|bf|sc|em)\s)?[\\|\s|,|-]?'
+    ELISION_SUCCEED = r'(?:[|,]|\\(?![a-zA-Z]))?[\)|\}|\]|\"]?(?:[|,]|\\(?![a-zA-Z]))?)'
+    # longest punctuation matched before and after the field, and the character after it
+    ELISION_BEFORE = 7
+    ELISION_AFTER = 4
+    # punctuation that can be removed before and after a field, the part of the rendered text
+    # around the field that the outcome of the elision depends on
+    REGEX_ELISION_BEFORE = re.compile(ELISION_PRECEDE + r')\Z')
+    REGEX_ELISION_AFTER = re.compile(r'(' + ELISION_SUCCEED)
+    # commands and specifiers of the custom format string
+    REGEX_AUTHOR = re.compile(r'%[\\>/=]?(\d*\.?\d*)(\w)')
+    REGEX_FIRST_AUTHOR = re.compile(r'%(\^)(\w)')
+    REGEX_AFF = re.compile(r'%(\d*)F')
+    REGEX_ENUMERATION = re.compile(r'(%zn)')
+    REGEX_COMMAND = [
+        re.compile(r'(%Z(?:Encoding|Linelength):[\w\-]+\s?)'),
+        re.compile(r'(%Z(?:Header|Footer|AuthorSep):\".+?\"\s?)'),
+        re.compile(r'(%Z(?:Markup):\w+)'),
+        re.compile(r'(%Z(?:EOL):\".*\"\s?)'),
+    ]
+    REGEX_CUSTOME_FORMAT = re.compile(
+        r'''(                                                   # start of capture group 1
+            %                                                   # literal "%"
+            (?:[\\>/=])?                                        # field encoding
+            (?:                                                 # first option
+            (?:\d+|\*)?                                         # width
+            (?:\.(?:\d+|\*))?                                   # precision
+            (?:\^)?
+            p{0,2}[AaBcCdDeEfFGgHhiIJjKLlMmNnOpPQqRSTUuVWXxY]   # type
+            )
+        )''', flags=re.X
+    )
+    REGEX_FIELD_ENCODING = re.compile(r'^%[\\>/=]')
+
+    def __init__(self, custom_format):
+        """
+
+        :param custom_format: custom format string
+        """
+        self.parsed_spec = []
+        self.custom_format = custom_format
+        self.export_format = adsFormatter.unicode
+        self.line_length = 0
+        self.header = ''
+        self.footer = ''
+        self.author_sep = ''
+        self.markup_strip = False
+        self.enumeration = False
+        self.line_feed = '\n'
+        self.delimiter = None
+        self.literals = []
+        self.enumerations = []
+        self.fields = []
+        self.order = []
+        self.elision_regex = {}
+        self.elisions = {}
+        self.rendered_elisions = {}
+        self.elided_fields = 0
+        self.lock = Lock()
+        self.authors = {}
+        self.aff_count = None
+        self.sources = {}
+        self.__parse()
+
+
+    def __get_solr_field(self, specifier):
+        """
+        from specifier to Solr fields
+        
+        :param specifier: 
+        :return: 
+        """
+        fieldDict = {
+            'A': 'author',
+            'a': 'author',
+            'B': 'abstract',
+            'c': 'citation_count',
+            'C': 'copyright',
+            'd': 'doi',
+            'D': 'pubdate',
+            'e': 'author',
+            'F': 'aff',
+            'f': 'author',
+            'G': 'author',
+            'g': 'author',
+            'H': 'author',
+            'h': 'author',
+            'I': 'author',
+            'i': 'author',
+            'J': 'pub',
+            'j': 'pub',
+            'K': 'keyword',
+            'L': 'author',
+            'l': 'author',
+            'M': 'author',
+            'm': 'author',
+            'N': 'author',
+            'n': 'author',
+            'O': '',  # Object Names
+            'p': 'page,page_range',
+            'P': 'lastpage,page_range',  # Last Page
+            'pp':'page_range,page',      # page_range is specified in the custom format, but if not available and page is then return that
+            'pc':'page_count',
+            'Q': 'pub_raw',
+            'q': 'pub',
+            'R': 'bibcode',
+            'S': 'issue',
+            'T': 'title',
+            'U': 'url',
+            'u': 'url',
+            'V': 'volume',
+            'W': 'doctype',
+            'X': 'eid,identifier',
+            'x': 'comment',
+            'Y': 'year'
+        }
+        specifier = ''.join(re.findall(r'([AaBcCdDeEfFGgHhiIJjKLlMmNnOpPQqRSTUuVWXxY]{1,2})', specifier))
+        return fieldDict.get(specifier, '')
+
+
+    def __parse_enumeration(self):
+        """
+        see if enumeration specifier has been defined in the custom format string
+
+        :return:
+        """
+        matches = self.REGEX_ENUMERATION.findall(self.custom_format)
+        if (len(matches) >= 1):
+            for match in matches:
+                self.enumeration = True
 
-        return value
+
+    def __parse_command(self):
+        """
+        see if command specifier has been defined in the custom format string
+
+        :return:
+        """
+        for token in self.REGEX_COMMAND:
+            matches = token.findall(self.custom_format)
+            if (len(matches) >= 1):
+                for match in matches:
+                    self.custom_format = self.custom_format.replace(match, '', len(match))
+                    # remove %Z and split on :
+                    parts = match[2:].strip().split(':')
+                    if (len(parts) == 2):
+                        if (parts[0] == 'Encoding'):
+                            self.export_format = get_export_format(parts[1])
+                        elif (parts[0] == 'Linelength'):
+                            self.line_length = int(parts[1])
+                        elif (parts[0] == 'Header'):
+                            self.header = parts[1].replace('"', '').decode('string_escape')
+                        elif (parts[0] == 'Footer'):
+                            self.footer = parts[1].replace('"', '').decode('string_escape')
+                        elif (parts[0] == 'AuthorSep'):
+                            self.author_sep = parts[1].replace('"', '').decode('string_escape')
+                        elif (parts[0] == 'Markup'):
+                            self.markup_strip = (parts[1].lower() == 'strip')
+                        elif (parts[0] == 'EOL'):
+                            self.line_feed = parts[1].replace('"', '').decode('string_escape')
+
+
+    def __escape(self):
+        """
+        tabs are not rendered in the UI so replace them with four spaces
+        linefeeds, tabs, and backslash are escaped, so remove the escape
+        :return:
+        """
+        self.custom_format = re.sub(r'(\\n\b)', '\n', re.sub(r'(\\t\b)', "    ", self.custom_format).replace('\\\\', '\\'))
+
+
+    def __for_csv(self):
+        """
+        see if the encoding is csv or tsv, then records are exported as rows, with no line wrapping
+        and if the header line is not defined by user, create the header
+        :return:
+        """
+        if (self.export_format == adsFormatter.csv):
+            self.delimiter = ','
+        elif (self.export_format == adsFormatter.tsv):
+            self.delimiter = '\t'
+        else:
+            return
+        # no line wrapping in csv format
+        self.line_length = 0
+        if len(self.header) == 0:
+            if (self.export_format == adsFormatter.csv):
+                self.header = self.delimiter.join(['"' + field[2] + '"' for field in self.fields])
+            else:
+                self.header = self.delimiter.join([field[2] for field in self.fields])
+
+
+    def __parse(self):
+        """
+        parse the custom format string to identify the requested fields
+
+        :return:
+        """
+        self.parsed_spec = []
+        self.__parse_command()
+        self.__parse_enumeration()
+        for m in self.REGEX_CUSTOME_FORMAT.finditer(self.custom_format):
+            self.parsed_spec.append(tuple((m.start(1), m.group(1), self.__get_solr_field(m.group(1)))))
+        # we have %p, %pp, and %pc, when doing replace, %p causes other two to be replaced
+        # re did not work, so pushing %p to the end to be the last item to get replaced
+        self.parsed_spec = sorted(self.parsed_spec, key=lambda tup: tup[1] == '%p')
+        self.__escape()
+        self.__split()
+        self.__for_csv()
+        self.__parse_parameters()
+
+
+    def __split(self):
+        """
+        split the template into literals and fields, fields are the occurrences of the specifiers in parsed_spec
+        also compile the pattern of each specifier, that matches it with its punctuation
+
+        :return:
+        """
+        specifiers = dict([(field[1], field) for field in reversed(self.parsed_spec)])
+        self.literals = []
+        self.fields = []
+        context = []
+        end = 0
+        for m in self.REGEX_CUSTOME_FORMAT.finditer(self.custom_format):
+            if m.group(1) not in specifiers:
+                continue
+            self.literals.append(self.custom_format[end:m.start(1)])
+            self.fields.append(specifiers[m.group(1)])
+            context.append((self.custom_format[:m.start(1)][-self.ELISION_BEFORE:], self.custom_format[m.end(1):][:self.ELISION_AFTER]))
+            end = m.end(1)
+        self.literals.append(self.custom_format[end:])
+        # literals with the enumeration specifier, it gets the number of the record
+        if self.enumeration:
+            self.enumerations = [k for k, literal in enumerate(self.literals) if '%zn' in literal]
+        # fields are filled in the order of the specifiers, with %p the last one, see __parse
+        first = {}
+        for k, field in enumerate(self.fields):
+            first.setdefault(field[1], k)
+        self.order = sorted(range(len(self.fields)), key=lambda k: (self.fields[k][1] == '%p', first[self.fields[k][1]], k))
+        for specifier in specifiers:
+            self.elision_regex[specifier] = re.compile(self.ELISION_PRECEDE + specifier.encode('utf8').encode('string-escape') + self.ELISION_SUCCEED)
+        # resolve the elision of each field with the punctuation of the template around it,
+        # when rendering it only changes if the neighbouring fields have already removed some of it
+        self.elisions = {}
+        self.elided_fields = 0
+        if self.export_format in [adsFormatter.csv, adsFormatter.tsv]:
+            return
+        for k, (preceding, following) in enumerate(context):
+            key = self.__get_elision_key(k, preceding, following)
+            elision = self.elisions[key] = self.__resolve_elision(*key)
+            # fields that take punctuation of the template with them when empty
+            if (elision is not None) and (elision != (0, 0)):
+                self.elided_fields += 1
+
+
+    def __parse_author(self, specifier):
+        """
+        n.m of the author specifier, if the number of authors is larger than n, the list is truncated
+        to m entries, if .m is not specified, n.1 is assumed
+
+        :param specifier:
+        :return: (kind, n, m), kind is one of abbreviated, truncated, first, all
+        """
+        matches = self.REGEX_AUTHOR.findall(specifier)
+        if (len(matches) >= 1):
+            # format n is a special case
+            if (matches[0][1] == 'n'):
+                return ('abbreviated', 0, 0)
+            # so is the format for H and h if not abbreviated
+            elif ((matches[0][1] == 'H') or (matches[0][1] == 'h')) and len(matches[0][0]) == 0:
+                return ('abbreviated', 0, 1)
+            elif (len(matches[0][0]) > 0):
+                abbreviated = matches[0][0].split('.')
+                n = int(str(abbreviated[0]))
+                if (len(abbreviated) > 1):
+                    m = int(str(abbreviated[1]))
+                else:
+                    m = 1
+                return ('truncated', n, m)
+        # see if it is a first author format
+        if len(self.REGEX_FIRST_AUTHOR.findall(specifier)) >= 1:
+            return ('first', 0, 0)
+        return ('all', 0, 0)
+
+
+    def __parse_parameters(self):
+        """
+        parameters of the specifiers that do not change from record to record,
+        n.m of the author specifiers, and the number of affiliations to display
+        also the specifier without its field encoding, specifiers that differ only in encoding have the same value
+
+        :return:
+        """
+        for field in self.parsed_spec:
+            self.sources[field[1]] = self.REGEX_FIELD_ENCODING.sub('%', field[1], count=1)
+            if (field[2] == 'author'):
+                self.authors[field[1]] = self.__parse_author(field[1])
+        # if a limit of number of affiliation to display is set
+        match = ''.join(self.REGEX_AFF.findall(self.custom_format))
+        if (len(match) >= 1):
+            self.aff_count = int(match)
+
+
+    def __get_elision_key(self, k, preceding, following):
+        """
+
+        :param k: index of the field
+        :param preceding: rendered text before the field
+        :param following: rendered text after the field
+        :return: index of the field, and the punctuation before and after it that can be removed
+        """
+        return (k, self.REGEX_ELISION_BEFORE.search(preceding).group(0), self.REGEX_ELISION_AFTER.match(following).group(0))
+
+
+    def get_elision(self, k, preceding, following):
+        """
+        punctuation removed with fields[k], when the field is empty
+        outcome is resolved once for each punctuation around the field, the ones of the template when
+        compiled, the ones changed by the neighbouring fields when first rendered, since the plan is shared
+        by the requests those are kept apart under the lock
+
+        :param k: index of the field
+        :param preceding: rendered text before the field
+        :param following: rendered text after the field
+        :return: (before, after) number of characters to remove before and after the field,
+                 None if the field and its punctuation are not matched, and the field stays as is
+        """
+        key = self.__get_elision_key(k, preceding, following)
+        if key in self.elisions:
+            return self.elisions[key]
+        # outcomes are only added, so they can be read without the lock
+        if key in self.rendered_elisions:
+            return self.rendered_elisions[key]
+        with self.lock:
+            if key not in self.rendered_elisions:
+                self.rendered_elisions[key] = self.__resolve_elision(*key)
+            return self.rendered_elisions[key]
+
+
+    def __resolve_elision(self, k, preceding, following):
+        """
+
+        :param k: index of the field
+        :param preceding: punctuation before the field
+        :param following: punctuation after the field
+        :return: see get_elision
+        """
+        specifier = self.fields[k][1]
+        context = (preceding + specifier + following).replace('\\n ', '')
+        patterns = self.__match_punctuation([elem[0] for elem in self.elision_regex[specifier].findall(context)])
+        for p in patterns:
+            # check for the spearator, if it is the same on both side, eliminate the one at the end
+            if p[0] == p[-1] and len(p) > 1:
+                p = p[:-1]
+            at = p.find(specifier)
+            if at < 0:
+                continue
+            before, after = p[:at], p[at + len(specifier):]
+            # the first one found around the field
+            if preceding.endswith(before) and following.startswith(after):
+                return len(before), len(after)
+        return None
 
 
     def __match_punctuation(self, list_str):
@@ -781,96 +1215,50 @@ class CustomFormat(Format):
         return pattern
 
 
-    def __add_in(self, result, field, value):
+class CustomFormatPlanCache:
+    """
+    compiled custom formats, keyed by the custom format string, least recently used ones are dropped
+    """
+    def __init__(self, max_size=500):
         """
 
-        :param result:
-        :param field:
-        :param value:
-        :return:
+        :param max_size: number of compiled custom formats kept, 0 turns off caching
         """
-        precede = r'([\\]?[\(|\{|\[|\"]?(\\(it|bf|sc|em)\s)?[\\|\s|,|-]?'
-        succeed = r'[\\|,]?[\)|\}|\]|\"]?[\\|,]?)'
+        self.max_size = max_size
+        self.lock = Lock()
+        self.plans = OrderedDict()
 
-        # in the csv format we add double quotes followed by a comma
-        # whether there is a value or not
-        if self.export_format == adsFormatter.csv:
-            if (len(value) > 0):
-                insert_value = '"' + self.__encode(value, field[2], field[1]) + '",'
-            else:
-                insert_value = '"",'
-            pattern = self.__match_punctuation([elem[0] for elem in re.findall(precede + field[1].encode('utf8').encode('string-escape') + succeed, result.replace('\\n ', ''))])
-            for p in pattern:
-                result = result.replace(p, insert_value)
-            return result
-
-        if (len(value) > 0):
-            return result.replace(field[1], self.__encode(value, field[2], field[1]))
-        else:
-            pattern = self.__match_punctuation([elem[0] for elem in re.findall(precede + field[1].encode('utf8').encode('string-escape') + succeed, result.replace('\\n ', ''))])
-            for p in pattern:
-                # check for the spearator, if it is the same on both side, eliminate the one at the end
-                if p[0] == p[-1] and len(p) > 1:
-                    p = p[:-1]
-                result = result.replace(p, '')
-            return result
+    def get(self, custom_format):
+        """
 
+        :param custom_format: custom format string
+        :return: CustomFormatPlan
+        """
+        with self.lock:
+            plan = self.plans.pop(custom_format, None)
+            if plan is not None:
+                self.plans[custom_format] = plan
+        if plan is not None:
+            metrics.cache_requests.inc(cache='custom_format', result='hit')
+            return plan
+        metrics.cache_requests.inc(cache='custom_format', result='miss')
+        plan = CustomFormatPlan(custom_format)
+        if self.max_size > 0:
+            with self.lock:
+                self.plans[custom_format] = plan
+                while len(self.plans) > self.max_size:
+                    self.plans.popitem(last=False)
+        return plan
 
-    def __get_doc(self, index):
+    def find(self, custom_format):
         """
+        look up the compiled custom format without compiling or keeping it, and without counting it as used
 
-        :param index: index to the docs structure returned from solr
-        :return:
+        :param custom_format: custom format string
+        :return: CustomFormatPlan, None if not kept
         """
-        result = self.custom_format
-        a_doc = self.from_solr['response'].get('docs')[index]
-        for field in self.parsed_spec:
-            if (field[2] == 'title') or (field[2] == 'doi') or (field[2] == 'comment'):
-                result = self.__add_in(result, field, ''.join(a_doc.get(field[2], '')))
-            elif (field[2] == 'author'):
-                result = self.__add_in(result, field, self.__get_author_list(field[1], index))
-            elif (field[2] == 'doctype'):
-                result = self.__add_in(result, field, a_doc.get(field[2], ''))
-            elif (field[2] == 'pubdate'):
-                result = self.__add_in(result, field, self.__format_date(a_doc.get(field[2], ''), field[1][-1]))
-            elif (field[2] == 'aff'):
-                result = self.__add_in(result, field, self.__get_affiliation_list(a_doc))
-            elif (field[2] == 'keyword'):
-                result = self.__add_in(result, field, self.__get_keywords(a_doc))
-            elif (field[2] == 'url'):
-                result = self.__add_in(result, field, self.__format_url(a_doc.get('bibcode', ''), field[1][-1]))
-            elif (field[2] == 'abstract') or (field[2] == 'copyright') or (field[2] == 'bibcode') or \
-                 (field[2] == 'volume') or (field[2] == 'year') or (field[2] == 'issue'):
-                result = self.__add_in(result, field, a_doc.get(field[2], ''))
-            elif (field[2] == 'pub') or (field[2] == 'pub_raw'):
-                result = self.__add_in(result, field, self.__get_publication(field[1], a_doc))
-            elif (field[2] == 'citation_count') or (field[2] == 'page_count'):
-                result = self.__add_in(result, field, str(a_doc.get(field[2], '')))
-            elif (field[2] == 'eid,identifier'):
-                result = self.__add_in(result, field, get_eprint(a_doc))
-            elif (field[2] == 'page,page_range') or (field[2] == 'lastpage,page_range') or (field[2] == 'page_range,page'):
-                result = self.__add_in(result, field, self.__get_page(field[2], a_doc))
-        result += self.line_feed
-
-        return self.__format_line_wrapped(result, index)
+        with self.lock:
+            return self.plans.get(custom_format)
 
 
-    def get(self):
-        """
-        
-        :return: result of formatted records in a dict
-        """
-        num_docs = 0
-        results = []
-        if (self.status == 0):
-            if len(self.header) > 0:
-                results.append(self.header + self.__get_linefeed())
-            num_docs = self.get_num_docs()
-            for index in range(num_docs):
-                results.append(self.__get_doc(index))
-            if len(self.footer) > 0:
-                results.append(self.__get_linefeed() + self.footer)
-        result_dict = {}
-        result_dict['msg'] = 'Retrieved {} abstracts, starting with number 1.'.format(num_docs)
-        result_dict['export'] = ''.join(result for result in results)
-        return result_dict
+custom_format_plans = CustomFormatPlanCache()
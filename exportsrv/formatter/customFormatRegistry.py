@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+from hashlib import sha1
+import json
+import os
+import re
+import time
+
+from exportsrv.formatter.customFormat import CustomFormatPlan, custom_format_plans
+from exportsrv.formatter.convertCF import convert
+from exportsrv.formatter.oldFormats import customFormatsClassic
+
+# This module keeps custom formats by id, compiled once, so that requests can refer
+# to a format by its id instead of sending the format string to be parsed again
+#    custom_format_registry.build(app.config)
+#    format_id = custom_format_registry.save(custom_format_str)
+#    CustomFormat(custom_format=None, plan=custom_format_registry.get(format_id))
+# Classic custom formats are converted and compiled the first time the registry is built,
+# their ids are classic-<n>, n being the position of the format in oldFormats starting at 1.
+# Formats saved by users are compiled on save and written to the custom formats dir,
+# so that any process of the service can find them, their ids are user-<hash of the format>.
+# Saving is turned off if the dir is not configured. Formats not used within ttl are removed,
+# and once max formats are kept no more can be saved until some expire.
+
+
+class CustomFormatRegistry:
+
+    REGEX_USER_ID = re.compile(r'^user-[0-9a-f]{16}$')
+
+    def __init__(self, max_size=10000):
+        """
+
+        :param max_size: number of user formats kept in memory, once reached they are read from disk again
+        """
+        self.classic = {}
+        self.classic_formats = {}
+        self.user_formats = {}
+        self.max_size = max_size
+        self.formats_dir = None
+        self.ttl = 0
+        self.max_formats = 0
+        self.used = {}
+
+    def build(self, config):
+        """
+        classic formats do not change, they are compiled once per process
+
+        :param config: app config
+        :return:
+        """
+        self.formats_dir = config.get('EXPORT_SERVICE_CUSTOM_FORMATS_DIR')
+        self.ttl = config.get('EXPORT_SERVICE_CUSTOM_FORMATS_TTL', 3600 * 24 * 365)
+        self.max_formats = config.get('EXPORT_SERVICE_CUSTOM_FORMATS_MAX', 100000)
+        self.user_formats = {}
+        self.used = {}
+        if len(self.classic) > 0:
+            return
+        plans = {}
+        for i, classic_format in enumerate(customFormatsClassic):
+            custom_format = convert(classic_format)
+            if custom_format not in plans:
+                try:
+                    plans[custom_format] = CustomFormatPlan(custom_format)
+                except Exception:
+                    # not a valid custom format, ie, line length is not a number
+                    plans[custom_format] = None
+            if plans[custom_format] is not None:
+                format_id = 'classic-{}'.format(i + 1)
+                self.classic[format_id] = plans[custom_format]
+                self.classic_formats[format_id] = custom_format
+
+    def __get_path(self, format_id):
+        """
+
+        :param format_id:
+        :return: path of the file the user format is kept in
+        """
+        return os.path.join(self.formats_dir, format_id + '.json')
+
+    def get_format(self, format_id):
+        """
+
+        :param format_id:
+        :return: custom format string, None if there is no format with this id
+        """
+        if format_id in self.classic_formats:
+            return self.classic_formats[format_id]
+        # ids of user formats are generated here, anything else is not ours
+        if (self.formats_dir is None) or not self.REGEX_USER_ID.match(format_id):
+            return None
+        custom_format = self.user_formats.get(format_id)
+        if custom_format is None:
+            try:
+                with open(self.__get_path(format_id)) as f:
+                    custom_format = json.load(f)['format']
+            except (IOError, ValueError, KeyError):
+                return None
+            self.__keep(format_id, custom_format)
+        self.__touch(format_id)
+        return custom_format
+
+    def get(self, format_id):
+        """
+
+        :param format_id:
+        :return: compiled custom format, None if there is no format with this id
+        """
+        plan = self.classic.get(format_id)
+        if plan is not None:
+            return plan
+        custom_format = self.get_format(format_id)
+        if custom_format is None:
+            return None
+        return custom_format_plans.get(custom_format)
+
+    def is_enabled(self):
+        """
+
+        :return: True if formats can be saved, ie, custom formats dir is configured
+        """
+        return self.formats_dir is not None
+
+    def cleanup(self):
+        """
+        remove the user formats that have not been used within ttl
+
+        :return: number of formats kept
+        """
+        expire = time.time() - self.ttl
+        kept = 0
+        for file_name in os.listdir(self.formats_dir):
+            path = os.path.join(self.formats_dir, file_name)
+            try:
+                if os.path.getmtime(path) < expire:
+                    os.remove(path)
+                    self.user_formats.pop(file_name[:-len('.json')], None)
+                else:
+                    kept += 1
+            except OSError:
+                pass
+        return kept
+
+    def save(self, custom_format):
+        """
+        compile the custom format and keep it, raises an exception if it cannot be compiled
+
+        :param custom_format: custom format string
+        :return: id of the format, None if saving is turned off or max formats are already kept
+        """
+        custom_format_plans.get(custom_format)
+        if not self.is_enabled():
+            return None
+        format_id = 'user-' + sha1(custom_format.encode('utf8')).hexdigest()[:16]
+        if not os.path.isdir(self.formats_dir):
+            try:
+                os.makedirs(self.formats_dir)
+            except OSError:
+                # another process just created it
+                pass
+        path = self.__get_path(format_id)
+        if not os.path.isfile(path) and self.cleanup() >= self.max_formats:
+            return None
+        # write the file atomically so that readers never see a partial file
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'format': custom_format}, f)
+        os.rename(path + '.tmp', path)
+        self.__keep(format_id, custom_format)
+        self.used[format_id] = time.time()
+        return format_id
+
+    def __touch(self, format_id):
+        """
+        mark the user format as used, so that it does not expire, the file is touched
+        at most a few times within ttl
+
+        :param format_id:
+        :return:
+        """
+        now = time.time()
+        if now - self.used.get(format_id, 0) < self.ttl / 10:
+            return
+        try:
+            os.utime(self.__get_path(format_id), None)
+        except OSError:
+            pass
+        if len(self.used) >= self.max_size:
+            self.used = {}
+        self.used[format_id] = now
+
+    def __keep(self, format_id, custom_format):
+        """
+
+        :param format_id:
+        :param custom_format:
+        :return:
+        """
+        if len(self.user_formats) >= self.max_size:
+            self.user_formats = {}
+        self.user_formats[format_id] = custom_format
+
+
+custom_format_registry = CustomFormatRegistry()
@@ -1,14 +1,14 @@
 # -*- coding: utf-8 -*-
 
 from collections import OrderedDict
-from datetime import datetime
 from flask import current_app
-from textwrap import fill
 import re
 
 from exportsrv.formatter.format import Format
+from exportsrv.formatter.lineWrap import fill
 from exportsrv.utils import get_eprint
-from exportsrv.formatter.strftime import strftime
+from exportsrv.formatter.pubDate import pub_dates
+from exportsrv.timing import timed
 
 # This class accepts JSON object created by Solr and can reformats it
 # for the various fielded (formerly known as tagged) Export formats we are supporting.
@@ -108,12 +108,10 @@ class FieldedFormat(Format):
         :param export_format:
         :return:
         """
-        # solr_date has the format 2017-12-01
-        date_time = datetime.strptime(solr_date.replace('-00', '-01'), '%Y-%m-%d')
         formats = {self.EXPORT_FORMAT_ADS: '%m/%Y', self.EXPORT_FORMAT_ENDNOTE: '%B %d, %Y',
                    self.EXPORT_FORMAT_PROCITE: '%Y/%m/X%d', self.EXPORT_FORMAT_REFMAN: '%Y/%m/X%d',
                    self.EXPORT_FORMAT_REFWORKS: '%Y/%m/X%d', self.EXPORT_FORMAT_MEDLARS: '%Y %b %d'}
-        return strftime(date_time, formats[export_format]).replace('X0', 'X').replace('X', '')
+        return pub_dates.get(solr_date, formats[export_format])
 
 
     def __format_line_wrapped(self, text):
@@ -534,6 +532,7 @@ class FieldedFormat(Format):
         return result + '\n\n'
 
 
+    @timed('render')
     def __get_fielded(self, export_format):
         """
         for each document from Solr, get the fields, and format them accordingly
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+from flask import current_app
+
+from exportsrv.formatter.format import Format
+
+# This module keeps the journal names the formats display in place of pub, keyed by bibstem,
+# built from config once at app startup, so that formatters do not go back to config for every record,
+# if used before that, it is built from the config of the current app on the first lookup
+#    journal_index.build(app.config)
+#    journal_index.get_macro(a_doc.get('bibstem', ''), default=pub)
+#    journal_index.get_abbreviation(a_doc.get('bibstem', ''))
+# Abbreviations are derived from both the short and long bibstem of the record, so they are
+# computed the first time a bibstem is seen, up to max abbreviations are kept.
+
+
+class JournalIndex:
+
+    def __init__(self, max_abbreviations=50000):
+        """
+
+        :param max_abbreviations: number of abbreviations kept, once reached they are computed again
+        """
+        self.macros = {}
+        self.soph_abbreviations = {}
+        self.abbreviations = {}
+        self.max_abbreviations = max_abbreviations
+        self.built = False
+
+    def build(self, config):
+        """
+
+        :param config: app config
+        :return:
+        """
+        self.macros = dict([(k, v) for k, v in config.get('EXPORT_SERVICE_AASTEX_JOURNAL_MACRO', [])])
+        self.soph_abbreviations = dict(config.get('EXPORT_SERVICE_SOPH_JOURNAL_ABBREVIATION', {}))
+        self.abbreviations = {}
+        self.built = True
+
+    def __get_bibstem(self, bibstem):
+        """
+        builds the index from the config of the current app if it has not been built yet,
+        raises RuntimeError when there is no app context to build it from
+
+        :param bibstem: bibstem of the record, short and long
+        :return: bibstem the index is keyed by
+        """
+        if not self.built:
+            self.build(current_app.config)
+        return Format(None).get_bibstem(bibstem)
+
+    def get_macro(self, bibstem, default=None):
+        """
+
+        :param bibstem: bibstem of the record, short and long
+        :param default: returned if the journal has no AASTeX macro
+        :return: AASTeX macro of the journal
+        """
+        bibstem = self.__get_bibstem(bibstem)
+        return self.macros.get(bibstem, default)
+
+    def get_soph_abbreviation(self, bibstem, default=None):
+        """
+
+        :param bibstem: bibstem of the record, short and long
+        :param default: returned if the journal has no Solar Physics abbreviation
+        :return: journal abbreviation of the Solar Physics style
+        """
+        bibstem = self.__get_bibstem(bibstem)
+        return self.soph_abbreviations.get(bibstem, default)
+
+    def get_abbreviation(self, bibstem):
+        """
+
+        :param bibstem: bibstem of the record, short and long
+        :return: journal abbreviation, see Format.get_pub_abbrev
+        """
+        key = tuple(bibstem)
+        abbreviation = self.abbreviations.get(key)
+        if abbreviation is None:
+            abbreviation = Format(None).get_pub_abbrev(bibstem)
+            if len(self.abbreviations) >= self.max_abbreviations:
+                self.abbreviations = {}
+            self.abbreviations[key] = abbreviation
+        return abbreviation
+
+
+journal_index = JournalIndex()
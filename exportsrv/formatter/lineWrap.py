@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+from textwrap import TextWrapper
+
+# This module wraps text the same as textwrap.fill, and is shared by the formatters
+#    fill(text, width=72, subsequent_indent=' ' * 8)
+# Wrappers are built once for each combination of options.
+# Text that already fits in one line is returned as is, and the text is split into words
+# on whitespace first, so that the hyphenated words pattern, that is slow on long text,
+# is only applied to the words that have a hyphen.
+
+
+class LineWrapper(TextWrapper):
+
+    def _split(self, text):
+        """
+        same chunks as TextWrapper._split
+
+        :param text:
+        :return:
+        """
+        if isinstance(text, unicode):
+            simple, hyphenated = self.wordsep_simple_re_uni, self.wordsep_re_uni
+        else:
+            simple, hyphenated = self.wordsep_simple_re, self.wordsep_re
+        chunks = simple.split(text)
+        if self.break_on_hyphens and '-' in text:
+            # the pattern does not go across whitespace, so each word can be split on its own
+            words = chunks
+            chunks = []
+            for word in words:
+                if '-' in word:
+                    chunks.extend(hyphenated.split(word))
+                else:
+                    chunks.append(word)
+        return filter(None, chunks)
+
+
+wrappers = {}
+
+# characters that wrapping changes, tabs are expanded, and the others are replaced by blank if replace_whitespace
+WHITESPACE_EXPANDED = '\t'
+WHITESPACE_REPLACED = '\t\n\x0b\x0c\r'
+
+
+def fill(text, width=70, subsequent_indent='', replace_whitespace=True, break_on_hyphens=True):
+    """
+    textwrap.fill with the options the formatters use
+
+    :param text:
+    :param width:
+    :param subsequent_indent:
+    :param replace_whitespace:
+    :param break_on_hyphens:
+    :return:
+    """
+    # text that fits in one line is not changed, unless it ends with whitespace that is dropped,
+    # or has whitespace that is expanded or replaced
+    if (0 < len(text) <= width) and not text[-1].isspace():
+        changed = WHITESPACE_REPLACED if replace_whitespace else WHITESPACE_EXPANDED
+        for char in changed:
+            if char in text:
+                break
+        else:
+            return text
+    key = (width, subsequent_indent, replace_whitespace, break_on_hyphens)
+    wrapper = wrappers.get(key)
+    if wrapper is None:
+        wrapper = LineWrapper(width=width, subsequent_indent=subsequent_indent,
+                              replace_whitespace=replace_whitespace, break_on_hyphens=break_on_hyphens)
+        wrappers[key] = wrapper
+    return wrapper.fill(text)
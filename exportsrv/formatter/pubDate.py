@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+
+from exportsrv.formatter.strftime import strftime
+
+# This module renders solr pubdate, ie 2017-12-00, in the date formats of the formatters,
+# shared by all the formats and requests, since records are published in a few year and month combinations
+#    pub_dates.get(a_doc.get('pubdate', ''), '%m/%Y')
+#    pub_dates.get(a_doc.get('pubdate', ''), '%Y/%m/X%d')
+# An X before a directive drops the leading zero of the number, ie 2017/12/1.
+# Each pubdate and format is parsed and formatted the first time it is seen, up to max size are kept.
+
+
+class PubDateCache:
+
+    def __init__(self, max_size=10000):
+        """
+
+        :param max_size: number of rendered dates kept, once reached they are rendered again, 0 turns off caching
+        """
+        self.max_size = max_size
+        self.dates = {}
+
+    def __render(self, solr_date, date_format):
+        """
+
+        :param solr_date:
+        :param date_format:
+        :return:
+        """
+        # solr_date has the format 2017-12-01, with 00 for unknown month and day
+        date_time = datetime.strptime(solr_date.replace('-00', '-01'), '%Y-%m-%d')
+        rendered = strftime(date_time, date_format)
+        if 'X' in date_format:
+            rendered = rendered.replace('X0', 'X').replace('X', '')
+        return rendered
+
+    def get(self, solr_date, date_format):
+        """
+        raises ValueError if solr_date is not a date
+
+        :param solr_date: pubdate from solr
+        :param date_format: strftime format
+        :return:
+        """
+        key = (solr_date, date_format)
+        rendered = self.dates.get(key)
+        if rendered is None:
+            rendered = self.__render(solr_date, date_format)
+            if self.max_size > 0:
+                if len(self.dates) >= self.max_size:
+                    self.dates = {}
+                self.dates[key] = rendered
+        return rendered
+
+
+pub_dates = PubDateCache()
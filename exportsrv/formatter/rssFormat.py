@@ -3,9 +3,10 @@
 import xml.etree.cElementTree as ET
 from collections import OrderedDict
 from flask import current_app
-from textwrap import fill
 
 from exportsrv.formatter.format import Format
+from exportsrv.formatter.lineWrap import fill
+from exportsrv.timing import timed
 
 class RSSFormat(Format):
 
@@ -115,6 +116,7 @@ class RSSFormat(Format):
         return result_dict
 
 
+    @timed('render')
     def get(self, link=''):
         """
 
@@ -1,11 +1,11 @@
 # -*- coding: utf-8 -*-
 
 import xml.etree.cElementTree as ET
-from datetime import datetime
 from flask import current_app
 
 from exportsrv.formatter.format import Format
-from exportsrv.formatter.strftime import strftime
+from exportsrv.formatter.pubDate import pub_dates
+from exportsrv.timing import timed
 
 class VOTableFormat(Format):
 
@@ -89,9 +89,7 @@ class VOTableFormat(Format):
         :param solr_date:
         :return:
         """
-        # solr_date has the format 2017-12-01
-        date_time = datetime.strptime(solr_date.replace('-00', '-01'), '%Y-%m-%d')
-        return strftime(date_time, '%Y-%m-X%d').replace('X0', 'X').replace('X', '')
+        return pub_dates.get(solr_date, '%Y-%m-X%d')
 
 
     def __add_in_table_data(self, parent, value):
@@ -154,6 +152,7 @@ class VOTableFormat(Format):
         return result_dict
 
 
+    @timed('render')
     def get(self):
         """
 
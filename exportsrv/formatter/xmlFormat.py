@@ -2,13 +2,13 @@
 
 import xml.etree.cElementTree as ET
 from collections import OrderedDict
-from datetime import datetime
 from flask import current_app
-from textwrap import fill
 
 from exportsrv.formatter.format import Format
+from exportsrv.formatter.lineWrap import fill
 from exportsrv.utils import get_eprint
-from exportsrv.formatter.strftime import strftime
+from exportsrv.formatter.pubDate import pub_dates
+from exportsrv.timing import timed
 
 # This class accepts JSON object created by Solr and can reformats it
 # for the XML Export formats we are supporting.
@@ -45,10 +45,8 @@ class XMLFormat(Format):
         :param export_format:
         :return:
         """
-        # solr_date has the format 2017-12-01
-        dateTime = datetime.strptime(solr_date.replace('-00', '-01'), '%Y-%m-%d')
         formats = {self.EXPORT_FORMAT_DUBLIN_XML: '%Y-%m-%d', self.EXPORT_FORMAT_REF_XML: '%b %Y', self.EXPORT_FORMAT_REF_ABS_XML: '%b %Y'}
-        return strftime(dateTime, formats[export_format])
+        return pub_dates.get(solr_date, formats[export_format])
 
 
     def __format_line_wrapped(self, text):
@@ -512,6 +510,7 @@ class XMLFormat(Format):
                 self.__add_in(record, fields[field], get_eprint(a_doc))
 
 
+    @timed('render')
     def __get_xml(self, export_format):
         """
         setup the outer xml structure
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+from threading import Thread, Lock
+from Queue import Queue, Empty
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from exportsrv.utils import get_solr_data
+from exportsrv.views import default_solr_fields
+from exportsrv.formatter.ads import adsFormatter, adsJournalFormat
+from exportsrv.formatter.bibTexFormat import BibTexFormat
+from exportsrv.formatter.fieldedFormat import FieldedFormat
+from exportsrv.formatter.cslJson import CSLJson
+from exportsrv.formatter.csl import CSL
+from exportsrv.tests.unittests.stubdata import solrdata
+
+# This module runs exports that are too large for a synchronous request.
+# A job is submitted with a list of bibcodes and a style, records are fetched from
+# solr in chunks, each chunk is formatted and appended to a result file on local disk.
+# The status of the job is kept in a json file next to the result, so that
+# any process of the service can report on it.
+#    job_id = ExportJobs(app).submit(bibcodes, style, authorization)
+#    ExportJobs(app).get_status(job_id)
+#    ExportJobs(app).get_result_path(job_id)
+
+class adsJobStatus:
+    queued, running, done, failed = 'queued', 'running', 'done', 'failed'
+
+
+class ExportJobs:
+
+    # only styles that can be built by concatenating the output of chunks,
+    # ie, no header/footer, no global numbering, are supported for jobs
+    styles = ['bibtex', 'bibtexabs', 'ads', 'endnote', 'procite', 'ris', 'refworks', 'medlars',
+              'aastex', 'icarus', 'mnras', 'soph', 'aspc', 'apsj', 'aasj']
+
+    def __init__(self, app):
+        """
+
+        :param app: flask application, needed to get an app context in the worker threads
+        """
+        self.app = app
+        self.queue = Queue()
+        self.workers = []
+        self.lock = Lock()
+        self.cleaned = 0
+
+    def __get_dir(self):
+        """
+
+        :return: directory where the job files are kept
+        """
+        jobs_dir = self.app.config.get('EXPORT_SERVICE_JOBS_DIR') or os.path.join(tempfile.gettempdir(), 'export_jobs')
+        if not os.path.isdir(jobs_dir):
+            try:
+                os.makedirs(jobs_dir)
+            except OSError:
+                # another process just created it
+                pass
+        return jobs_dir
+
+    def __get_status_path(self, job_id):
+        return os.path.join(self.__get_dir(), job_id + '.json')
+
+    def get_result_path(self, job_id):
+        """
+
+        :param job_id:
+        :return: path of the result file, only if the job is done
+        """
+        self.__cleanup_due()
+        status = self.get_status(job_id)
+        if status and status['status'] == adsJobStatus.done:
+            return os.path.join(self.__get_dir(), job_id + '.txt')
+        return None
+
+    def __write_status(self, job_id, status):
+        """
+        write the status file atomically so that readers never see a partial file
+
+        :param job_id:
+        :param status:
+        :return:
+        """
+        status['updated'] = time.time()
+        path = self.__get_status_path(job_id)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(status, f)
+        os.rename(path + '.tmp', path)
+
+    def get_status(self, job_id):
+        """
+
+        :param job_id:
+        :return: status dict of the job, or None if job does not exist or has expired
+        """
+        # job ids are uuid hex strings, anything else is not ours
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self.__get_status_path(job_id)) as f:
+                status = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if time.time() - status['updated'] > self.app.config['EXPORT_SERVICE_JOBS_TTL']:
+            return None
+        return status
+
+    def cleanup(self):
+        """
+        remove files of the jobs that have not been updated within ttl
+
+        :return: number of files removed
+        """
+        self.cleaned = time.time()
+        jobs_dir = self.__get_dir()
+        expire = time.time() - self.app.config['EXPORT_SERVICE_JOBS_TTL']
+        removed = 0
+        for file_name in os.listdir(jobs_dir):
+            path = os.path.join(jobs_dir, file_name)
+            try:
+                if os.path.getmtime(path) < expire:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def __cleanup_due(self):
+        """
+        remove the expired jobs if not done within cleanup interval, so that files do not pile up
+        when no new jobs are submitted
+
+        :return: number of files removed
+        """
+        with self.lock:
+            if time.time() - self.cleaned < self.app.config['EXPORT_SERVICE_JOBS_CLEANUP_INTERVAL']:
+                return 0
+            self.cleaned = time.time()
+        return self.cleanup()
+
+    def __start_workers(self):
+        """
+        workers are started on the first submission, not at app creation,
+        so that they are created after the server forks
+
+        :return:
+        """
+        with self.lock:
+            self.workers = [worker for worker in self.workers if worker.is_alive()]
+            for i in range(self.app.config['EXPORT_SERVICE_JOBS_WORKERS'] - len(self.workers)):
+                worker = Thread(target=self.__work)
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+
+    def __work(self):
+        """
+        worker thread loop
+
+        :return:
+        """
+        while True:
+            try:
+                job_id, bibcodes, style, authorization = self.queue.get(timeout=self.app.config['EXPORT_SERVICE_JOBS_CLEANUP_INTERVAL'])
+            except Empty:
+                self.__cleanup_due()
+                continue
+            try:
+                self.run(job_id, bibcodes, style, authorization)
+            finally:
+                self.queue.task_done()
+
+    def submit(self, bibcodes, style, authorization=''):
+        """
+
+        :param bibcodes: list of bibcodes
+        :param style: one of the styles supported for jobs
+        :param authorization: authorization header of the request, used to query solr, not saved to disk
+        :return: job id
+        """
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        self.__write_status(job_id, {'id': job_id, 'status': adsJobStatus.queued, 'style': style,
+                                     'total': len(bibcodes), 'processed': 0, 'msg': ''})
+        if self.app.config['EXPORT_SERVICE_JOBS_WORKERS'] > 0:
+            self.__start_workers()
+            self.queue.put((job_id, bibcodes, style, authorization))
+        else:
+            # no workers, run in place
+            self.run(job_id, bibcodes, style, authorization)
+        return job_id
+
+    def __render(self, solr_data, style):
+        """
+
+        :param solr_data:
+        :param style:
+        :return: formatted records
+        """
+        if style in ['bibtex', 'bibtexabs']:
+            if style == 'bibtex':
+                include_abs, maxauthor = False, 10
+            else:
+                include_abs, maxauthor = True, 0
+            return BibTexFormat(solr_data, keyformat='%R').get(include_abs=include_abs, maxauthor=maxauthor,
+                                                                authorcutoff=200, journalformat=adsJournalFormat.macro)['export']
+        fielded = {'ads': 'get_ads_fielded', 'endnote': 'get_endnote_fielded', 'procite': 'get_procite_fielded',
+                   'ris': 'get_refman_fielded', 'refworks': 'get_refworks_fielded', 'medlars': 'get_medlars_fielded'}
+        if style in fielded:
+            return getattr(FieldedFormat(solr_data), fielded[style])()['export']
+        if style in ['aastex', 'aspc', 'aasj']:
+            journal_format = adsJournalFormat.macro
+        else:
+            journal_format = adsJournalFormat.full
+        return CSL(CSLJson(solr_data).get(), style, adsFormatter.latex, journal_format).get()['export']
+
+    def run(self, job_id, bibcodes, style, authorization=''):
+        """
+        fetch and format the records chunk by chunk, appending them to the result file
+
+        :param job_id:
+        :param bibcodes:
+        :param style:
+        :param authorization:
+        :return:
+        """
+        status = self.get_status(job_id)
+        if status is None:
+            return
+        result_path = os.path.join(self.__get_dir(), job_id + '.txt')
+        chunk_size = self.app.config['EXPORT_SERVICE_MAX_RECORDS_SOLR_BIGQUERY']
+        if style in ['bibtex', 'bibtexabs']:
+            encode_style = adsFormatter.latex
+        else:
+            encode_style = adsFormatter.unicode
+        # the chunks are fetched one by one, so a global sort is not possible,
+        # records are kept in the order of the submitted bibcodes
+        sort = self.app.config['EXPORT_SERVICE_NO_SORT_SOLR']
+        fields = default_solr_fields()
+        status['status'] = adsJobStatus.running
+        self.__write_status(job_id, status)
+        try:
+            with open(result_path + '.part', 'w') as f:
+                for start in range(0, len(bibcodes), chunk_size):
+                    chunk = bibcodes[start:start + chunk_size]
+                    with self.app.app_context():
+                        # if in the test mode, use test solr data
+                        if chunk == [self.app.config['EXPORT_SERVICE_TEST_BIBCODE_GET']]:
+                            solr_data = solrdata.data
+                        else:
+                            solr_data = get_solr_data(bibcodes=chunk, fields=fields, sort=sort, encode_style=encode_style,
+                                                      authorization=authorization)
+                        if solr_data is None:
+                            raise ValueError('no result from solr')
+                        export = self.__render(solr_data, style)
+                    if isinstance(export, unicode):
+                        export = export.encode('utf-8')
+                    f.write(export)
+                    status['processed'] = start + len(chunk)
+                    self.__write_status(job_id, status)
+            os.rename(result_path + '.part', result_path)
+            status['status'] = adsJobStatus.done
+        except Exception as e:
+            self.app.logger.error('export job {job_id} failed: {error}'.format(job_id=job_id, error=str(e)))
+            status['status'] = adsJobStatus.failed
+            status['msg'] = str(e)
+            if os.path.exists(result_path + '.part'):
+                os.remove(result_path + '.part')
+        self.__write_status(job_id, status)
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+from threading import Lock
+
+from exportsrv.timing import Histogram, phase_histograms
+
+# This module keeps an in-process registry of operational metrics,
+# exposed in Prometheus text format at /metrics
+#    metrics.requests_total.inc(format='bibtex', method='POST', status='200')
+#    metrics.solr_duration.observe(0.12, method='query')
+#    metrics.expose()
+
+class Metric:
+    """
+    parent class for the metrics, values are kept per combination of label values
+    """
+    kind = ''
+
+    def __init__(self, name, help, labelnames=()):
+        """
+
+        :param name: metric name
+        :param help: description of the metric
+        :param labelnames: names of the labels
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = Lock()
+
+    def get_key(self, labels):
+        """
+
+        :param labels: dict of label name to value
+        :return: tuple of label values in order of label names
+        """
+        return tuple(str(labels.get(labelname, '')) for labelname in self.labelnames)
+
+    def format_labels(self, key, extra=None):
+        """
+
+        :param key: tuple of label values
+        :param extra: additional (name, value) to add to the labels, ie, le for histograms
+        :return: labels in Prometheus text format
+        """
+        pairs = list(zip(self.labelnames, key))
+        if extra is not None:
+            pairs.append(extra)
+        if len(pairs) == 0:
+            return ''
+        escape = lambda value: value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{' + ','.join('{}="{}"'.format(name, escape(value)) for name, value in pairs) + '}'
+
+    def get_samples(self):
+        """
+
+        :return: list of (name with labels, value)
+        """
+        with self.lock:
+            return [(self.name + self.format_labels(key), value) for key, value in sorted(self.values.items())]
+
+    def expose(self):
+        """
+
+        :return: metric in Prometheus text format
+        """
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} {}'.format(self.name, self.kind)]
+        for sample, value in self.get_samples():
+            lines.append('{} {}'.format(sample, format_value(value)))
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.get_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self.values.get(self.get_key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self.get_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self.get_key(labels)] = value
+
+    def get(self, **labels):
+        return self.values.get(self.get_key(labels), 0)
+
+
+class HistogramMetric(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=None):
+        """
+
+        :param name:
+        :param help:
+        :param labelnames:
+        :param buckets: upper bounds of the buckets, default is for durations in seconds
+        """
+        Metric.__init__(self, name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = self.get_key(labels)
+        with self.lock:
+            histogram = self.values.get(key)
+            if histogram is None:
+                histogram = self.values[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def get_samples(self):
+        with self.lock:
+            snapshot = [(key, histogram.get_cumulative(), histogram.sum, histogram.count)
+                        for key, histogram in sorted(self.values.items())]
+        return get_histogram_samples(self, snapshot)
+
+
+class PhaseHistogramMetric(Metric):
+    """
+    exposes the phase durations aggregated in exportsrv.timing
+    """
+    kind = 'histogram'
+
+    def get_samples(self):
+        snapshot = [(key, cumulative, total, count) for key, (cumulative, total, count) in sorted(phase_histograms.get().items())]
+        return get_histogram_samples(self, snapshot)
+
+
+class CacheHitRatioMetric(Metric):
+    """
+    ratio of hits to all lookups, per cache, computed from the cache requests counter
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, help, counter):
+        Metric.__init__(self, name, help, ('cache',))
+        self.counter = counter
+
+    def get_samples(self):
+        caches = sorted(set(key[0] for key in list(self.counter.values.keys())))
+        return [(self.name + self.format_labels((cache,)), get_cache_hit_ratio(cache)) for cache in caches]
+
+
+def get_histogram_samples(metric, snapshot):
+    """
+
+    :param metric:
+    :param snapshot: list of (key, cumulative buckets, sum, count)
+    :return: list of (name with labels, value)
+    """
+    samples = []
+    for key, cumulative, total, count in snapshot:
+        for bound, bucket_count in cumulative:
+            samples.append((metric.name + '_bucket' + metric.format_labels(key, ('le', format_value(bound))), bucket_count))
+        samples.append((metric.name + '_sum' + metric.format_labels(key), total))
+        samples.append((metric.name + '_count' + metric.format_labels(key), count))
+    return samples
+
+
+def format_value(value):
+    """
+
+    :param value:
+    :return: value in Prometheus text format
+    """
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        """
+
+        :param metric:
+        :return: the metric
+        """
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self):
+        """
+
+        :return: all the metrics in Prometheus text format
+        """
+        return '\n'.join(metric.expose() for metric in self.metrics) + '\n'
+
+
+registry = MetricsRegistry()
+
+requests_total = registry.register(Counter('export_requests_total', 'Number of export requests.', ('format', 'method', 'status')))
+request_duration = registry.register(HistogramMetric('export_request_duration_seconds', 'Export request latency.', ('format', 'method')))
+requests_in_flight = registry.register(Gauge('export_requests_in_flight', 'Export requests being processed.'))
+response_size = registry.register(HistogramMetric('export_response_size_bytes', 'Size of export responses.', ('format',),
+                                                  buckets=[256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216]))
+solr_duration = registry.register(HistogramMetric('export_solr_duration_seconds', 'Solr call latency.', ('method',)))
+records = registry.register(HistogramMetric('export_records', 'Number of records fetched from solr per call.', (),
+                                            buckets=[1, 10, 50, 100, 500, 1000, 2000, 5000]))
+cache_requests = registry.register(Counter('export_cache_requests_total', 'Cache lookups, hit or miss.', ('cache', 'result')))
+cache_hit_ratio = registry.register(CacheHitRatioMetric('export_cache_hit_ratio', 'Ratio of cache lookups that were hits.', cache_requests))
+phase_duration = registry.register(PhaseHistogramMetric('export_phase_duration_seconds', 'Time spent in each phase of export requests.', ('format', 'phase')))
+
+
+def get_cache_hit_ratio(cache):
+    """
+
+    :param cache: cache name
+    :return: ratio of hits to all lookups of the cache
+    """
+    hits = cache_requests.get(cache=cache, result='hit')
+    total = hits + cache_requests.get(cache=cache, result='miss')
+    if total == 0:
+        return 0.0
+    return float(hits) / total
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+# solr data generated with the combinations of fields that effect the csl output, shared by the csl tests
+
+FAMILIES = [u'Smith', u'van der Berg', u'de la Cruz', u"O'Brien", u'Smith-Jones', u'M\xfcller', u'\xc5ngstr\xf6m',
+            u"d'Artagnan", u'Li', u'AT&T', u'Garc\xeda M\xe1rquez', u'', u'LIGO Scientific Collaboration']
+GIVENS = [u'John', u'J.', u'John Paul', u'J.-P.', u'jean', u'', u'A. B. C.', u'Mar\xeda Jos\xe9', u'Jean-Luc',
+          u'V. de', u'\xc9mile', u'J. R. R.']
+WORDS = [u'the', u'Sun', u'of', u'X-ray', u'Observations', u'and', u'a', u'GALAXY', u'in', u'dark', u'matter:',
+         u'halo.', u'$\\alpha$', u'&', u'<b>bold</b>', u'M31', u'via', u'Study', u'\xe9tude', u'to']
+DOCTYPES = ['article', 'book', 'inbook', 'proceedings', 'inproceedings', 'misc', 'circular', 'newsletter',
+            'techreport', 'intechreport', 'abstract', 'bookreview', 'talk', 'software', 'eprint', 'pressrelease',
+            'catalog', 'phdthesis', 'mastersthesis', 'proposal', 'editorial', 'erratum', 'obituary', 'unknown']
+BIBSTEMS = [[u'ApJ', u'ApJ...873'], [u'MNRAS', u'MNRAS.480'], [u'A&A', u'A&A...610'], [u'SoPh', u'SoPh..293'],
+            [u'AAS', u'AAS...231'], [u'arXiv', u'arXiv1801'], [u'ascl', u'ascl.soft'], [u'Wthr', u'Wthr...73'], []]
+VOLUMES = [u'', u'873', u'12A', u'L12', u'1']
+PAGES = [[], [u'123'], [u'L12'], [u'E1.7-23-18'], [u'1001'], [u'e12']]
+PAGE_RANGES = [u'', u'123-130', u'123-9', u'1001-1002', u'L12-L14', u'5']
+YEARS = [u'2019', u'1999', u'0999', u'2000']
+
+
+def get_corpus(num_docs, seed=1):
+    """
+    generate solr data with the combinations of fields that effect the csl output
+
+    :param num_docs:
+    :param seed:
+    :return:
+    """
+    rand = random.Random(seed)
+    docs = []
+    for i in range(num_docs):
+        authors = []
+        for _ in range(rand.choice([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 12, 30])):
+            family = rand.choice(FAMILIES)
+            given = rand.choice(GIVENS + [None])
+            authors.append(family if given is None else family + u', ' + given)
+        bibstem = rand.choice(BIBSTEMS)
+        doc = {
+            'bibcode': u'{}{:.<5}{:.>4}{:.>5}{}'.format(rand.choice(YEARS), bibstem[0] if bibstem else u'X', i % 1000, i, rand.choice(u'ABC.')),
+            'year': rand.choice(YEARS),
+            'title': [u' '.join(rand.choice(WORDS) for _ in range(rand.randint(1, 8)))],
+            'pub': rand.choice([u'The Astrophysical Journal', u'Monthly Notices of the Royal Astronomical Society',
+                                u'Astronomy & Astrophysics', u'Solar Physics', u'arXiv e-prints', u'']),
+            'pub_raw': rand.choice([u'Weather, vol. 73, issue 1, pp. 35-35', u'Technical report', u'']),
+            'volume': rand.choice(VOLUMES),
+            'issue': rand.choice([u'', u'1', u'12']),
+            'page': rand.choice(PAGES),
+            'page_range': rand.choice(PAGE_RANGES),
+            'doctype': rand.choice(DOCTYPES),
+            'publisher': rand.choice([u'', u'Springer']),
+            'version': rand.choice([u'', u'1.0']),
+            'doi': rand.choice([[], [u'10.1002/wea.3072'], [u'10.1000/a&b']]),
+            'eid': rand.choice([u'', u'e12', u'ascl:1801.001']),
+            'bibstem': bibstem,
+        }
+        if len(authors) > 0:
+            doc['author'] = authors
+        docs.append(doc)
+    return {u'responseHeader': {u'status': 0, u'QTime': 1}, u'response': {u'start': 0, u'numFound': num_docs, u'docs': docs}}
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+from flask_testing import TestCase
+import unittest
+
+import json
+
+import exportsrv.app as app
+from exportsrv.admission import AdmissionControl, adsAdmissionLane, estimate_cost, get_custom_format_cost
+from exportsrv.formatter.customFormat import CustomFormatPlan, custom_format_plans
+
+
+class TestAdmission(TestCase):
+    def create_app(self):
+        self.current_app = app.create_app(**{'EXPORT_SERVICE_ADMISSION_INTERACTIVE_MAX_COST': 100,
+                                             'EXPORT_SERVICE_ADMISSION_INTERACTIVE_BUDGET': 200,
+                                             'EXPORT_SERVICE_ADMISSION_BULK_BUDGET': 1000,
+                                             'EXPORT_SERVICE_ADMISSION_QUEUE_TIMEOUT': 0.01,
+                                             'EXPORT_SERVICE_ADMISSION_MAX_QUEUED': 1,
+                                             'EXPORT_SERVICE_ADMISSION_RETRY_AFTER': 7})
+        return self.current_app
+
+    def test_estimate_cost(self):
+        assert (estimate_cost(1, 'fielded') < estimate_cost(1, 'csl'))
+        assert (estimate_cost(2000, 'fielded') < estimate_cost(2000, 'csl'))
+        assert (estimate_cost(10, 'bibtex') < estimate_cost(10, 'bibtex', {'include_abs': True}))
+        assert (estimate_cost(10, 'custom') < estimate_cost(10, 'custom', {'author_specifiers': 3}))
+
+    def test_lanes(self):
+        admission = AdmissionControl()
+        assert (admission.get_lane(estimate_cost(1, 'fielded')) == adsAdmissionLane.interactive)
+        assert (admission.get_lane(estimate_cost(2000, 'csl')) == adsAdmissionLane.bulk)
+        # bulk lane full does not effect interactive lane
+        assert (admission.acquire(1000) == 200)
+        assert (admission.acquire(50) == 200)
+        assert (admission.acquire(100) == 200)
+        # interactive lane is full now, wait and time out
+        assert (admission.acquire(60) == 503)
+        # a request larger than the whole budget is admitted when its lane is idle
+        admission.release(1000)
+        assert (admission.acquire(5000) == 200)
+        admission.release(5000)
+        admission.release(50)
+        admission.release(100)
+        assert (admission.in_flight == {adsAdmissionLane.interactive: 0, adsAdmissionLane.bulk: 0})
+
+    def test_queue_full(self):
+        admission = AdmissionControl()
+        assert (admission.acquire(1000) == 200)
+        # one request already waiting in the queue
+        admission.queued[adsAdmissionLane.bulk] = 1
+        assert (admission.acquire(500) == 429)
+
+    def test_rejected_response(self):
+        payload = {'bibcode': self.app.config['EXPORT_SERVICE_TEST_BIBCODE_GET']}
+        r = self.client.post('/ads', data=json.dumps(payload))
+        self.assertEqual(r.status_code, 200)
+        self.current_app.admission.in_flight[adsAdmissionLane.interactive] = 200
+        r = self.client.post('/ads', data=json.dumps(payload))
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r.headers['Retry-After'], '7')
+        # budget is released after the request is done
+        self.current_app.admission.in_flight[adsAdmissionLane.interactive] = 0
+        r = self.client.post('/custom', data=json.dumps({'bibcode': ['2018Wthr...73Q..35.'], 'format': ''}))
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(self.current_app.admission.in_flight[adsAdmissionLane.interactive], 0)
+
+    def test_invalid_payload(self):
+        # payload that is not a dict is not costed, and the route rejects it
+        for payload in [[1, 2], 'x']:
+            for route in ['/aastex', '/bibtex', '/custom']:
+                r = self.client.post(route, data=json.dumps(payload))
+                self.assertEqual(r.status_code, 400)
+        self.assertEqual(self.current_app.admission.in_flight, {adsAdmissionLane.interactive: 0, adsAdmissionLane.bulk: 0})
+        # custom format of a request that is rejected is costed, but not kept with the compiled formats
+        r = self.client.post('/custom', data=json.dumps({'format': r'%R %T %ZEncoding:latex'}))
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(custom_format_plans.find(r'%R %T %ZEncoding:latex'), None)
+
+    def test_custom_format_cost(self):
+        # compiled without going to solr
+        cost = get_custom_format_cost(CustomFormatPlan(r'%ZEncoding:latex %ZLinelength:80 %5.3l, %^A (%Y) %T, %V, %p'))
+        self.assertEqual(cost['fields'], ['author', 'year', 'title', 'volume', 'page', 'page_range', 'bibcode', 'bibstem'])
+        self.assertEqual(cost['encoding'], 'latex')
+        self.assertEqual(cost['options'], {'author_specifiers': 2, 'latex': True, 'line_wrap': True, 'wrapped_abstract': False})
+        self.assertEqual(cost['plan_size']['fields'], 6)
+        # all but the second author specifier take the punctuation around them when empty
+        self.assertEqual(cost['plan_size']['elided_fields'], 5)
+        self.assertEqual(cost['cost_per_record'], estimate_cost(1, 'custom', cost['options']) - estimate_cost(0, 'custom'))
+        # no authors, and no elision in csv
+        cost = get_custom_format_cost(CustomFormatPlan(r'%ZEncoding:csv %R %T'))
+        assert (cost['tabular'])
+        self.assertEqual(cost['options'], {'author_specifiers': 0, 'latex': False, 'line_wrap': False, 'wrapped_abstract': False})
+        self.assertEqual(cost['plan_size']['elided_fields'], 0)
+        self.assertEqual(cost['cost_per_record'], estimate_cost(1, 'custom') - estimate_cost(0, 'custom'))
+        # nothing to elide around a field alone
+        self.assertEqual(get_custom_format_cost(CustomFormatPlan(r'%T'))['plan_size']['elided_fields'], 0)
+        # wrapping abstracts costs more than formatting authors
+        cost = get_custom_format_cost(CustomFormatPlan(r'%ZLinelength:80 %R %B'))
+        assert (cost['options']['wrapped_abstract'])
+        assert (cost['cost_per_record'] > get_custom_format_cost(CustomFormatPlan(r'%R %A %l %G'))['cost_per_record'])
+
+    def test_custom_format_estimate(self):
+        r = self.client.post('/custom/estimate', data=json.dumps({'format': r'%3.2A, %T'}))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data), get_custom_format_cost(CustomFormatPlan(r'%3.2A, %T')))
+        r = self.client.post('/custom/estimate', data=json.dumps({'format_id': 'classic-3'}))
+        self.assertEqual(r.status_code, 200)
+        # not a valid format
+        r = self.client.post('/custom/estimate', data=json.dumps({'format': r'%ZLinelength:wide %R'}))
+        self.assertEqual(r.status_code, 400)
+        r = self.client.post('/custom/estimate', data=json.dumps({'format_id': 'classic-0'}))
+        self.assertEqual(r.status_code, 400)
+        # format is not a string
+        for payload in [{'format': 5}, {'format': [5]}, {'format_id': 5}, {'format': None}]:
+            r = self.client.post('/custom/estimate', data=json.dumps(payload))
+            self.assertEqual(r.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
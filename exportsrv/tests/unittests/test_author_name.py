@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+from flask_testing import TestCase
+import unittest
+
+import exportsrv.app as app
+
+from exportsrv import metrics
+from exportsrv.formatter.authorName import AuthorNameCache, author_names
+
+
+class TestAuthorName(TestCase):
+    def create_app(self):
+        self.current_app = app.create_app()
+        return self.current_app
+
+    def test_forms(self):
+        # parsed and encoded forms of a name
+        name = AuthorNameCache().get([u'M\xfcller, J.-P.'])[0]
+        self.assertEqual(name.get_csl(), {'family': u'M\xfcller', 'given': u'J.-P.'})
+        self.assertEqual(name.get_bibtex(), u'{M{\\"u}ller}, J.-P.')
+        self.assertEqual(name.get_key(), u'Muller')
+        # no first name
+        name = AuthorNameCache().get([u'LIGO Scientific Collaboration'])[0]
+        self.assertEqual(name.get_csl(), {'family': u'LIGO Scientific Collaboration'})
+        self.assertEqual(name.get_bibtex(), u'{LIGO Scientific Collaboration}')
+
+    def test_cache(self):
+        # names are shared, and counted as hits
+        cache = AuthorNameCache(max_size=2)
+        hits = metrics.cache_requests.get(cache='author_name', result='hit')
+        misses = metrics.cache_requests.get(cache='author_name', result='miss')
+        first = cache.get([u'Zhang, M.', u'Smith, J.'])
+        second = cache.get([u'Zhang, M.'])
+        assert (first[0] is second[0])
+        self.assertEqual(metrics.cache_requests.get(cache='author_name', result='hit') - hits, 1)
+        self.assertEqual(metrics.cache_requests.get(cache='author_name', result='miss') - misses, 2)
+        # bounded, no more than two generations are kept
+        cache.get([u'A, B.', u'C, D.', u'E, F.', u'G, H.'])
+        assert (len(cache.current) + len(cache.previous) <= 4)
+        assert (u'Smith, J.' not in cache.current and u'Smith, J.' not in cache.previous)
+        # size comes from config
+        self.assertEqual(author_names.max_size, self.current_app.config['EXPORT_SERVICE_AUTHOR_NAME_CACHE_SIZE'])
+
+
+if __name__ == '__main__':
+    unittest.main()
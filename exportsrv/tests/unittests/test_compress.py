@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+from flask_testing import TestCase
+import unittest
+
+import json
+import zlib
+
+import exportsrv.app as app
+from exportsrv.compress import get_accepted_encoding, compress, compress_stream
+
+
+class TestCompress(TestCase):
+    def create_app(self):
+        app_ = app.create_app()
+        return app_
+
+    def test_accepted_encoding(self):
+        assert (get_accepted_encoding('') == None)
+        assert (get_accepted_encoding('gzip, deflate') == 'gzip')
+        assert (get_accepted_encoding('deflate') == 'deflate')
+        assert (get_accepted_encoding('gzip;q=0.5, deflate') == 'deflate')
+        assert (get_accepted_encoding('gzip;q=0, deflate;q=0') == None)
+        assert (get_accepted_encoding('*') == 'gzip')
+        assert (get_accepted_encoding('br, identity') == None)
+
+    def test_compress(self):
+        text = 'Provided by the SAO/NASA Astrophysics Data System' * 100
+        assert (zlib.decompress(compress(text, 'gzip', 6), 16 + zlib.MAX_WBITS) == text)
+        assert (zlib.decompress(compress(text, 'deflate', 6)) == text)
+        # streamed chunks compress into one valid stream
+        compressed = ''.join(compress_stream([text[:100], u'', text[100:]], 'gzip', 6))
+        assert (zlib.decompress(compressed, 16 + zlib.MAX_WBITS) == text)
+
+    def test_compressed_response(self):
+        payload = {'bibcode': self.app.config['EXPORT_SERVICE_TEST_BIBCODE_GET']}
+        plain = self.client.post('/bibtex', data=json.dumps(payload))
+        assert ('Content-Encoding' not in plain.headers)
+
+        response = self.client.post('/bibtex', data=json.dumps(payload), headers={'Accept-Encoding': 'gzip'})
+        assert (response._status_code == 200)
+        assert (response.headers['Content-Encoding'] == 'gzip')
+        assert ('Accept-Encoding' in response.headers['Vary'])
+        assert (zlib.decompress(response.data, 16 + zlib.MAX_WBITS) == plain.data)
+
+        bibcode = self.app.config['EXPORT_SERVICE_TEST_BIBCODE_GET']
+        response = self.client.get('/ris/' + bibcode, headers={'Accept-Encoding': 'deflate'})
+        assert (response.headers['Content-Encoding'] == 'deflate')
+        assert (zlib.decompress(response.data) == self.client.get('/ris/' + bibcode).data)
+
+    def test_below_threshold(self):
+        # error responses and small responses are not compressed
+        response = self.client.post('/bibtex', data=json.dumps({}), headers={'Accept-Encoding': 'gzip'})
+        assert ('Content-Encoding' not in response.headers)
+        self.app.config['EXPORT_SERVICE_COMPRESS_MIN_SIZE'] = 10 ** 9
+        payload = {'bibcode': self.app.config['EXPORT_SERVICE_TEST_BIBCODE_GET']}
+        response = self.client.post('/bibtex', data=json.dumps(payload), headers={'Accept-Encoding': 'gzip'})
+        assert ('Content-Encoding' not in response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+from flask_testing import TestCase
+import unittest
+
+import os
+
+import exportsrv.app as app
+
+from stubdata import solrdata, corpusdata
+from exportsrv.formatter.ads import adsOrganizer
+from exportsrv.formatter.cslJson import CSLJson
+from exportsrv.formatter.csl import CSL, csl_styles
+from exportsrv.formatter.cslName import get_name_parts
+
+
+class TestCSLName(TestCase):
+    def create_app(self):
+        self.current_app = app.create_app()
+        return self.current_app
+
+    def get_author_styles(self):
+        """
+
+        :return: the styles custom format uses for the author specifiers
+        """
+        return sorted(os.path.splitext(file_name)[0] for file_name in os.listdir(csl_styles.path)
+                      if file_name.startswith('ads-author-'))
+
+    def test_author_styles(self):
+        # names are formatted the same as citeproc formats the bibliography of the author styles
+        corpus = corpusdata.get_corpus(300, seed=3)
+        # citeproc fails on the short form of a name without family
+        corpus['response']['docs'] = [doc for doc in corpus['response']['docs']
+                                       if not any(author.split(u',')[0] == u'' for author in doc.get('author', []))]
+        corpus['response']['numFound'] = len(corpus['response']['docs'])
+        for from_solr in [corpus, solrdata.data]:
+            json_for_csl = CSLJson(from_solr).get_author()
+            names = [[get_name_parts(author) for author in item['author']] for item in json_for_csl]
+            for csl_style in self.get_author_styles():
+                name_format = csl_styles.get_name_format(csl_style)
+                citeproc = CSL(CSLJson(from_solr).get_author(), csl_style).get(adsOrganizer.bibliography)
+                self.assertEqual([name_format.format(record_names) for record_names in names], citeproc)
+
+
+if __name__ == '__main__':
+    unittest.main()
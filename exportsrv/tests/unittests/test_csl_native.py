@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+from flask_testing import TestCase
+import unittest
+
+import copy
+
+from citeproc import Citation, CitationItem, CitationStylesBibliography, formatter
+from citeproc.py2compat import *
+from citeproc.source.json import CiteProcJSON
+
+import exportsrv.app as app
+
+from stubdata import solrdata, cslTest, corpusdata
+from exportsrv.formatter.ads import adsCSLStyle, adsJournalFormat
+from exportsrv.formatter.cslJson import CSLJson
+from exportsrv.formatter.csl import CSL, adsFormatter, csl_styles
+from exportsrv.formatter.cslNative import NativeUnsupported
+
+
+def render_citeproc(for_cls, csl_style):
+    """
+    render the records with citeproc, as CSL did before there was a native renderer
+
+    :param for_cls:
+    :param csl_style:
+    :return:
+    """
+    bibliography = CitationStylesBibliography(csl_styles.load(csl_style), CiteProcJSON(for_cls), formatter.html)
+    citations = []
+    for item in for_cls:
+        citation = Citation([CitationItem(item['id'])])
+        citations.append(citation)
+        bibliography.register(citation)
+    return [str(bibliography.cite(citation, '')) for citation in citations], [str(item) for item in bibliography.bibliography()]
+
+
+class TestCSLNative(TestCase):
+    def create_app(self):
+        self.current_app = app.create_app()
+        return self.current_app
+
+    def test_render_html(self):
+        # native renderer returns the same html as citeproc
+        corpus = corpusdata.get_corpus(200)
+        for csl_style in adsCSLStyle.ads_CLS:
+            for_cls = CSLJson(copy.deepcopy(corpus)).get()
+            native = csl_styles.get_native(csl_style).render(for_cls)
+            self.assertEqual(native, render_citeproc(for_cls, csl_style))
+
+    def test_export(self):
+        # and the final output of all the styles, encodings and journal formats is the same
+        corpus = corpusdata.get_corpus(60, seed=2)
+        # the citation is tokenized into author(s) and a four digit year, so keep the records that have both
+        corpus['response']['docs'] = [doc for doc in corpus['response']['docs']
+                                      if doc.get('author') and not doc['author'][0].startswith(u',') and doc['year'] >= u'1000']
+        corpus['response']['numFound'] = len(corpus['response']['docs'])
+        for csl_style in adsCSLStyle.ads_CLS:
+            for export_format in [adsFormatter.unicode, adsFormatter.latex]:
+                for journal_format in [adsJournalFormat.default, adsJournalFormat.abbreviated, adsJournalFormat.full]:
+                    self.current_app.config['EXPORT_SERVICE_CSL_NATIVE'] = True
+                    native = CSL(CSLJson(copy.deepcopy(corpus)).get(), csl_style, export_format, journal_format).get()
+                    self.current_app.config['EXPORT_SERVICE_CSL_NATIVE'] = False
+                    citeproc = CSL(CSLJson(copy.deepcopy(corpus)).get(), csl_style, export_format, journal_format).get()
+                    self.assertEqual(native, citeproc)
+        self.current_app.config['EXPORT_SERVICE_CSL_NATIVE'] = True
+
+    def test_stubdata(self):
+        # stub data is rendered natively, and matches the expected output
+        for_cls = CSLJson(solrdata.data).get()
+        assert (len(csl_styles.get_native('aastex').render(for_cls)[1]) == len(for_cls))
+        self.assertEqual(CSL(CSLJson(solrdata.data).get(), 'aastex', adsFormatter.latex).get(), cslTest.data_AASTex)
+
+    def test_unsupported(self):
+        # a page range with two dashes is not supported natively
+        for_cls = CSLJson(solrdata.data).get()
+        for_cls[0]['page'] = u'1-2-3'
+        self.assertRaises(NativeUnsupported, csl_styles.get_native('icarus').render, for_cls)
+        # only built-in styles are compiled
+        assert (csl_styles.get_native('ads-author-A') is None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+from flask_testing import TestCase
+import unittest
+
+import copy
+from threading import Thread
+from citeproc import formatter
+
+import exportsrv.app as app
+
+from stubdata import solrdata, cslTest, corpusdata
+from exportsrv.formatter.cslJson import CSLJson
+from exportsrv.formatter.ads import adsCSLStyle, adsJournalFormat
+from exportsrv.formatter.csl import CSL, CSLStyleCache, CSLKeys, adsFormatter, adsCSLDependency, csl_styles, csl_pool, render_records
+from exportsrv.formatter import cslLaTex
+
+
+class TestCSLStyles(TestCase):
+    def create_app(self):
+        self.current_app = app.create_app()
+        return self.current_app
+
+    def test_preload(self):
+        # all 24 styles are parsed at startup
+        assert (len(csl_styles.styles) == 24)
+        for csl_style in ['aastex', 'icarus', 'mnras', 'soph', 'aspc', 'apsj', 'aasj', 'ieee', 'ads-author-A', 'ads-author-aa']:
+            assert (len(csl_styles.styles[csl_style]) >= 1)
+
+    def test_acquire_release(self):
+        cache = CSLStyleCache(csl_styles.path)
+        # first time it is parsed
+        bib_style = cache.acquire('mnras')
+        cache.release('mnras', bib_style)
+        # then reused
+        assert (cache.acquire('mnras') is bib_style)
+        # while in use, another copy is parsed
+        assert (cache.acquire('mnras') is not bib_style)
+        cache.release('mnras', bib_style)
+        assert (len(cache.styles['mnras']) == 1)
+
+    def test_concurrent_render(self):
+        results = []
+        def render():
+            with self.current_app.app_context():
+                results.append(CSL(CSLJson(solrdata.data).get(), 'aastex', adsFormatter.latex).get())
+        threads = [Thread(target=render) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert (len(results) == 4)
+        for result in results:
+            assert (result == cslTest.data_AASTex)
+
+    def test_dependency(self):
+        # only ieee displays the citation number, none of the styles need all the records
+        assert (csl_styles.get_dependency('ieee') == adsCSLDependency.position)
+        for csl_style in ['aastex', 'icarus', 'mnras', 'soph', 'aspc', 'apsj', 'aasj', 'ads-author-A']:
+            assert (csl_styles.get_dependency(csl_style) == adsCSLDependency.none)
+
+    def test_parallel_render(self):
+        self.current_app.config['EXPORT_SERVICE_CSL_PROCESSES'] = 2
+        self.current_app.config['EXPORT_SERVICE_CSL_PARALLEL_MIN_RECORDS'] = 5
+        try:
+            # the shards are merged in order, and ieee citation numbers continue across the shards
+            assert (CSL(CSLJson(solrdata.data).get(), 'aastex', adsFormatter.latex).get() == cslTest.data_AASTex)
+            assert (CSL(CSLJson(solrdata.data).get(), 'ieee', adsFormatter.unicode).get() == cslTest.data_ieee)
+            assert (csl_pool.processes == 2)
+            assert (csl_pool.render('aastex', CSLJson(solrdata.data).get(), True, formatter.html, True, 2, 60) is not None)
+            # second shard of ieee cannot be rendered natively, so the export is rendered in process with citeproc
+            for_cls = CSLJson(solrdata.data).get()
+            for_cls[-1]['page'] = u'1-2-3'
+            assert (csl_pool.render('ieee', for_cls, True, formatter.html, True, 2, 60) is None)
+            # when the workers time out they are terminated, and the pool is created again on next use
+            assert (csl_pool.render('aastex', CSLJson(solrdata.data).get(), True, formatter.html, True, 2, 0) is None)
+            assert (csl_pool.pool is None)
+            assert (csl_pool.render('aastex', CSLJson(solrdata.data).get(), True, formatter.html, True, 2, 60) is not None)
+        finally:
+            self.current_app.config['EXPORT_SERVICE_CSL_PROCESSES'] = 1
+
+    def test_shared_records(self):
+        # records are built once and not updated by the styles, so all the styles can render the same records
+        csl_json = CSLJson(solrdata.data)
+        for_cls = csl_json.get()
+        assert (csl_json.get() is for_cls)
+        original = copy.deepcopy(for_cls)
+        for csl_style in adsCSLStyle.ads_CLS:
+            for export_format in [adsFormatter.unicode, adsFormatter.latex]:
+                for journal_format in [adsJournalFormat.default, adsJournalFormat.abbreviated, adsJournalFormat.full]:
+                    fresh = CSL(CSLJson(solrdata.data).get(), csl_style, export_format, journal_format).get()
+                    assert (CSL(for_cls, csl_style, export_format, journal_format).get() == fresh)
+        self.assertEqual(for_cls, original)
+        # author only records are taken from the full records
+        self.assertEqual(csl_json.get_author(), CSLJson(solrdata.data).get_author())
+
+    def test_fast_registration(self):
+        # records registered with indexed keys are rendered the same as with citeproc's list of keys
+        corpus = corpusdata.get_corpus(100, seed=4)
+        # citeproc fails on the short form of a name without family
+        corpus['response']['docs'] = [doc for doc in corpus['response']['docs']
+                                      if not any(author.split(u',')[0] == u'' for author in doc.get('author', []))]
+        corpus['response']['numFound'] = len(corpus['response']['docs'])
+        for_cls = CSLJson(corpus).get()
+        for csl_style in adsCSLStyle.ads_CLS + ['ads-author-A', 'ads-author-gg']:
+            for output in [formatter.html, cslLaTex]:
+                fast = render_records(csl_style, for_cls, True, output, use_native=False, fast_registration=True)
+                slow = render_records(csl_style, for_cls, True, output, use_native=False, fast_registration=False)
+                self.assertEqual(fast, slow)
+        keys = CSLKeys()
+        for key in ['ITEM-1', 'ITEM-2', 'ITEM-1']:
+            keys.append(key)
+        assert ('ITEM-2' in keys and 'ITEM-3' not in keys)
+        assert (keys.index('ITEM-1') == 0 and keys.index('ITEM-2') == 1)
+        self.assertRaises(ValueError, keys.index, 'ITEM-3')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,7 +9,8 @@ import exportsrv.app as app
 
 from stubdata import solrdata
 from exportsrv.formatter.csl import CSL, adsFormatter
-from exportsrv.formatter.customFormat import CustomFormat
+from exportsrv import metrics
+from exportsrv.formatter.customFormat import CustomFormat, CustomFormatPlan, CustomFormatPlanCache, custom_format_plans, get_export_format
 
 
 class TestExportsCustomFormat(TestCase):
@@ -18,39 +19,32 @@ class TestExportsCustomFormat(TestCase):
         return app_
 
     def test_export_format(self):
-        custom_format = CustomFormat(custom_format=r'')
         # init unicode (also accepting UTF-8 for backward compatibility)
-        custom_format._CustomFormat__set_export_format('utf-8')
-        assert (custom_format.export_format == adsFormatter.unicode)
-        custom_format._CustomFormat__set_export_format('unicode')
-        assert (custom_format.export_format == adsFormatter.unicode)
+        assert (get_export_format('utf-8') == adsFormatter.unicode)
+        assert (get_export_format('unicode') == adsFormatter.unicode)
         # init html
-        custom_format._CustomFormat__set_export_format('html')
-        assert (custom_format.export_format == adsFormatter.html)
+        assert (get_export_format('html') == adsFormatter.html)
         # init latex
-        custom_format._CustomFormat__set_export_format('latex')
-        assert (custom_format.export_format == adsFormatter.latex)
+        assert (get_export_format('latex') == adsFormatter.latex)
         # anything else is init to unicode
-        custom_format._CustomFormat__set_export_format('')
-        assert (custom_format.export_format == adsFormatter.unicode)
+        assert (get_export_format('') == adsFormatter.unicode)
+        # the export format of the custom format is the one of its encoding command
+        assert (CustomFormat(custom_format=r'%ZEncoding:html %T').export_format == adsFormatter.html)
 
 
     def test_parse_enumeration(self):
         # enumeration is included
         custom_format = CustomFormat(custom_format=r'%zn%10i %(Y), %T,%\J,%\V,%\p')
-        custom_format._CustomFormat__parse_enumeration()
         assert (custom_format.enumeration == True)
 
         # enumeration is not included
         custom_format = CustomFormat(custom_format=r'%10i %(Y), %T,%\J,%\V,%\p')
-        custom_format._CustomFormat__parse_enumeration()
         assert (custom_format.enumeration == False)
 
 
     def test_parse_command(self):
         # command is included
         custom_format = CustomFormat(custom_format=r'%ZEncoding:latex %ZHeader:"at the top of the page" %ZFooter:"at the bottom of the page" %ZLinelength:100 %zn\\item %N,%Y,{\\em %J\}, \{\\bf %V\}, %p--%P (%c citations)\n')
-        custom_format._CustomFormat__parse_command()
         assert (custom_format.export_format == adsFormatter.latex)
         assert (custom_format.line_length == 100)
         assert (custom_format.header == 'at the top of the page')
@@ -58,7 +52,6 @@ class TestExportsCustomFormat(TestCase):
 
         # command is not included, so check for default initialization
         custom_format = CustomFormat(custom_format=r'\\item %N,%Y,{\\em %J\}, \{\\bf %V\}, %p--%P (%c citations)\n')
-        custom_format._CustomFormat__parse_command()
         assert (custom_format.export_format == adsFormatter.unicode)
         assert (custom_format.line_length == 0)
         assert (custom_format.header == '')
@@ -229,38 +222,37 @@ class TestExportsCustomFormat(TestCase):
         custom_format = CustomFormat(custom_format=r'')
 
         # encoding is unicode, pass in abstract
-        custom_format._CustomFormat__set_export_format('unicode')
+        custom_format.export_format = get_export_format('unicode')
         abstract = "The concept of using lunar beacon signal transmission for on-board navigation for earth satellites and near-earth spacecraft is described. The system would require powerful transmitters on the earth-side of the moon's surface and black box receivers with antennae and microprocessors placed on board spacecraft for autonomous navigation. Spacecraft navigation requires three position and three velocity elements to establish location coordinates. Two beacons could be soft-landed on the lunar surface at the limits of allowable separation and each would transmit a wide-beam signal with cones reaching GEO heights and be strong enough to be received by small antennae in near-earth orbit. The black box processor would perform on-board computation with one-way Doppler/range data and dynamical models. Alternatively, GEO satellites such as the GPS or TDRSS spacecraft can be used with interferometric techniques to provide decimeter-level accuracy for aircraft navigation."
-        assert (custom_format._CustomFormat__encode(value=abstract, field='abstract') == abstract)
+        assert (custom_format._CustomFormat__get_encoder('abstract')(abstract) == abstract)
 
         # encoding is html
-        custom_format._CustomFormat__set_export_format('html')
+        custom_format.export_format = get_export_format('html')
         abstract = "<a>some text with &</a>"
         abstract_escaped = "&lt;a&gt;some text with &amp;&lt;/a&gt;"
-        assert (custom_format._CustomFormat__encode(value=abstract, field='abstract') == abstract_escaped)
+        assert (custom_format._CustomFormat__get_encoder('abstract')(abstract) == abstract_escaped)
 
         # encoding is latex
-        custom_format._CustomFormat__set_export_format('latex')
+        custom_format.export_format = get_export_format('latex')
         # for author => convert to latex for author
         author = u'Fjörtoft, R.'
         author_latex = r'Fj{\"o}rtoft, R.'
-        assert (custom_format._CustomFormat__encode(value=author, field='author') == author_latex)
+        assert (custom_format._CustomFormat__get_encoder('author')(author) == author_latex)
         # for pub => no changes
         pub_raw = "Sensing and Imaging, Volume 18, Issue 1, article id.17, <NUMPAGES>12</NUMPAGES> pp."
-        assert (custom_format._CustomFormat__encode(value=pub_raw, field='pub') == pub_raw)
+        assert (custom_format._CustomFormat__get_encoder('pub')(pub_raw) == pub_raw)
         # for everything else => convert to latex
         abstract = u"Chapter 2: As part of the Bluedisk survey we analyse the radial gas-phase metallicity profiles of 50 late-type galaxies. We compare the metallicity profiles of a sample of HI-rich galaxies against a control sample of HI-'normal' galaxies. We find the metallicity gradient of a galaxy to be strongly correlated with its HI mass fraction {M}{HI}) / {M}_{\ast}). We note that some galaxies exhibit a steeper metallicity profile in the outer disc than in the inner disc. These galaxies are found in both the HI-rich and control samples. This contradicts a previous indication that these outer drops are exclusive to HI-rich galaxies. These effects are not driven by bars, although we do find some indication that barred galaxies have flatter metallicity profiles. By applying a simple analytical model we are able to account for the variety of metallicity profiles that the two samples present. The success of this model implies that the metallicity in these isolated galaxies may be in a local equilibrium, regulated by star formation. This insight could provide an explanation of the observed local mass-metallicity relation. Chapter 3 We present a method to recover the gas-phase metallicity gradients from integral field spectroscopic (IFS) observations of barely resolved galaxies. We take a forward modelling approach and compare our models to the observed spatial distribution of emission line fluxes, accounting for the degrading effects of seeing and spatial binning. The method is flexible and is not limited to particular emission lines or instruments. We test the model through comparison to synthetic observations and use downgraded observations of nearby galaxies to validate this work. As a proof of concept we also apply the model to real IFS observations of high-redshift galaxies. From our testing we show that the inferred metallicity gradients and central metallicities are fairly insensitive to the assumptions made in the model and that they are reliably recovered for galaxies with sizes approximately equal to the half width at half maximum of the point-spread function. However, we also find that the presence of star forming clumps can significantly complicate the interpretation of metallicity gradients in moderately resolved high-redshift galaxies. Therefore we emphasize that care should be taken when comparing nearby well-resolved observations to high-redshift observations of partially resolved galaxies. Chapter 4 We present gas-phase metallicity gradients for 94 star-forming galaxies between (0.08 < z < 0.84). We find a negative median metallicity gradient of (-0.043^{+0.009}_{-0.007}, dex/kpc), i.e. on average we find the centres of these galaxies to be more metal-rich than their outskirts. However, there is significant scatter underlying this and we find that 10% (9) galaxies have significantly positive metallicity gradients, 39% (37) have significantly negative gradients, 28% (26) have gradients consistent with being flat, the remainder 23% (22) are considered to have unreliable gradient estimates. We find a slight trend for a more negative metallicity gradient with both increasing stellar mass and increasing star formation rate (SFR). However, given the potential redshift and size selection effects, we do not consider these trends to be significant. Indeed when we normalize the SFR of our galaxies relative to the main sequence, we do not observe any trend between the metallicity gradient and the normalized SFR. This finding is contrary to other recent studies of galaxies at similar and higher redshifts. We do, however, identify a novel trend between the metallicity gradient of a galaxy and its size. Small galaxies ((r_d < 3 kpc)) present a large spread in observed metallicity gradients (both negative and positive gradients). In contrast, we find no large galaxies (r_d > 3 kpc) with positive metallicity gradients, and overall there is less scatter in the metallicity gradient amongst the large galaxies. We suggest that these large (well-evolved) galaxies may be analogues of galaxies in the present-day Universe, which also present a common negative metallicity gradient. Chapter 5 The relationship between a galaxy's stellar mass and its gas-phase metallicity results from the complex interplay between star formation and the inflow and outflow of gas. Since the gradient of metals in galaxies is also influenced by the same processes, it is therefore natural to contrast the metallicity gradient with the mass-metallicity relation. Here we study the interrelation of the stellar mass, central metallicity and metallicity gradient, using a sample of 72 galaxies spanning (0.13 < z < 0.84) with reliable metallicity gradient estimates. We find that typically the galaxies that fall below the mean mass-metallicity relation have flat or inverted metallicity gradients. We quantify their relationship taking full account of the covariance between the different variables and find that at fixed mass the central metallicity is anti-correlated with the metallicity gradient. We argue that this is consistent with a scenario that suppresses the central metallicity either through the inflow of metal poor gas or outflow of metal enriched gas."
         abstract_latex = u"Chapter 2: As part of the Bluedisk survey we analyse the radial gas-phase metallicity profiles of 50 late-type galaxies. We compare the metallicity profiles of a sample of HI-rich galaxies against a control sample of HI-'normal' galaxies. We find the metallicity gradient of a galaxy to be strongly correlated with its HI mass fraction \{M\}\{HI\}) / \{M\}\_\{\x07st\}). We note that some galaxies exhibit a steeper metallicity profile in the outer disc than in the inner disc. These galaxies are found in both the HI-rich and control samples. This contradicts a previous indication that these outer drops are exclusive to HI-rich galaxies. These effects are not driven by bars, although we do find some indication that barred galaxies have flatter metallicity profiles. By applying a simple analytical model we are able to account for the variety of metallicity profiles that the two samples present. The success of this model implies that the metallicity in these isolated galaxies may be in a local equilibrium, regulated by star formation. This insight could provide an explanation of the observed local mass-metallicity relation. Chapter 3 We present a method to recover the gas-phase metallicity gradients from integral field spectroscopic (IFS) observations of barely resolved galaxies. We take a forward modelling approach and compare our models to the observed spatial distribution of emission line fluxes, accounting for the degrading effects of seeing and spatial binning. The method is flexible and is not limited to particular emission lines or instruments. We test the model through comparison to synthetic observations and use downgraded observations of nearby galaxies to validate this work. As a proof of concept we also apply the model to real IFS observations of high-redshift galaxies. From our testing we show that the inferred metallicity gradients and central metallicities are fairly insensitive to the assumptions made in the model and that they are reliably recovered for galaxies with sizes approximately equal to the half width at half maximum of the point-spread function. However, we also find that the presence of star forming clumps can significantly complicate the interpretation of metallicity gradients in moderately resolved high-redshift galaxies. Therefore we emphasize that care should be taken when comparing nearby well-resolved observations to high-redshift observations of partially resolved galaxies. Chapter 4 We present gas-phase metallicity gradients for 94 star-forming galaxies between (0.08 < z < 0.84). We find a negative median metallicity gradient of (-0.043\^\{+0.009\}\_\{-0.007\}, dex/kpc), i.e. on average we find the centres of these galaxies to be more metal-rich than their outskirts. However, there is significant scatter underlying this and we find that 10\% (9) galaxies have significantly positive metallicity gradients, 39\% (37) have significantly negative gradients, 28\% (26) have gradients consistent with being flat, the remainder 23\% (22) are considered to have unreliable gradient estimates. We find a slight trend for a more negative metallicity gradient with both increasing stellar mass and increasing star formation rate (SFR). However, given the potential redshift and size selection effects, we do not consider these trends to be significant. Indeed when we normalize the SFR of our galaxies relative to the main sequence, we do not observe any trend between the metallicity gradient and the normalized SFR. This finding is contrary to other recent studies of galaxies at similar and higher redshifts. We do, however, identify a novel trend between the metallicity gradient of a galaxy and its size. Small galaxies ((r\_d < 3 kpc)) present a large spread in observed metallicity gradients (both negative and positive gradients). In contrast, we find no large galaxies (r\_d > 3 kpc) with positive metallicity gradients, and overall there is less scatter in the metallicity gradient amongst the large galaxies. We suggest that these large (well-evolved) galaxies may be analogues of galaxies in the present-day Universe, which also present a common negative metallicity gradient. Chapter 5 The relationship between a galaxy's stellar mass and its gas-phase metallicity results from the complex interplay between star formation and the inflow and outflow of gas. Since the gradient of metals in galaxies is also influenced by the same processes, it is therefore natural to contrast the metallicity gradient with the mass-metallicity relation. Here we study the interrelation of the stellar mass, central metallicity and metallicity gradient, using a sample of 72 galaxies spanning (0.13 < z < 0.84) with reliable metallicity gradient estimates. We find that typically the galaxies that fall below the mean mass-metallicity relation have flat or inverted metallicity gradients. We quantify their relationship taking full account of the covariance between the different variables and find that at fixed mass the central metallicity is anti-correlated with the metallicity gradient. We argue that this is consistent with a scenario that suppresses the central metallicity either through the inflow of metal poor gas or outflow of metal enriched gas."
-        assert (custom_format._CustomFormat__encode(value=abstract, field='abstract') == abstract_latex)
+        assert (custom_format._CustomFormat__get_encoder('abstract')(abstract) == abstract_latex)
         # test double quotes
         comment = u"""The NASA Astrophysics Data System is phasing out support for its legacy interface ("ADS Classic") in favor of a more modern, featureful system ("the new ADS")."""
         comment_latex = u"The NASA Astrophysics Data System is phasing out support for its legacy interface (``ADS Classic'') in favor of a more modern, featureful system (``the new ADS'')."
-        assert (custom_format._CustomFormat__encode(value=comment, field='comment') == comment_latex)
+        assert (custom_format._CustomFormat__get_encoder('comment')(comment) == comment_latex)
 
     def test_author_sep(self):
         # verify when missing it is False
         custom_format = CustomFormat(custom_format=r'%ZEncoding:latex %ZHeader:"at the top of the page" %ZFooter:"at the bottom of the page" %ZLinelength:100 %zn\\item %N,%Y,{\\em %J\}, \{\\bf %V\}, %p--%P (%c citations)\n')
-        custom_format._CustomFormat__parse_command()
         assert (len(custom_format.author_sep) == 0)
 
         # verify when the parameter is defined, comma is replaced by the defined seprator
@@ -272,42 +264,39 @@ class TestExportsCustomFormat(TestCase):
     def test_markup_strip(self):
         # verify when missing it is False
         custom_format = CustomFormat(custom_format=r'%ZEncoding:latex %ZHeader:"at the top of the page" %ZFooter:"at the bottom of the page" %ZLinelength:100 %zn\\item %N,%Y,{\\em %J\}, \{\\bf %V\}, %p--%P (%c citations)\n')
-        custom_format._CustomFormat__parse_command()
         assert (custom_format.markup_strip == False)
 
         # verify when the parameter is keep it is False and the no markup is removed
         custom_format = CustomFormat(custom_format=r'%ZMarkup:keep %B\n')
-        custom_format._CustomFormat__parse_command()
         assert (custom_format.markup_strip == False)
         abstract = u"We present a large grid of stellar evolutionary tracks, which are suitable to modelling star clusters and galaxies by means of population synthesis. The tracks are presented for the initial chemical compositions [Z=0.0004, Y=0.23], [Z=0.001, Y=0.23], [Z=0.004, Y=0.24], [Z=0.008, Y=0.25], [Z=0.019, Y=0.273] (solar composition), and [Z=0.03, Y=0.30]. They are computed with updated opacities and equation of state, and a moderate amount of convective overshoot. The range of initial masses goes from 0.15 M<SUB>sun</SUB> to 7 M<SUB>sun</SUB>, and the evolutionary phases extend from the zero age main sequence (ZAMS) till either the thermally pulsing AGB regime or carbon ignition. We also present an additional set of models with solar composition, computed using the classical Schwarzschild criterion for convective boundaries. From all these tracks, we derive the theoretical isochrones in the Johnson-Cousins UBVRIJHK broad-band photometric system."
         abstract_with_markup = abstract
-        assert (custom_format._CustomFormat__encode(value=abstract, field='abstract') == abstract_with_markup)
+        assert (custom_format._CustomFormat__get_encoder('abstract')(abstract) == abstract_with_markup)
 
         # verify when the parameter is strip it is True and the markup is removed
         custom_format = CustomFormat(custom_format=r'%ZMarkup:strip %B\n')
-        custom_format._CustomFormat__parse_command()
         assert (custom_format.markup_strip == True)
         abstract_without_markup = u"We present a large grid of stellar evolutionary tracks, which are suitable to modelling star clusters and galaxies by means of population synthesis. The tracks are presented for the initial chemical compositions [Z=0.0004, Y=0.23], [Z=0.001, Y=0.23], [Z=0.004, Y=0.24], [Z=0.008, Y=0.25], [Z=0.019, Y=0.273] (solar composition), and [Z=0.03, Y=0.30]. They are computed with updated opacities and equation of state, and a moderate amount of convective overshoot. The range of initial masses goes from 0.15 Msun to 7 Msun, and the evolutionary phases extend from the zero age main sequence (ZAMS) till either the thermally pulsing AGB regime or carbon ignition. We also present an additional set of models with solar composition, computed using the classical Schwarzschild criterion for convective boundaries. From all these tracks, we derive the theoretical isochrones in the Johnson-Cousins UBVRIJHK broad-band photometric system."
-        assert (custom_format._CustomFormat__encode(value=abstract, field='abstract') == abstract_without_markup)
+        assert (custom_format._CustomFormat__get_encoder('abstract')(abstract) == abstract_without_markup)
 
     def test_field_encoding(self):
         # latex field encoding
         custom_format = CustomFormat(custom_format=r'%\A')
         custom_format.set_json_from_solr(solrdata.data_4)
         author_list_encoded = u'Ryan, R.~E. and McCullough, P.~R.'
-        assert (custom_format._CustomFormat__encode(value=custom_format._CustomFormat__get_author_list(format=r'%\A', index=0),
-                                                    field='author', field_format=r'%\A') == author_list_encoded)
+        author_list = custom_format._CustomFormat__get_author_list(format=r'%\A', index=0)
+        assert (custom_format._CustomFormat__get_encoder('author', r'%\A')(author_list) == author_list_encoded)
         # html field encoding
         abstract = u"We present a large grid of stellar evolutionary tracks, which are suitable to modelling star clusters and galaxies by means of population synthesis. The tracks are presented for the initial chemical compositions [Z=0.0004, Y=0.23], [Z=0.001, Y=0.23], [Z=0.004, Y=0.24], [Z=0.008, Y=0.25], [Z=0.019, Y=0.273] (solar composition), and [Z=0.03, Y=0.30]. They are computed with updated opacities and equation of state, and a moderate amount of convective overshoot. The range of initial masses goes from 0.15 M<SUB>sun</SUB> to 7 M<SUB>sun</SUB>, and the evolutionary phases extend from the zero age main sequence (ZAMS) till either the thermally pulsing AGB regime or carbon ignition. We also present an additional set of models with solar composition, computed using the classical Schwarzschild criterion for convective boundaries. From all these tracks, we derive the theoretical isochrones in the Johnson-Cousins UBVRIJHK broad-band photometric system."
         abstract_html = "We present a large grid of stellar evolutionary tracks, which are suitable to modelling star clusters and galaxies by means of population synthesis. The tracks are presented for the initial chemical compositions [Z=0.0004, Y=0.23], [Z=0.001, Y=0.23], [Z=0.004, Y=0.24], [Z=0.008, Y=0.25], [Z=0.019, Y=0.273] (solar composition), and [Z=0.03, Y=0.30]. They are computed with updated opacities and equation of state, and a moderate amount of convective overshoot. The range of initial masses goes from 0.15 M&lt;SUB&gt;sun&lt;/SUB&gt; to 7 M&lt;SUB&gt;sun&lt;/SUB&gt;, and the evolutionary phases extend from the zero age main sequence (ZAMS) till either the thermally pulsing AGB regime or carbon ignition. We also present an additional set of models with solar composition, computed using the classical Schwarzschild criterion for convective boundaries. From all these tracks, we derive the theoretical isochrones in the Johnson-Cousins UBVRIJHK broad-band photometric system."
-        assert (custom_format._CustomFormat__encode(value=abstract, field='abstract', field_format='%>B') == abstract_html)
+        assert (custom_format._CustomFormat__get_encoder('abstract', '%>B')(abstract) == abstract_html)
 
         # hex field encoding
 
         # url field encoding
         url = '<a href="http://adsabs.harvard.edu/abs/1997AAS...190.1403E">1997AAS...190.1403E</a>'
         url_encoded = '<a+href=%22http://adsabs.harvard.edu/abs/1997AAS...190.1403E%22>1997AAS...190.1403E</a>'
-        assert (custom_format._CustomFormat__encode(value=url, field='url', field_format='%/U') == url_encoded)
+        assert (custom_format._CustomFormat__get_encoder('url', '%/U')(url) == url_encoded)
 
     def test_end_record_insert(self):
         # verify string specified with %ZEOL gets inserted after each record
@@ -332,5 +321,117 @@ class TestExportsCustomFormat(TestCase):
         custom_format.set_json_from_solr(solrdata.data_8)
         assert (custom_format.get().get('export', '') == ''.join(formatted))
 
+    def test_compiled_plan(self):
+        # format string is compiled once, and shared
+        plans = CustomFormatPlanCache(max_size=2)
+        hits = metrics.cache_requests.get(cache='custom_format', result='hit')
+        misses = metrics.cache_requests.get(cache='custom_format', result='miss')
+        plan = plans.get(r'%A. (%Y). %q, %V, %p, %pc pp.')
+        assert (plans.get(r'%A. (%Y). %q, %V, %p, %pc pp.') is plan)
+        self.assertEqual(metrics.cache_requests.get(cache='custom_format', result='hit') - hits, 1)
+        self.assertEqual(metrics.cache_requests.get(cache='custom_format', result='miss') - misses, 1)
+        # literals and fields of the template
+        self.assertEqual(plan.literals, ['', '. (', '). ', ', ', ', ', ', ', ' pp.'])
+        self.assertEqual([field[1] for field in plan.fields], ['%A', '%Y', '%q', '%V', '%p', '%pc'])
+        # least recently used is dropped
+        plans.get(r'%R')
+        plans.get(r'%A. (%Y). %q, %V, %p, %pc pp.')
+        plans.get(r'%T')
+        assert (list(plans.plans.keys()) == [r'%A. (%Y). %q, %V, %p, %pc pp.', r'%T'])
+        # size comes from config
+        self.assertEqual(custom_format_plans.max_size, self.app.config['EXPORT_SERVICE_CUSTOM_FORMAT_CACHE_SIZE'])
+
+    def test_empty_fields(self):
+        # consecutive empty fields are eliminated with their separators
+        a_doc = {'bibcode': u'2017PhDT........14C', 'year': u'2017', 'pub': u'Ph.D. Thesis'}
+        solr_data = {'responseHeader': {'status': 0}, 'response': {'numFound': 1, 'start': 0, 'docs': [a_doc]}}
+        custom_format = CustomFormat(custom_format=r'%Y\,%j\,%V\,%p ')
+        custom_format.set_json_from_solr(solr_data)
+        self.assertEqual(custom_format.get().get('export', ''), u'2017\\,Ph.D. Thesis \n')
+        custom_format = CustomFormat(custom_format=r'%j (%V), %p-%P.')
+        custom_format.set_json_from_solr(solr_data)
+        self.assertEqual(custom_format.get().get('export', ''), u'Ph.D. Thesis .\n')
+        # punctuation is eliminated up to the backslash of a command after the field, classic format converted
+        a_doc = {'bibcode': u'2018SAAS...38.....D', 'year': u'2018', 'bibstem': [u'SAAS'], 'volume': u'38',
+                 'author': [u'Dessauges-Zavadsky, Miroslava']}
+        solr_data = {'responseHeader': {'status': 0}, 'response': {'numFound': 1, 'start': 0, 'docs': [a_doc]}}
+        custom_format = CustomFormat(custom_format=r'\\i %T, %A: \\i %T,\\i0%q,%V,%p (%Y)\\')
+        custom_format.set_json_from_solr(solr_data)
+        self.assertEqual(custom_format.get().get('export', ''), u'\\i Dessauges-Zavadsky, Miroslava: \\i\\i0SAAS,38 (2018)\\\n')
+        custom_format = CustomFormat(custom_format=r'%V,%p\\tit{%T}')
+        custom_format.set_json_from_solr(solr_data)
+        self.assertEqual(custom_format.get().get('export', ''), u'38\\tit\n')
+
+    def test_specifier_parameters(self):
+        # n.m of the author specifiers and the affiliation limit are parsed once, when compiled
+        plan = CustomFormatPlan(r'%A; %3.2L; %5l; %n; %H; %2.1H; %^G; %3F')
+        self.assertEqual(plan.authors, {'%A': ('all', 0, 0), '%3.2L': ('truncated', 3, 2), '%5l': ('truncated', 5, 1),
+                                        '%n': ('abbreviated', 0, 0), '%H': ('abbreviated', 0, 1),
+                                        '%2.1H': ('truncated', 2, 1), '%^G': ('first', 0, 0)})
+        self.assertEqual(plan.aff_count, 3)
+        self.assertEqual(CustomFormatPlan(r'%F').aff_count, None)
+        # each specifier is resolved to its extractor and encoder
+        custom_format = CustomFormat(custom_format=r'%ZEncoding:html %R %T %\A')
+        self.assertEqual(sorted(custom_format.extractors.keys()), ['%R', '%T', r'%\A'])
+        self.assertEqual(custom_format.encoders['%T'](u'a < b'), u'a &lt; b')
+        self.assertEqual(custom_format.encoders[r'%\A'](u'Ryan, R. E.'), u'Ryan, R.~E.')
+
+    def test_encoded_values(self):
+        # values are encoded for all the records before rendering, a field at a time
+        docs = [{'bibcode': u'2017PhDT........14C', 'pub': u'Ph.D. Thesis', 'title': [u'Q & A']},
+                {'bibcode': u'2018Wthr...73Q..35.', 'pub': u'Ph.D. Thesis'}]
+        solr_data = {'responseHeader': {'status': 0}, 'response': {'numFound': 2, 'start': 0, 'docs': docs}}
+        custom_format = CustomFormat(custom_format=r'%ZEncoding:html %T, %\T, %J, %O')
+        custom_format.set_json_from_solr(solr_data)
+        self.assertEqual(custom_format.plan.sources, {'%T': '%T', r'%\T': '%T', '%J': '%J', '%O': '%O'})
+        values = custom_format._CustomFormat__get_values(2)
+        self.assertEqual(values, {'%T': [u'Q &amp; A', ''], r'%\T': [u'Q \\& A', ''],
+                                  '%J': [u'Ph.D. Thesis', u'Ph.D. Thesis'], '%O': [None, None]})
+        self.assertEqual(custom_format.get().get('export', ''), u'Q &amp; A, Q \\& A, Ph.D. Thesis, %O\n Ph.D. Thesis, %O\n')
+
+    def test_enumeration(self):
+        # enumeration is a segment of the literals, filled with the number of the record
+        docs = [{'bibcode': u'2017PhDT........14C', 'title': [u'rendered as is %zn']}, {'bibcode': u'2018Wthr...73Q..35.'}]
+        solr_data = {'responseHeader': {'status': 0}, 'response': {'numFound': 2, 'start': 0, 'docs': docs}}
+        custom_format = CustomFormat(custom_format=r'%zn. %R (%T) [%zn]\n')
+        self.assertEqual(custom_format.plan.enumerations, [0, 2])
+        custom_format.set_json_from_solr(solr_data)
+        self.assertEqual(custom_format.get().get('export', ''), u'1. 2017PhDT........14C (rendered as is %zn) [1]\n\n'
+                                                                u'2. 2018Wthr...73Q..35.  [2]\n\n')
+
+    def test_tabular(self):
+        # csv, one quoted column per field, quotes are doubled
+        a_doc = {'bibcode': u'2017PhDT........14C', 'year': u'2017', 'title': [u'A "quoted" title, with comma']}
+        solr_data = {'responseHeader': {'status': 0}, 'response': {'numFound': 2, 'start': 0, 'docs': [a_doc, {'bibcode': u'2018Wthr...73Q..35.'}]}}
+        custom_format = CustomFormat(custom_format=r'%ZEncoding:csv %R %T, %V')
+        custom_format.set_json_from_solr(solr_data)
+        self.assertEqual(custom_format.get().get('export', ''), u'"bibcode","title","volume"\n'
+                                                                u'"2017PhDT........14C","A ""quoted"" title, with comma",""\n'
+                                                                u'"2018Wthr...73Q..35.","",""\n')
+        # tsv, separators in values are replaced by blank
+        a_doc = {'bibcode': u'2017PhDT........14C', 'year': u'2017', 'title': [u'A\ttitle\non two lines']}
+        solr_data = {'responseHeader': {'status': 0}, 'response': {'numFound': 1, 'start': 0, 'docs': [a_doc]}}
+        custom_format = CustomFormat(custom_format=r'%ZEncoding:tsv %R %T %Y')
+        custom_format.set_json_from_solr(solr_data)
+        self.assertEqual(custom_format.get().get('export', ''), u'bibcode\ttitle\tyear\n2017PhDT........14C\tA title on two lines\t2017\n')
+
+    def test_elision_resolved(self):
+        # elision of the empty fields is resolved when the format is compiled
+        plan = CustomFormatPlanCache().get(r'%R, volume %V, page %p')
+        self.assertEqual(plan.elisions, {(0, '', ','): (0, 1), (1, ' ', ','): (1, 1), (2, ' ', ''): (1, 0)})
+        # rendering does not change the compiled elisions, the outcomes of punctuation that neighbouring
+        # fields have removed are kept apart, and rendering again gives the same result
+        plan = CustomFormatPlanCache().get(r'%L %Y.%T.%J %V,%pp.')
+        elisions = dict(plan.elisions)
+        custom_format = CustomFormat(custom_format=None, plan=plan)
+        custom_format.set_json_from_solr(solrdata.data)
+        export = custom_format.get()
+        self.assertEqual(plan.elisions, elisions)
+        self.assertEqual(plan.rendered_elisions, {(5, '', ''): (0, 0)})
+        custom_format = CustomFormat(custom_format=None, plan=plan)
+        custom_format.set_json_from_solr(solrdata.data)
+        self.assertEqual(custom_format.get(), export)
+        self.assertEqual(plan.elisions, elisions)
+
 if __name__ == '__main__':
     unittest.main()
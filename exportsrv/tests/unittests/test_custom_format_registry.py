@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+from flask_testing import TestCase
+import unittest
+
+import json
+import mock
+import os
+import shutil
+import tempfile
+
+import exportsrv.app as app
+from stubdata import solrdata
+from exportsrv.formatter.customFormat import CustomFormat
+from exportsrv.formatter.customFormatRegistry import CustomFormatRegistry, custom_format_registry
+from exportsrv.formatter.convertCF import convert
+from exportsrv.formatter.oldFormats import customFormatsClassic
+
+
+class TestCustomFormatRegistry(TestCase):
+    def create_app(self):
+        self.formats_dir = tempfile.mkdtemp()
+        self.current_app = app.create_app(**{'EXPORT_SERVICE_CUSTOM_FORMATS_DIR': self.formats_dir})
+        return self.current_app
+
+    def tearDown(self):
+        shutil.rmtree(self.formats_dir)
+
+    def test_classic(self):
+        # classic formats are converted and compiled at startup
+        plan = custom_format_registry.get('classic-3')
+        assert (plan is not None)
+        assert (custom_format_registry.get('classic-3') is plan)
+        self.assertEqual(custom_format_registry.get_format('classic-3'), convert(customFormatsClassic[2]))
+        self.assertEqual(CustomFormat(custom_format=None, plan=plan).get_solr_fields(),
+                         CustomFormat(custom_format=convert(customFormatsClassic[2])).get_solr_fields())
+        # no such format
+        self.assertEqual(custom_format_registry.get('classic-0'), None)
+        self.assertEqual(custom_format_registry.get('../classic-3'), None)
+
+    def test_save(self):
+        r = self.client.post('/custom/formats', data=json.dumps({'format': '%R, %T'}))
+        self.assertEqual(r.status_code, 200)
+        format_id = json.loads(r.data)['id']
+        assert (format_id.startswith('user-'))
+        assert (os.path.isfile(os.path.join(self.formats_dir, format_id + '.json')))
+
+        r = self.client.get('/custom/formats/' + format_id)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data)['format'], '%R, %T')
+
+        # another process finds it on disk
+        registry = CustomFormatRegistry()
+        registry.build(self.current_app.config)
+        self.assertEqual(registry.get_format(format_id), '%R, %T')
+
+        r = self.client.get('/custom/formats/user-0000000000000000')
+        self.assertEqual(r.status_code, 404)
+
+        # format is not a string
+        for custom_format in [5, [5], {'format': '%R'}]:
+            r = self.client.post('/custom/formats', data=json.dumps({'format': custom_format}))
+            self.assertEqual(r.status_code, 400)
+
+    def test_limits(self):
+        registry = CustomFormatRegistry()
+        registry.build(dict(self.current_app.config, EXPORT_SERVICE_CUSTOM_FORMATS_MAX=2))
+        first_id = registry.save('%R')
+        assert (registry.save('%T') is not None)
+        # no room for another format, saving the same one again is fine
+        self.assertEqual(registry.save('%Y'), None)
+        self.assertEqual(registry.save('%R'), first_id)
+        # formats not used within ttl are removed
+        os.utime(os.path.join(self.formats_dir, first_id + '.json'), (0, 0))
+        self.assertEqual(registry.cleanup(), 1)
+        self.assertEqual(registry.get_format(first_id), None)
+        assert (registry.save('%Y') is not None)
+
+    def test_not_enabled(self):
+        # formats are not saved if there is no custom formats dir
+        registry = CustomFormatRegistry()
+        registry.build(dict(self.current_app.config, EXPORT_SERVICE_CUSTOM_FORMATS_DIR=None))
+        self.assertEqual(registry.save('%R'), None)
+        self.assertEqual(registry.get_format('user-0000000000000000'), None)
+        self.assertEqual(registry.get_format('classic-3'), custom_format_registry.get_format('classic-3'))
+        custom_format_registry.formats_dir = None
+        r = self.client.post('/custom/formats', data=json.dumps({'format': '%R, %T'}))
+        self.assertEqual(r.status_code, 503)
+
+    def test_export_by_id(self):
+        format_id = custom_format_registry.save('%R, %T')
+        with mock.patch('exportsrv.views.get_solr_data', return_value=solrdata.data):
+            r = self.client.post('/custom', data=json.dumps({'bibcode': ['2018Wthr...73Q..35.'], 'format_id': format_id}))
+            self.assertEqual(r.status_code, 200)
+            custom_format = CustomFormat(custom_format='%R, %T')
+            custom_format.set_json_from_solr(solrdata.data)
+            self.assertEqual(json.loads(r.data), custom_format.get())
+            # unknown id
+            r = self.client.post('/custom', data=json.dumps({'bibcode': ['2018Wthr...73Q..35.'], 'format_id': 'classic-0'}))
+            self.assertEqual(r.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
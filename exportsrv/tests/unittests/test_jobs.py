@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from flask_testing import TestCase
+import unittest
+
+import json
+import mock
+import os
+import shutil
+import tempfile
+import time
+
+import exportsrv.app as app
+from stubdata import solrdata, bibTexTest
+from exportsrv.jobs import adsJobStatus
+
+
+class TestExportJobs(TestCase):
+    def create_app(self):
+        self.jobs_dir = tempfile.mkdtemp()
+        self.current_app = app.create_app(**{'EXPORT_SERVICE_JOBS_DIR': self.jobs_dir,
+                                             'EXPORT_SERVICE_JOBS_WORKERS': 0,
+                                             'EXPORT_SERVICE_MAX_RECORDS_SOLR_BIGQUERY': 10})
+        return self.current_app
+
+    def tearDown(self):
+        shutil.rmtree(self.jobs_dir)
+
+    def test_job_submit_and_download(self):
+        payload = {'bibcode': self.app.config['EXPORT_SERVICE_TEST_BIBCODE_GET'], 'style': 'bibtex'}
+        r = self.client.post('/jobs', data=json.dumps(payload))
+        self.assertEqual(r.status_code, 202)
+        job_id = json.loads(r.data)['id']
+        assert (r.headers['Location'].endswith('/jobs/' + job_id))
+
+        # no workers, so the job is done already
+        r = self.client.get('/jobs/' + job_id)
+        self.assertEqual(r.status_code, 200)
+        status = json.loads(r.data)
+        self.assertEqual(status['status'], adsJobStatus.done)
+        self.assertEqual(status['processed'], status['total'])
+
+        r = self.client.get('/jobs/' + job_id + '/result')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data.decode('utf-8'), bibTexTest.data['export'])
+
+        # partial download
+        r = self.client.get('/jobs/' + job_id + '/result', headers={'Range': 'bytes=10-19'})
+        self.assertEqual(r.status_code, 206)
+        self.assertEqual(r.data, bibTexTest.data['export'].encode('utf-8')[10:20])
+        assert (r.headers['Content-Range'].startswith('bytes 10-19/'))
+
+        # range not satisfiable
+        r = self.client.get('/jobs/' + job_id + '/result', headers={'Range': 'bytes=100000000-'})
+        self.assertEqual(r.status_code, 416)
+
+        # more than one range is ignored, the whole file is sent
+        r = self.client.get('/jobs/' + job_id + '/result', headers={'Range': 'bytes=0-9,20-29'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data.decode('utf-8'), bibTexTest.data['export'])
+        assert ('Content-Range' not in r.headers)
+
+    def test_job_chunks(self):
+        # 22 bibcodes fetched from solr in 3 chunks of 10
+        bibcodes = [doc['bibcode'] for doc in solrdata.data['response']['docs']]
+        def get_solr_data(bibcodes, fields, sort, encode_style, authorization):
+            # jobs run outside of the request, so the authorization of the request is passed in
+            self.assertEqual(authorization, 'Bearer token')
+            docs = [doc for doc in solrdata.data['response']['docs'] if doc['bibcode'] in bibcodes]
+            return {'responseHeader': solrdata.data['responseHeader'],
+                    'response': {'numFound': len(docs), 'start': 0, 'docs': docs}}
+        with mock.patch('exportsrv.jobs.get_solr_data', side_effect=get_solr_data) as solr_mock:
+            job_id = self.current_app.jobs.submit(bibcodes, 'bibtex', 'Bearer token')
+            self.assertEqual(solr_mock.call_count, 3)
+        status = self.current_app.jobs.get_status(job_id)
+        self.assertEqual(status['status'], adsJobStatus.done)
+        with open(self.current_app.jobs.get_result_path(job_id)) as f:
+            self.assertEqual(f.read().decode('utf-8'), bibTexTest.data['export'])
+
+    def test_job_failed(self):
+        with mock.patch('exportsrv.jobs.get_solr_data', return_value=None):
+            job_id = self.current_app.jobs.submit(['2018Wthr...73Q..35.'], 'ris')
+        status = self.current_app.jobs.get_status(job_id)
+        self.assertEqual(status['status'], adsJobStatus.failed)
+        self.assertEqual(self.current_app.jobs.get_result_path(job_id), None)
+        r = self.client.get('/jobs/' + job_id + '/result')
+        self.assertEqual(r.status_code, 404)
+
+    def test_job_errors(self):
+        r = self.client.post('/jobs', data=json.dumps({'bibcode': ['2018Wthr...73Q..35.']}))
+        self.assertEqual(r.status_code, 400)
+        r = self.client.post('/jobs', data=json.dumps({'bibcode': ['2018Wthr...73Q..35.'], 'style': 'votable'}))
+        self.assertEqual(r.status_code, 400)
+        self.current_app.config['EXPORT_SERVICE_JOBS_MAX_RECORDS'] = 1
+        r = self.client.post('/jobs', data=json.dumps({'bibcode': ['2018Wthr...73Q..35.', '2018TDM.....5a0201F'], 'style': 'ris'}))
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get('/jobs/doesnotexist')
+        self.assertEqual(r.status_code, 404)
+        r = self.client.get('/jobs/..%2Fpasswd')
+        self.assertEqual(r.status_code, 404)
+
+    def test_job_ttl(self):
+        job_id = self.current_app.jobs.submit([self.app.config['EXPORT_SERVICE_TEST_BIBCODE_GET']], 'aastex')
+        assert (self.current_app.jobs.get_status(job_id) is not None)
+        self.current_app.config['EXPORT_SERVICE_JOBS_TTL'] = -1
+        self.assertEqual(self.current_app.jobs.get_status(job_id), None)
+        # status and result files are removed
+        self.assertEqual(self.current_app.jobs.cleanup(), 2)
+
+    def test_job_cleanup_on_download(self):
+        # expired jobs are removed when a result is fetched, at most once per cleanup interval
+        job_id = self.current_app.jobs.submit([self.app.config['EXPORT_SERVICE_TEST_BIBCODE_GET']], 'aastex')
+        self.current_app.config['EXPORT_SERVICE_JOBS_TTL'] = -1
+        r = self.client.get('/jobs/' + job_id + '/result')
+        self.assertEqual(r.status_code, 404)
+        # cleaned up by the submit
+        self.assertEqual(len(os.listdir(self.jobs_dir)), 2)
+        self.current_app.config['EXPORT_SERVICE_JOBS_CLEANUP_INTERVAL'] = 0
+        r = self.client.get('/jobs/' + job_id + '/result')
+        self.assertEqual(r.status_code, 404)
+        self.assertEqual(os.listdir(self.jobs_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+from flask_testing import TestCase
+import unittest
+
+import exportsrv.app as app
+
+from exportsrv.formatter.format import Format
+from exportsrv.formatter.journalIndex import JournalIndex, journal_index
+
+
+class TestJournalIndex(TestCase):
+    def create_app(self):
+        self.current_app = app.create_app()
+        return self.current_app
+
+    def test_build(self):
+        # index is built from config at startup
+        for bibstem, macro in self.current_app.config['EXPORT_SERVICE_AASTEX_JOURNAL_MACRO']:
+            self.assertEqual(journal_index.get_macro([bibstem, bibstem + '...1']), macro)
+        for bibstem, abbreviation in self.current_app.config['EXPORT_SERVICE_SOPH_JOURNAL_ABBREVIATION'].items():
+            self.assertEqual(journal_index.get_soph_abbreviation([bibstem]), abbreviation)
+        self.assertEqual(journal_index.get_macro([u'Wthr', u'Wthr...73'], u'Weather'), u'Weather')
+        self.assertEqual(journal_index.get_soph_abbreviation([]), None)
+
+    def test_build_on_lookup(self):
+        # not built at startup, built from the config of the current app on the first lookup
+        index = JournalIndex()
+        self.assertEqual(index.get_macro([u'ApJ', u'ApJ...873']), u'\\apj')
+        assert (index.built)
+
+    def test_abbreviation(self):
+        # same as Format, kept up to max abbreviations
+        index = JournalIndex(max_abbreviations=2)
+        for bibstem in [[u'ApJ', u'ApJ...873'], [u'AAS', u'AAS...231'], [u'arXiv', u'arXiv1801'], [u'ApJ'], [], '']:
+            self.assertEqual(index.get_abbreviation(bibstem), Format(None).get_pub_abbrev(bibstem))
+            assert (len(index.abbreviations) <= 2)
+
+
+class TestJournalIndexNoApp(unittest.TestCase):
+    def test_lookup_without_app(self):
+        # not built and no app to build it from, raise instead of silently returning no macro
+        index = JournalIndex()
+        self.assertRaises(RuntimeError, index.get_macro, [u'ApJ', u'ApJ...873'], u'ApJ')
+        self.assertRaises(RuntimeError, index.get_soph_abbreviation, [u'ApJ', u'ApJ...873'])
+        assert (not index.built)
+
+
+if __name__ == '__main__':
+    unittest.main()
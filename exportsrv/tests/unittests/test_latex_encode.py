@@ -6,6 +6,7 @@ import unittest
 import exportsrv.app as app
 
 from exportsrv.formatter.latexencode import utf8tolatex
+from exportsrv.formatter import cslLaTex
 
 
 class TestLatexEncode(TestCase):
@@ -64,6 +65,15 @@ class TestLatexEncode(TestCase):
         assert (utf8tolatex(text, ascii_no_brackets=True) == latex)
 
 
+    def test_csl_latex_formatter(self):
+        # markup that citeproc generates is emitted as latex directly
+        assert (cslLaTex.preformat(u'&') == u'\\&')
+        assert (cslLaTex.Italic(u'Weather') == u'{\\it Weather}')
+        assert (cslLaTex.Bold(cslLaTex.Italic(u'73')) == u'{\\bf {\\it 73}}')
+        assert (cslLaTex.Superscript(u'5') == u'$^{5}$')
+        assert (cslLaTex.Light(u'text') == u'text')
+
+
 
 if __name__ == '__main__':
     unittest.main()
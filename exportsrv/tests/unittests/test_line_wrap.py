@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+from flask_testing import TestCase
+import unittest
+
+import textwrap
+
+import exportsrv.app as app
+from stubdata import solrdata
+from exportsrv.formatter.lineWrap import fill
+
+
+class TestLineWrap(TestCase):
+    def create_app(self):
+        self.current_app = app.create_app()
+        return self.current_app
+
+    def test_same_as_textwrap(self):
+        # wrapped the same as textwrap for the options the formatters use
+        texts = [u'', '', u' ', u'short', 'short str', u'ends with blank ', u'has\ttab', u'has\nnew line',
+                 u'well-known self-consistent re-analysis ' * 5, u'em—dash and -leading and trailing- hyphens ' * 4,
+                 u'non ascii élève naïve über ' * 6, u'averyveryverylongwordthatdoesnotfitinaline' * 3]
+        for doc in solrdata.data['response']['docs']:
+            texts.append(doc.get('abstract', u''))
+            texts.extend(doc.get('title', []))
+        for text in texts:
+            for width in [10, 72, 80]:
+                for subsequent_indent in ['', ' ' * 8]:
+                    for replace_whitespace in [True, False]:
+                        for break_on_hyphens in [True, False]:
+                            expected = textwrap.fill(text, width=width, subsequent_indent=subsequent_indent,
+                                                     replace_whitespace=replace_whitespace, break_on_hyphens=break_on_hyphens)
+                            wrapped = fill(text, width=width, subsequent_indent=subsequent_indent,
+                                           replace_whitespace=replace_whitespace, break_on_hyphens=break_on_hyphens)
+                            self.assertEqual(wrapped, expected)
+                            self.assertEqual(type(wrapped), type(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
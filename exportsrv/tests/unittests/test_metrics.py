@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+from flask_testing import TestCase
+import unittest
+
+import json
+
+import exportsrv.app as app
+from exportsrv import metrics
+from exportsrv.metrics import Counter, Gauge, HistogramMetric, MetricsRegistry
+
+
+class TestMetrics(TestCase):
+    def create_app(self):
+        self.current_app = app.create_app()
+        return self.current_app
+
+    def test_expose(self):
+        registry = MetricsRegistry()
+        counter = registry.register(Counter('test_total', 'Test counter.', ('format',)))
+        gauge = registry.register(Gauge('test_in_flight', 'Test gauge.'))
+        histogram = registry.register(HistogramMetric('test_size', 'Test histogram.', ('format',), buckets=[10, 100]))
+        counter.inc(format='bibtex')
+        counter.inc(2, format='bibtex')
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        histogram.observe(5, format='ris')
+        histogram.observe(50, format='ris')
+        expected = '# HELP test_total Test counter.\n' \
+                   '# TYPE test_total counter\n' \
+                   'test_total{format="bibtex"} 3\n' \
+                   '# HELP test_in_flight Test gauge.\n' \
+                   '# TYPE test_in_flight gauge\n' \
+                   'test_in_flight 1\n' \
+                   '# HELP test_size Test histogram.\n' \
+                   '# TYPE test_size histogram\n' \
+                   'test_size_bucket{format="ris",le="10"} 1\n' \
+                   'test_size_bucket{format="ris",le="100"} 2\n' \
+                   'test_size_bucket{format="ris",le="+Inf"} 2\n' \
+                   'test_size_sum{format="ris"} 55.0\n' \
+                   'test_size_count{format="ris"} 2\n'
+        self.assertEqual(registry.expose(), expected)
+
+    def test_cache_hit_ratio(self):
+        metrics.cache_requests.inc(cache='test', result='hit')
+        metrics.cache_requests.inc(cache='test', result='hit')
+        metrics.cache_requests.inc(cache='test', result='hit')
+        metrics.cache_requests.inc(cache='test', result='miss')
+        self.assertEqual(metrics.get_cache_hit_ratio('test'), 0.75)
+        self.assertEqual(metrics.get_cache_hit_ratio('not a cache'), 0.0)
+        assert ('export_cache_hit_ratio{cache="test"} 0.75' in metrics.registry.expose())
+
+    def test_metrics_endpoint(self):
+        count = metrics.requests_total.get(format='ris', method='POST', status='200')
+        payload = {'bibcode': self.app.config['EXPORT_SERVICE_TEST_BIBCODE_GET']}
+        r = self.client.post('/ris', data=json.dumps(payload))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(metrics.requests_total.get(format='ris', method='POST', status='200'), count + 1)
+        self.assertEqual(metrics.requests_in_flight.get(), 0)
+
+        r = self.client.get('/metrics')
+        self.assertEqual(r.status_code, 200)
+        for name in ['export_requests_total{format="ris",method="POST",status="200"}',
+                     'export_request_duration_seconds_count{format="ris",method="POST"}',
+                     'export_response_size_bytes_count{format="ris"}',
+                     'export_phase_duration_seconds_count{format="ris",phase="fetch"}',
+                     'export_requests_in_flight']:
+            assert (name in r.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+from flask_testing import TestCase
+import unittest
+
+import exportsrv.app as app
+
+from exportsrv.formatter.pubDate import PubDateCache, pub_dates
+
+
+class TestPubDate(TestCase):
+    def create_app(self):
+        self.current_app = app.create_app(**{'EXPORT_SERVICE_PUB_DATE_CACHE_SIZE': 100})
+        return self.current_app
+
+    def test_build(self):
+        self.assertEqual(pub_dates.max_size, 100)
+
+    def test_render(self):
+        cache = PubDateCache()
+        # unknown month and day are taken as the first
+        self.assertEqual(cache.get('2017-12-00', '%m/%Y'), '12/2017')
+        self.assertEqual(cache.get('2017-00-00', '%b %Y'), 'Jan 2017')
+        self.assertEqual(cache.get('2017-06-01', '%B %d, %Y'), 'June 01, 2017')
+        # X drops the leading zero
+        self.assertEqual(cache.get('2017-06-01', '%Y/%m/X%d'), '2017/06/1')
+        self.assertEqual(cache.get('2017-06-10', '%Y-%m-X%d'), '2017-06-10')
+        # before 1900
+        self.assertEqual(cache.get('1850-08-02', '%Y %b %d'), '1850 Aug 02')
+        self.assertEqual(cache.dates[('2017-12-00', '%m/%Y')], '12/2017')
+        self.assertRaises(ValueError, cache.get, '', '%Y')
+
+    def test_max_size(self):
+        cache = PubDateCache(max_size=2)
+        for year in range(2000, 2010):
+            self.assertEqual(cache.get('{}-01-00'.format(year), '%Y'), str(year))
+            assert (len(cache.dates) <= 2)
+        cache = PubDateCache(max_size=0)
+        self.assertEqual(cache.get('2000-01-00', '%Y'), '2000')
+        self.assertEqual(len(cache.dates), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
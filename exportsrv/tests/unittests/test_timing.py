@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+from flask import g
+from flask_testing import TestCase
+import unittest
+
+import json
+
+import exportsrv.app as app
+from exportsrv.timing import timed, phase, get_timings, format_server_timing, phase_histograms, Histogram
+from exportsrv.formatter.customFormat import CustomFormat
+from stubdata import solrdata
+
+
+class TestTiming(TestCase):
+    def create_app(self):
+        self.current_app = app.create_app()
+        return self.current_app
+
+    def test_phase_timers(self):
+        @timed('work')
+        def work():
+            return 'done'
+        assert (work() == 'done')
+        assert (work() == 'done')
+        with phase('block'):
+            pass
+        timings = get_timings()
+        assert (list(timings.keys()) == ['work', 'block'])
+        assert (timings['work'] >= 0)
+
+    def test_format_server_timing(self):
+        assert (format_server_timing({'solr': 0.0123}) == 'solr;dur=12.3')
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for value in [0.0005, 0.003, 0.003, 20]:
+            histogram.observe(value)
+        cumulative = dict(histogram.get_cumulative())
+        assert (cumulative[0.001] == 1)
+        assert (cumulative[0.005] == 3)
+        assert (cumulative[10] == 3)
+        assert (cumulative[float('inf')] == 4)
+        assert (histogram.count == 4)
+
+    def test_server_timing_header(self):
+        payload = {'bibcode': self.app.config['EXPORT_SERVICE_TEST_BIBCODE_GET']}
+        r = self.client.post('/aastex', data=json.dumps(payload))
+        self.assertEqual(r.status_code, 200)
+        phases = [entry.split(';')[0] for entry in r.headers['Server-Timing'].split(', ')]
+        for name in ['fetch', 'format', 'normalize', 'citeproc', 'render', 'latex', 'serialize', 'total']:
+            assert (name in phases)
+        histograms = phase_histograms.get()
+        assert (('aastex', 'citeproc') in histograms)
+        assert (histograms[('aastex', 'total')][2] >= 1)
+
+        # turn off the header
+        self.current_app.config['EXPORT_SERVICE_SERVER_TIMING'] = False
+        r = self.client.post('/aastex', data=json.dumps(payload))
+        assert ('Server-Timing' not in r.headers)
+
+    def test_latex_timed_once(self):
+        # latex encoding of custom format is timed for each column, and only when the fields are encoded in latex
+        for custom_format, timed_latex in [(r'%ZEncoding:latex %T, %A, %J', True), (r'%T, %\A', True), (r'%T, %A', False)]:
+            with self.app.test_request_context():
+                g.timings = None
+                custom_format = CustomFormat(custom_format=custom_format)
+                custom_format.set_json_from_solr(solrdata.data)
+                custom_format.get()
+                assert (('latex' in get_timings()) == timed_latex)
+
+
+if __name__ == '__main__':
+    unittest.main()
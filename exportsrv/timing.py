@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+from flask import g, has_request_context
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+import time
+
+# this module contains low overhead phase timers for the export requests
+# time spent in each phase (ie, solr, citeproc, latex) is accumulated for the request,
+# sent back in the Server-Timing header, and aggregated in histograms per format
+# phases can nest, ie, latex encoding happens within render, so they do not add up to total
+#    @timed('solr')
+#    def get_solr_data(...):
+#    ...
+#    with phase('render'):
+#        ...
+
+
+def add_timing(name, duration):
+    """
+    accumulate duration of the phase for the current request
+
+    :param name: phase name
+    :param duration: in seconds
+    :return:
+    """
+    if not has_request_context():
+        return
+    timings = getattr(g, 'timings', None)
+    if timings is None:
+        timings = g.timings = OrderedDict()
+    timings[name] = timings.get(name, 0.0) + duration
+
+
+def get_timings():
+    """
+
+    :return: accumulated phase durations of the current request, in seconds
+    """
+    if not has_request_context():
+        return OrderedDict()
+    return getattr(g, 'timings', OrderedDict())
+
+
+class phase:
+    """
+    context manager to time a block of code
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        add_timing(self.name, time.time() - self.start)
+        return False
+
+
+def timed(name):
+    """
+    decorator to time a function
+
+    :param name: phase name
+    :return:
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                add_timing(name, time.time() - start)
+        return wrapper
+    return decorator
+
+
+def format_server_timing(timings):
+    """
+
+    :param timings: dict of phase name to duration in seconds
+    :return: value for Server-Timing header, durations are in milliseconds
+    """
+    return ', '.join('{};dur={:.1f}'.format(name, duration * 1000) for name, duration in timings.items())
+
+
+class Histogram:
+    """
+    cumulative histogram of durations, buckets are upper bounds in seconds
+    other values (ie, sizes) can be observed if buckets are passed in
+    """
+    buckets = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf')]
+
+    def __init__(self, buckets=None):
+        if buckets is not None:
+            self.buckets = list(buckets) + [float('inf')]
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+
+        :param value:
+        :return:
+        """
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def get_cumulative(self):
+        """
+
+        :return: list of (upper bound, count of observations less than or equal to upper bound)
+        """
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+class PhaseHistograms:
+    """
+    histograms of phase durations keyed by (format, phase)
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.histograms = {}
+
+    def observe(self, export_format, timings):
+        """
+
+        :param export_format:
+        :param timings: dict of phase name to duration in seconds
+        :return:
+        """
+        with self.lock:
+            for name, duration in timings.items():
+                key = (export_format, name)
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram()
+                histogram.observe(duration)
+
+    def get(self):
+        """
+
+        :return: snapshot of the histograms, dict of (format, phase) to (cumulative buckets, sum, count)
+        """
+        with self.lock:
+            return dict((key, (histogram.get_cumulative(), histogram.sum, histogram.count))
+                        for key, histogram in self.histograms.items())
+
+
+phase_histograms = PhaseHistograms()
@@ -7,20 +7,26 @@ sys.setdefaultencoding('utf8')
 from flask import current_app, request
 import requests
 import re
+import time
 
 from exportsrv.formatter.ads import adsFormatter
+from exportsrv.timing import timed
+from exportsrv import metrics
 
-def get_solr_data(bibcodes, fields, sort, start=0, encode_style=None):
+@timed('solr')
+def get_solr_data(bibcodes, fields, sort, start=0, encode_style=None, authorization=None):
     """
 
     :param bibcodes:
     :param fields:
     :param start:
     :param sort:
+    :param authorization: authorization header to query solr with, if None it is taken from the request
     :return:
     """
-    authorization = current_app.config.get('SERVICE_TOKEN', None) or \
-                    request.headers.get('X-Forwarded-Authorization', request.headers.get('Authorization', ''))
+    if authorization is None:
+        authorization = request.headers.get('X-Forwarded-Authorization', request.headers.get('Authorization', ''))
+    authorization = current_app.config.get('SERVICE_TOKEN', None) or authorization
 
     rows = min(current_app.config['EXPORT_SERVICE_MAX_RECORDS_SOLR_BIGQUERY'], len(bibcodes))
 
@@ -34,11 +40,13 @@ def get_solr_data(bibcodes, fields, sort, start=0, encode_style=None):
                 'sort': sort if sort != current_app.config['EXPORT_SERVICE_NO_SORT_SOLR'] else '',
                 'fl': fields,
             }
+            solr_start = time.time()
             response = current_app.client.get(
                 url=current_app.config['EXPORT_SOLR_QUERY_URL'],
                 params=params,
                 headers={'Authorization': authorization},
             )
+            metrics.solr_duration.observe(time.time() - solr_start, method='query')
         # otherwise go with bigquery
         else:
             params = {
@@ -50,12 +58,14 @@ def get_solr_data(bibcodes, fields, sort, start=0, encode_style=None):
                 'fl': fields,
                 'fq': '{!bitset}'
             }
+            solr_start = time.time()
             response = current_app.client.post(
                 url=current_app.config['EXPORT_SOLR_BIGQUERY_URL'],
                 params=params,
                 data='bibcode\n' + '\n'.join(bibcodes),
                 headers={'Authorization': authorization, 'Content-Type': 'big-query/csv'}
             )
+            metrics.solr_duration.observe(time.time() - solr_start, method='bigquery')
 
         response.raise_for_status()
 
@@ -80,6 +90,7 @@ def get_solr_data(bibcodes, fields, sort, start=0, encode_style=None):
                                 field_str = replace_html_entity(field_str, encode_style)
                             doc[field] = field_str
                 from_solr['response']['numFound'] = len(from_solr['response']['docs'])
+                metrics.records.observe(from_solr['response']['numFound'])
                 # reorder the list based on the list of bibcodes provided
                 if sort == current_app.config['EXPORT_SERVICE_NO_SORT_SOLR']:
                     new_docs = []
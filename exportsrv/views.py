@@ -1,18 +1,26 @@
 # -*- coding: utf-8 -*-
 
-from flask import current_app, request, Blueprint, Response
+from flask import current_app, request, Blueprint, Response, url_for, g
 from flask_discoverer import advertise
+from werkzeug.http import parse_range_header
 
 import json
+import os
+import time
 
 from exportsrv.utils import get_solr_data
+from exportsrv.compress import compress_response
+from exportsrv.admission import admit, get_custom_format_cost
+from exportsrv.timing import timed, phase, get_timings, format_server_timing, phase_histograms
+from exportsrv import metrics
 from exportsrv.formatter.ads import adsFormatter, adsCSLStyle, adsJournalFormat
 from exportsrv.formatter.cslJson import CSLJson
 from exportsrv.formatter.csl import CSL
 from exportsrv.formatter.xmlFormat import XMLFormat
 from exportsrv.formatter.bibTexFormat import BibTexFormat
 from exportsrv.formatter.fieldedFormat import FieldedFormat
-from exportsrv.formatter.customFormat import CustomFormat
+from exportsrv.formatter.customFormat import CustomFormat, custom_format_plans
+from exportsrv.formatter.customFormatRegistry import custom_format_registry
 from exportsrv.formatter.convertCF import convert
 from exportsrv.formatter.voTableFormat import VOTableFormat
 from exportsrv.formatter.rssFormat import RSSFormat
@@ -21,6 +29,68 @@ from exportsrv.tests.unittests.stubdata import solrdata
 bp = Blueprint('export_service', __name__)
 
 
+def get_export_format():
+    """
+
+    :return: format of the current request, first part of the route
+    """
+    if request.url_rule is not None:
+        return request.url_rule.rule.strip('/').split('/')[0]
+    return ''
+
+
+@bp.before_request
+def start_timing():
+    """
+    keep the start time of the request, and count it as in flight
+
+    :return:
+    """
+    g.request_start = time.time()
+    if current_app.config.get('EXPORT_SERVICE_METRICS', True):
+        metrics.requests_in_flight.inc()
+        g.in_flight = True
+
+
+@bp.teardown_request
+def end_in_flight(exception=None):
+    """
+    this is called even if the request failed
+
+    :param exception:
+    :return:
+    """
+    if getattr(g, 'in_flight', False):
+        metrics.requests_in_flight.dec()
+        g.in_flight = False
+
+
+@bp.after_request
+def add_server_timing(response):
+    """
+    report the time spent in each phase of the request in Server-Timing header,
+    and aggregate them per format, also record the request in metrics
+
+    :param response:
+    :return:
+    """
+    timings = get_timings()
+    if hasattr(g, 'request_start'):
+        timings['total'] = time.time() - g.request_start
+    export_format = get_export_format()
+    if len(timings) > 0:
+        if request.url_rule is not None:
+            phase_histograms.observe(export_format, timings)
+        if current_app.config.get('EXPORT_SERVICE_SERVER_TIMING', True):
+            response.headers['Server-Timing'] = format_server_timing(timings)
+    if getattr(g, 'in_flight', False):
+        metrics.requests_total.inc(format=export_format, method=request.method, status=response.status_code)
+        if 'total' in timings:
+            metrics.request_duration.observe(timings['total'], format=export_format, method=request.method)
+        if not response.is_streamed:
+            metrics.response_size.observe(response.calculate_content_length() or 0, format=export_format)
+    return response
+
 
 def default_solr_fields():
     """
@@ -32,6 +102,7 @@ def default_solr_fields():
            'property,esources,data,isbn,eid,issn,arxiv_class,editor,series,publisher,bibstem,page_count'
 
 
+@timed('serialize')
 def return_response(results, status, request_type=''):
     """
 
@@ -51,17 +122,18 @@ def return_response(results, status, request_type=''):
         current_app.logger.info('sending response status={status}'.format(status=status))
         r = Response(response=json.dumps(results), status=status)
         r.headers['content-type'] = 'application/json'
-        return r
+        return compress_response(r)
 
     if request_type == 'GET':
         current_app.logger.info('sending response status={status}'.format(status=status))
         r = Response(response=results['export'], status=status)
         r.headers['content-type'] = 'text/plain'
-        return r
+        return compress_response(r)
 
     return None
 
 
+@timed('format')
 def return_bibTex_format_export(solr_data, include_abs, keyformat, maxauthor, authorcutoff, journalformat, request_type='POST'):
     """
 
@@ -75,6 +147,7 @@ def return_bibTex_format_export(solr_data, include_abs, keyformat, maxauthor, au
     return return_response({'error': 'no result from solr'}, 404)
 
 
+@timed('format')
 def return_fielded_format_export(solr_data, fielded_style, request_type='POST'):
     """
 
@@ -100,6 +173,7 @@ def return_fielded_format_export(solr_data, fielded_style, request_type='POST'):
     return return_response({'error': 'no result from solr'}, 404)
 
 
+@timed('format')
 def return_xml_format_export(solr_data, xml_style, request_type='POST'):
     """
 
@@ -120,6 +194,7 @@ def return_xml_format_export(solr_data, xml_style, request_type='POST'):
     return return_response({'error': 'no result from solr'}, 404)
 
 
+@timed('format')
 def return_csl_format_export(solr_data, csl_style, export_format, journal_format, request_type='POST'):
     """
 
@@ -135,6 +210,7 @@ def return_csl_format_export(solr_data, csl_style, export_format, journal_format
     return return_response({'error': 'no result from solr'}, 404)
 
 
+@timed('format')
 def return_votable_format_export(solr_data, request_type='POST'):
     """
 
@@ -148,6 +224,7 @@ def return_votable_format_export(solr_data, request_type='POST'):
     return return_response({'error': 'no result from solr'}, 404)
 
 
+@timed('format')
 def return_rss_format_export(solr_data, link, request_type='POST'):
     """
 
@@ -174,6 +251,7 @@ def read_value_list_or_not(payload, field):
     return payload[field]
 
 
+@timed('fetch')
 def export_post(request, style, format=-1):
     """
 
@@ -279,6 +357,7 @@ def export_post_extras(request, style):
     return -1
 
 
+@timed('fetch')
 def export_get(bibcode, style, format=-1):
     """
 
@@ -304,6 +383,7 @@ def export_get(bibcode, style, format=-1):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/bibtex', methods=['POST'])
+@admit('bibtex')
 def bibTex_format_export_post():
     """
 
@@ -320,6 +400,7 @@ def bibTex_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/bibtex/<bibcode>', methods=['GET'])
+@admit('bibtex')
 def bibTex_format_export_get(bibcode):
     """
 
@@ -332,6 +413,7 @@ def bibTex_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/bibtexabs', methods=['POST'])
+@admit('bibtex')
 def bibTex_abs_format_export_post():
     """
 
@@ -348,6 +430,7 @@ def bibTex_abs_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/bibtexabs/<bibcode>', methods=['GET'])
+@admit('bibtex')
 def bibTex_abs_format_export_get(bibcode):
     """
 
@@ -360,6 +443,7 @@ def bibTex_abs_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/ads', methods=['POST'])
+@admit('fielded')
 def fielded_ads_format_export_post():
     """
 
@@ -373,6 +457,7 @@ def fielded_ads_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/ads/<bibcode>', methods=['GET'])
+@admit('fielded')
 def fielded_ads_format_export_get(bibcode):
     """
 
@@ -384,6 +469,7 @@ def fielded_ads_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/endnote', methods=['POST'])
+@admit('fielded')
 def fielded_endnote_format_export_post():
     """
 
@@ -397,6 +483,7 @@ def fielded_endnote_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/endnote/<bibcode>', methods=['GET'])
+@admit('fielded')
 def fielded_endnote_format_export_get(bibcode):
     """
 
@@ -408,6 +495,7 @@ def fielded_endnote_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/procite', methods=['POST'])
+@admit('fielded')
 def fielded_procite_format_export_post():
     """
 
@@ -421,6 +509,7 @@ def fielded_procite_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/procite/<bibcode>', methods=['GET'])
+@admit('fielded')
 def fielded_procite_format_export_get(bibcode):
     """
 
@@ -432,6 +521,7 @@ def fielded_procite_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/ris', methods=['POST'])
+@admit('fielded')
 def fielded_refman_format_export_post():
     """
 
@@ -445,6 +535,7 @@ def fielded_refman_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/ris/<bibcode>', methods=['GET'])
+@admit('fielded')
 def fielded_refman_format_export_get(bibcode):
     """
 
@@ -456,6 +547,7 @@ def fielded_refman_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/refworks', methods=['POST'])
+@admit('fielded')
 def fielded_refworks_format_export_post():
     """
 
@@ -469,6 +561,7 @@ def fielded_refworks_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/refworks/<bibcode>', methods=['GET'])
+@admit('fielded')
 def fielded_refworks_format_export_get(bibcode):
     """
 
@@ -480,6 +573,7 @@ def fielded_refworks_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/medlars', methods=['POST'])
+@admit('fielded')
 def fielded_medlars_format_export_post():
     """
 
@@ -493,6 +587,7 @@ def fielded_medlars_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/medlars/<bibcode>', methods=['GET'])
+@admit('fielded')
 def fielded_medlars_format_export_get(bibcode):
     """
 
@@ -504,6 +599,7 @@ def fielded_medlars_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/dcxml', methods=['POST'])
+@admit('xml')
 def xml_dublincore_format_export_post():
     """
 
@@ -517,6 +613,7 @@ def xml_dublincore_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/dcxml/<bibcode>', methods=['GET'])
+@admit('xml')
 def xml_dublincore_format_export_get(bibcode):
     """
 
@@ -528,6 +625,7 @@ def xml_dublincore_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/refxml', methods=['POST'])
+@admit('xml')
 def xml_ref_format_export_post():
     """
 
@@ -541,6 +639,7 @@ def xml_ref_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/refxml/<bibcode>', methods=['GET'])
+@admit('xml')
 def xml_ref_format_export_get(bibcode):
     """
 
@@ -552,6 +651,7 @@ def xml_ref_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/refabsxml', methods=['POST'])
+@admit('xml')
 def xml_refabs_format_export_post():
     """
 
@@ -565,6 +665,7 @@ def xml_refabs_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/refabsxml/<bibcode>', methods=['GET'])
+@admit('xml')
 def xml_refabs_format_export_get(bibcode):
     """
 
@@ -576,6 +677,7 @@ def xml_refabs_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/aastex', methods=['POST'])
+@admit('csl')
 def csl_aastex_format_export_post():
     """
 
@@ -592,6 +694,7 @@ def csl_aastex_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/aastex/<bibcode>', methods=['GET'])
+@admit('csl')
 def csl_aastex_format_export_get(bibcode):
     """
 
@@ -604,6 +707,7 @@ def csl_aastex_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/icarus', methods=['POST'])
+@admit('csl')
 def csl_icarus_format_export_post():
     """
 
@@ -618,6 +722,7 @@ def csl_icarus_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/icarus/<bibcode>', methods=['GET'])
+@admit('csl')
 def csl_icarus_format_export_get(bibcode):
     """
 
@@ -630,6 +735,7 @@ def csl_icarus_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/mnras', methods=['POST'])
+@admit('csl')
 def csl_mnras_format_export_post():
     """
 
@@ -644,6 +750,7 @@ def csl_mnras_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/mnras/<bibcode>', methods=['GET'])
+@admit('csl')
 def csl_mnras_format_export_get(bibcode):
     """
 
@@ -656,6 +763,7 @@ def csl_mnras_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/soph', methods=['POST'])
+@admit('csl')
 def csl_soph_format_export_post():
     """
 
@@ -670,6 +778,7 @@ def csl_soph_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/soph/<bibcode>', methods=['GET'])
+@admit('csl')
 def csl_soph_format_export_get(bibcode):
     """
 
@@ -682,6 +791,7 @@ def csl_soph_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/csl', methods=['POST'])
+@admit('csl')
 def csl_format_export():
     try:
         payload = request.get_json(force=True)  # post data in json
@@ -723,6 +833,7 @@ def csl_format_export():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/custom', methods=['POST'])
+@admit('custom')
 def custom_format_export():
     try:
         payload = request.get_json(force=True)  # post data in json
@@ -733,16 +844,25 @@ def custom_format_export():
         return return_response({'error': 'no information received'}, 400)
     if 'bibcode' not in payload:
         return return_response({'error': 'no bibcode found in payload (parameter name is `bibcode`)'}, 400)
-    if 'format' not in payload:
-        return return_response({'error': 'no custom format found in payload (parameter name is `format`)'}, 400)
+    if 'format' not in payload and 'format_id' not in payload:
+        return return_response({'error': 'no custom format found in payload (parameter name is `format`, or `format_id` for a saved format)'}, 400)
     if 'sort' in payload:
         sort = read_value_list_or_not(payload, 'sort')
     else:
         sort = 'date desc, bibcode desc'
 
     bibcodes = payload['bibcode']
+    plan = None
     try:
-        custom_format_str = read_value_list_or_not(payload, 'format')
+        if 'format' in payload:
+            custom_format_str = read_value_list_or_not(payload, 'format')
+        else:
+            # saved formats are already compiled
+            format_id = read_value_list_or_not(payload, 'format_id')
+            plan = custom_format_registry.get(format_id)
+            if plan is None:
+                return return_response({'error': 'unrecognizable custom format id'}, 400)
+            custom_format_str = format_id
     except Exception as e:
         return return_response({'error': 'unable to read custom format'}, 400)
 
@@ -754,8 +874,9 @@ def custom_format_export():
 
     # pass the user defined format to CustomFormat to parse and we would be able to get which fields
     # in Solr we need to query on
-    custom_export = CustomFormat(custom_format=custom_format_str)
-    fields = custom_export.get_solr_fields()
+    with phase('parse'):
+        custom_export = CustomFormat(custom_format=custom_format_str, plan=plan)
+        fields = custom_export.get_solr_fields()
 
     # now get the required data from Solr and send it to customFormat for formatting
     solr_data = get_solr_data(bibcodes=bibcodes, fields=fields, sort=sort)
@@ -767,6 +888,105 @@ def custom_format_export():
     return return_response({'error': 'no result from solr'}, 404)
 
 
+@advertise(scopes=[], rate_limit=[100, 3600 * 24])
+@bp.route('/custom/formats', methods=['POST'])
+def custom_format_save():
+    """
+    save a custom format, so that it can be referred to by its id in /custom
+
+    :return: id of the format
+    """
+    try:
+        payload = request.get_json(force=True)  # post data in json
+    except:
+        payload = dict(request.form)  # post data in form encoding
+
+    if not payload:
+        return return_response({'error': 'no information received'}, 400)
+    if 'format' not in payload:
+        return return_response({'error': 'no custom format found in payload (parameter name is `format`)'}, 400)
+
+    try:
+        custom_format_str = read_value_list_or_not(payload, 'format')
+    except Exception as e:
+        return return_response({'error': 'unable to read custom format'}, 400)
+    if not isinstance(custom_format_str, basestring):
+        return return_response({'error': 'unable to read custom format'}, 400)
+    if len(custom_format_str) == 0:
+        return return_response({'error': 'not all the needed information received'}, 400)
+
+    if not custom_format_registry.is_enabled():
+        return return_response({'error': 'saving custom formats is not enabled'}, 503)
+
+    current_app.logger.info('received request to save the custom format: {custom_format_str}'.format(custom_format_str=custom_format_str.encode('utf8')))
+    try:
+        format_id = custom_format_registry.save(custom_format_str)
+    except Exception as e:
+        return return_response({'error': 'unable to compile custom format'}, 400)
+    if format_id is None:
+        return return_response({'error': 'too many custom formats saved, try again later'}, 503)
+    return return_response({'id': format_id, 'format': custom_format_str}, 200, 'POST')
+
+
+@advertise(scopes=[], rate_limit=[1000, 3600 * 24])
+@bp.route('/custom/formats/<format_id>', methods=['GET'])
+def custom_format_get(format_id):
+    """
+
+    :param format_id: id of a classic or a saved custom format
+    :return: the custom format
+    """
+    custom_format_str = custom_format_registry.get_format(format_id)
+    if custom_format_str is None:
+        return return_response({'error': 'unrecognizable custom format id'}, 404)
+    r = Response(response=json.dumps({'id': format_id, 'format': custom_format_str}), status=200)
+    r.headers['content-type'] = 'application/json'
+    return r
+
+
+@advertise(scopes=[], rate_limit=[1000, 3600 * 24])
+@bp.route('/custom/estimate', methods=['POST'])
+def custom_format_estimate():
+    """
+    compile a custom format, without going to solr, to validate it and to find out how expensive it is
+
+    :return: solr fields, options that effect the cost, size of the compiled format, and estimated cost per record
+    """
+    try:
+        payload = request.get_json(force=True)  # post data in json
+    except:
+        payload = dict(request.form)  # post data in form encoding
+
+    if not payload:
+        return return_response({'error': 'no information received'}, 400)
+    if 'format' not in payload and 'format_id' not in payload:
+        return return_response({'error': 'no custom format found in payload (parameter name is `format`, or `format_id` for a saved format)'}, 400)
+
+    try:
+        if 'format' in payload:
+            custom_format_str = read_value_list_or_not(payload, 'format')
+        else:
+            custom_format_str = read_value_list_or_not(payload, 'format_id')
+    except Exception as e:
+        return return_response({'error': 'unable to read custom format'}, 400)
+    if not isinstance(custom_format_str, basestring):
+        return return_response({'error': 'unable to read custom format'}, 400)
+    if len(custom_format_str) == 0:
+        return return_response({'error': 'not all the needed information received'}, 400)
+
+    current_app.logger.info('received request to estimate the cost of the custom format: {custom_format_str}'.format(custom_format_str=custom_format_str.encode('utf8')))
+    if 'format' in payload:
+        try:
+            plan = custom_format_plans.get(custom_format_str)
+        except Exception as e:
+            return return_response({'error': 'unable to compile custom format'}, 400)
+    else:
+        plan = custom_format_registry.get(custom_format_str)
+        if plan is None:
+            return return_response({'error': 'unrecognizable custom format id'}, 400)
+    return return_response(get_custom_format_cost(plan), 200, 'POST')
+
+
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/convert', methods=['POST'])
 def custom_format_convert():                # pragma: no cover
@@ -792,6 +1012,7 @@ def custom_format_convert():                # pragma: no cover
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/votable', methods=['POST'])
+@admit('votable')
 def votable_format_export_post():
     """
 
@@ -805,6 +1026,7 @@ def votable_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/votable/<bibcode>', methods=['GET'])
+@admit('votable')
 def votable_format_export_get(bibcode):
     """
 
@@ -816,6 +1038,7 @@ def votable_format_export_get(bibcode):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/rss', methods=['POST'])
+@admit('rss')
 def rss_format_export_post():
     """
 
@@ -840,6 +1063,7 @@ def rss_format_export_post():
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/rss/<bibcode>/', defaults={'link': ''}, methods=['GET'])
 @bp.route('/rss/<bibcode>/<path:link>', methods=['GET'])
+@admit('rss')
 def rss_format_export_get(bibcode, link):
     """
 
@@ -852,6 +1076,7 @@ def rss_format_export_get(bibcode, link):
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/ieee', methods=['POST'])
+@admit('csl')
 def csl_ieee_format_export_post():
     """
 
@@ -866,6 +1091,7 @@ def csl_ieee_format_export_post():
 
 @advertise(scopes=[], rate_limit=[1000, 3600 * 24])
 @bp.route('/ieee/<bibcode>', methods=['GET'])
+@admit('csl')
 def csl_ieee_format_export_get(bibcode):
     """
 
@@ -874,3 +1100,121 @@ def csl_ieee_format_export_get(bibcode):
     """
     return return_csl_format_export(solr_data=export_get(bibcode, 'ieee', 2),
                                     csl_style='ieee', export_format=adsFormatter.unicode, journal_format=adsJournalFormat.full, request_type='GET')
+
+
+@advertise(scopes=[], rate_limit=[100, 3600 * 24])
+@bp.route('/jobs', methods=['POST'])
+def export_job_submit():
+    """
+    submit a large export to be run in the background
+
+    :return: id of the job to poll for status
+    """
+    try:
+        payload = request.get_json(force=True)  # post data in json
+    except:
+        payload = dict(request.form)  # post data in form encoding
+
+    if not payload:
+        return return_response({'error': 'no information received'}, 400)
+    if 'bibcode' not in payload:
+        return return_response({'error': 'no bibcode found in payload (parameter name is `bibcode`)'}, 400)
+    if 'style' not in payload:
+        return return_response({'error': 'no style found in payload (parameter name is `style`)'}, 400)
+
+    bibcodes = payload['bibcode']
+    style = read_value_list_or_not(payload, 'style')
+
+    # if in the test mode, there is one bibcode
+    if current_app.config['EXPORT_SERVICE_TEST_BIBCODE_GET'] == bibcodes:
+        bibcodes = [bibcodes]
+
+    if (len(bibcodes) == 0) or (len(style) == 0):
+        return return_response({'error': 'not all the needed information received'}, 400)
+    if style not in current_app.jobs.styles:
+        return return_response({'error': 'unrecognizable style (supprted formats are: ' + ', '.join(current_app.jobs.styles) + ')'}, 400)
+    if len(bibcodes) > current_app.config['EXPORT_SERVICE_JOBS_MAX_RECORDS']:
+        return return_response({'error': 'too many bibcodes (maximum is {})'.format(current_app.config['EXPORT_SERVICE_JOBS_MAX_RECORDS'])}, 400)
+
+    current_app.logger.info('received request to submit a job with {count} bibcodes to export in {style} style'.
+                            format(count=len(bibcodes), style=style))
+
+    authorization = request.headers.get('X-Forwarded-Authorization', request.headers.get('Authorization', ''))
+    job_id = current_app.jobs.submit(bibcodes, style, authorization)
+    r = Response(response=json.dumps(current_app.jobs.get_status(job_id)), status=202)
+    r.headers['content-type'] = 'application/json'
+    r.headers['Location'] = url_for('export_service.export_job_status', job_id=job_id)
+    return r
+
+
+@advertise(scopes=[], rate_limit=[1000, 3600 * 24])
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def export_job_status(job_id):
+    """
+
+    :param job_id:
+    :return: status and progress of the job
+    """
+    status = current_app.jobs.get_status(job_id)
+    if status is None:
+        return return_response({'error': 'job not found'}, 404)
+    return return_response(status, 200, 'POST')
+
+
+@advertise(scopes=[], rate_limit=[1000, 3600 * 24])
+@bp.route('/jobs/<job_id>/result', methods=['GET'])
+def export_job_result(job_id):
+    """
+    download the result of a job, a Range header is supported to resume the download
+
+    :param job_id:
+    :return:
+    """
+    path = current_app.jobs.get_result_path(job_id)
+    if path is None:
+        return return_response({'error': 'job not found or not done yet'}, 404)
+
+    length = os.path.getsize(path)
+    start, stop = 0, length
+    status = 200
+    ranges = parse_range_header(request.headers.get('Range'))
+    # more than one range is not supported, the range request is ignored and the whole file is sent
+    if (ranges is not None) and (len(ranges.ranges) == 1):
+        requested = ranges.range_for_length(length)
+        if requested is None:
+            r = Response(status=416)
+            r.headers['Content-Range'] = 'bytes */{}'.format(length)
+            return r
+        start, stop = requested
+        status = 206
+
+    def read_file(chunk_size=64 * 1024):
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                data = f.read(min(chunk_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+
+    current_app.logger.info('sending job result status={status}'.format(status=status))
+    r = Response(response=read_file(), status=status, direct_passthrough=True)
+    r.headers['content-type'] = 'text/plain; charset=utf-8'
+    r.headers['Accept-Ranges'] = 'bytes'
+    r.headers['Content-Length'] = str(stop - start)
+    if status == 206:
+        r.headers['Content-Range'] = 'bytes {}-{}/{}'.format(start, stop - 1, length)
+    return r
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics_export():
+    """
+
+    :return: operational metrics in Prometheus text format
+    """
+    r = Response(response=metrics.registry.expose(), status=200)
+    r.headers['content-type'] = 'text/plain; version=0.0.4'
+    return r